@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Admission control and load shedding
+Requests are admitted by priority class (cached reads > plain fetch >
+translation > LLM summary > audio transcription). Each class has its own
+concurrency limit and a queue-time deadline, and lower classes may only use
+part of the server's total concurrency, so when the server is saturated the
+expensive work is shed first with a fast 503 + Retry-After while cheap
+reads keep flowing. Within a class, a client with fewer requests in flight
+goes ahead of one with many, so a single heavy script cannot starve
+everyone else. Batch and job items are admitted as background requests,
+queued behind every interactive request and limited to part of each
+class's share.
+"""
+
+import contextvars
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import Counter, Gauge, Histogram
+
+ADMISSION_CONTROL = os.getenv('ADMISSION_CONTROL', '1') != '0'
+MAX_CONCURRENCY = int(os.getenv('ADMISSION_MAX_CONCURRENCY', 48))
+# A class may queue up to this many requests per slot before new ones are rejected outright
+QUEUE_PER_SLOT = 4
+# Background (batch / job) items: part of a class's share they may use, and how long they may queue
+BACKGROUND_SHARE = float(os.getenv('ADMISSION_BACKGROUND_SHARE', 0.5))
+BACKGROUND_QUEUE_SECONDS = float(os.getenv('ADMISSION_BACKGROUND_QUEUE_SECONDS', 30))
+
+# name: (concurrency limit, queue deadline in seconds, share of MAX_CONCURRENCY, Retry-After seconds)
+DEFAULT_CLASSES = {
+    'cached': (64, 1.0, 1.0, 1),
+    'fetch': (16, 5.0, 0.9, 2),
+    'translate': (8, 5.0, 0.75, 5),
+    'summary': (4, 2.0, 0.6, 10),
+    'audio': (2, 1.0, 0.5, 30),
+}
+
+
+class Overloaded(Exception):
+    """A request was shed; the message is safe to show to users"""
+
+    def __init__(self, message, retry_after=5, status=503):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+
+class PriorityClass:
+    """Limits and live counts for one class; a lower rank is served first"""
+
+    def __init__(self, name, rank, limit, queue_seconds, share, retry_after):
+        self.name = name
+        self.rank = rank
+        self.limit = int(os.getenv(f'ADMISSION_{name.upper()}_LIMIT', limit))
+        self.queue_seconds = float(os.getenv(f'ADMISSION_{name.upper()}_QUEUE_SECONDS', queue_seconds))
+        self.share = share
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+
+
+class _Waiter:
+    def __init__(self, priority, key, counted, background=False):
+        self.priority = priority
+        self.key = key
+        self.counted = counted
+        self.background = background
+
+
+class Ticket:
+    """An admitted request; `priority` moves to a more expensive class as the work escalates"""
+
+    def __init__(self, priority, queued_seconds, client=None, background=False):
+        self.priority = priority
+        self.queued_seconds = queued_seconds
+        self.client = client
+        self.background = background
+
+
+class AdmissionController:
+    """Priority admission over a total concurrency limit and per-class limits.
+
+    request() admits a whole request and counts against the total; stage()
+    moves the current request into a more expensive class for part of its
+    work (only the class limit applies, so an admitted request can never
+    deadlock waiting for total capacity held by itself and its peers).
+    Outside a request (bulk jobs, CLIs) stage() waits for a class slot
+    without a deadline.
+    """
+
+    def __init__(self, classes=None, max_concurrency=MAX_CONCURRENCY, enabled=ADMISSION_CONTROL):
+        classes = classes or DEFAULT_CLASSES
+        self.classes = {name: PriorityClass(name, rank, *settings)
+                        for rank, (name, settings) in enumerate(classes.items())}
+        self.max_concurrency = max_concurrency
+        self.enabled = enabled
+        self.active = 0
+        self.rejected = 0
+        self.condition = threading.Condition()
+        self.waiters = []
+        self.client_load = {}
+        self._sequence = itertools.count()
+
+    def _fits(self, priority, counted, background=False):
+        if priority.active >= priority.limit:
+            return False
+        share = priority.share * (BACKGROUND_SHARE if background else 1)
+        return not counted or self.active < math.ceil(self.max_concurrency * share)
+
+    def _first_in_line(self, waiter):
+        """No waiter ahead of this one (higher class, lighter client, or earlier) could go now"""
+        return not any(other.key < waiter.key and self._fits(other.priority, other.counted, other.background)
+                       for other in self.waiters)
+
+    def _reject(self, priority, reason):
+        self.rejected += 1
+        admission_rejected.inc(priority=priority.name, reason=reason)
+        raise Overloaded(f'Server is busy ({priority.name} requests {reason.replace("_", " ")}). '
+                         f'Please try again in {priority.retry_after}s', retry_after=priority.retry_after)
+
+    def _acquire(self, priority, counted, timeout, client=None, background=False):
+        """Take a slot of `priority`, waiting up to `timeout` seconds; returns the time queued"""
+        started = time.perf_counter()
+        with self.condition:
+            # Start-time fair queuing: order within a class by the client's requests already in flight.
+            # Background work queues behind every interactive class
+            turn = self.client_load.get(client, 0)
+            rank = priority.rank + (len(self.classes) if background else 0)
+            waiter = _Waiter(priority, (rank, turn, next(self._sequence)), counted, background)
+            if not (self._fits(priority, counted, background) and self._first_in_line(waiter)):
+                if timeout is not None and priority.waiting >= priority.limit * QUEUE_PER_SLOT:
+                    self._reject(priority, 'queue_full')
+                deadline = None if timeout is None else time.monotonic() + timeout
+                self.waiters.append(waiter)
+                priority.waiting += 1
+                try:
+                    while not (self._fits(priority, counted, background) and self._first_in_line(waiter)):
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            self._reject(priority, 'deadline')
+                        self.condition.wait(remaining)
+                finally:
+                    self.waiters.remove(waiter)
+                    priority.waiting -= 1
+                    # Whoever was queued behind this waiter may be first in line now
+                    self.condition.notify_all()
+            priority.active += 1
+            if counted:
+                self.active += 1
+                if client is not None:
+                    self.client_load[client] = self.client_load.get(client, 0) + 1
+        queued = time.perf_counter() - started
+        admission_queue_seconds.observe(queued, priority=priority.name)
+        return queued
+
+    def _release(self, priority, counted, client=None):
+        with self.condition:
+            priority.active -= 1
+            if counted:
+                self.active -= 1
+                if client is not None:
+                    self.client_load[client] -= 1
+                    if not self.client_load[client]:
+                        del self.client_load[client]
+            self.condition.notify_all()
+
+    @contextmanager
+    def request(self, name, client=None, background=False):
+        """Admit the block as a request of class `name` for `client`; raises Overloaded when it is shed.
+
+        background=True admits a batch or job item: it queues behind interactive
+        requests for up to BACKGROUND_QUEUE_SECONDS and uses at most
+        BACKGROUND_SHARE of the class's share of the total concurrency.
+        """
+        if not self.enabled:
+            yield None
+            return
+        priority = self.classes[name]
+        timeout = BACKGROUND_QUEUE_SECONDS if background else priority.queue_seconds
+        ticket = Ticket(priority, self._acquire(priority, True, timeout, client, background), client, background)
+        token = _current.set(ticket)
+        try:
+            yield ticket
+        finally:
+            _current.reset(token)
+            self._release(ticket.priority, True, ticket.client)
+
+    @contextmanager
+    def stage(self, name):
+        """Run the block as class `name` work: escalates the current request if `name` is more expensive"""
+        if not self.enabled:
+            yield
+            return
+        priority = self.classes[name]
+        ticket = _current.get()
+        if ticket is None:
+            self._acquire(priority, False, None)
+            try:
+                yield
+            finally:
+                self._release(priority, False)
+            return
+        if priority.rank > ticket.priority.rank:
+            # Take the new slot before giving up the old one; ranks only go up, so no cycles
+            timeout = BACKGROUND_QUEUE_SECONDS if ticket.background else priority.queue_seconds
+            ticket.queued_seconds += self._acquire(priority, False, timeout, background=ticket.background)
+            self._release(ticket.priority, False)
+            ticket.priority = priority
+        yield
+
+    def stats(self):
+        with self.condition:
+            return {
+                'enabled': self.enabled,
+                'active': self.active,
+                'max_concurrency': self.max_concurrency,
+                'rejected': self.rejected,
+                'classes': {name: {'active': p.active, 'waiting': p.waiting, 'limit': p.limit,
+                                   'queue_seconds': p.queue_seconds}
+                            for name, p in self.classes.items()}
+            }
+
+
+_current = contextvars.ContextVar('admission_ticket', default=None)
+
+# Shared by the server process
+admission = AdmissionController()
+
+admission_rejected = Counter('admission_rejected_total', 'Requests shed by admission control',
+                             ('priority', 'reason'))
+admission_queue_seconds = Histogram('admission_queue_seconds', 'Time requests waited for admission',
+                                    ('priority',))
+admission_active = Gauge('admission_active', 'Admitted requests and stages running per priority class',
+                         ('priority',))
+admission_active.set_function(lambda: {(name,): p.active for name, p in admission.classes.items()})
+admission_waiting = Gauge('admission_waiting', 'Requests queued for admission per priority class',
+                          ('priority',))
+admission_waiting.set_function(lambda: {(name,): p.waiting for name, p in admission.classes.items()})
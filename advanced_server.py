@@ -8,252 +8,420 @@ import http.server
 import socketserver
 import json
 import urllib.parse
-from youtube_transcript_api import YouTubeTranscriptApi
-from googletrans import Translator
 import re
 import textwrap
 import base64
 import datetime
 import os
-from dotenv import load_dotenv
+import threading
+import time
+STARTED = time.perf_counter()
 
-# Load environment variables from .env file
-load_dotenv()
+try:
+    from dotenv import load_dotenv
+    # Before the imports below, which read their settings from the environment
+    load_dotenv()
+except ImportError:
+    pass
 
-class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        self.translator = Translator()
-        super().__init__(*args, **kwargs)
+from fast_json import dumps_bytes, ResponseCache, backend_name
+from rate_limit import upstream_limits, YOUTUBE_HOST
+from transcript_resolver import resolver, resolve_transcript, ResolutionError, ResolutionCancelled
+from metrics import MetricsMixin, register_in_flight, record_upstream_error
+from tracing import TracingMixin, annotate, span
+from profiler import ProfilingMixin, install_signal_handler, is_admin, sampling_profiler
+from memory import MemoryBudgetExceeded, charge, memory_budget, memory_report, start_tracing
+from proxy_pool import proxy_pool
+from health import health
+from admission import Overloaded, admission
+from quotas import QuotaExceeded, identify_client, quotas
+from batch import parse_batch_request, run_batch, DEFAULT_BATCH_WORKERS
+from jobs import JobManager, read_id_file, extract_video_id
+
+# Heavy clients (YouTube API, googletrans, requests) are created on first use, not here
+IMPORT_SECONDS = time.perf_counter() - STARTED
+startup = {'imports_ms': round(IMPORT_SECONDS * 1000, 1), 'ready_ms': None}
+
+# Successful transcript results, stored as ready-to-send JSON bytes
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', 256)),
+    ttl=int(os.getenv('RESPONSE_CACHE_TTL', 3600)),
+    name='responses',
+    max_bytes=int(float(os.getenv('RESPONSE_CACHE_MAX_MB', 128)) * 1024 * 1024)
+)
+
+# Bulk ingestion jobs, created when the server starts
+job_manager = None
+# Admission attempts per job item before it is recorded as failed
+JOB_ADMISSION_ATTEMPTS = int(os.getenv('JOB_ADMISSION_ATTEMPTS', 5))
+
+def transcript_cache_key(video_id, include_summary, summary_words):
+    return (video_id, include_summary, summary_words if include_summary else None)
+
+def transcript_admission_class(video_id, include_summary, summary_words):
+    """'cached' when the response is ready, otherwise the class of the work it needs"""
+    if transcript_cache_key(video_id, include_summary, summary_words) in response_cache:
+        return 'cached'
+    # Translation is only known to be needed mid-resolution; the resolver escalates then
+    return 'summary' if include_summary else 'fetch'
+
+def summary_options(parsed_path):
+    """(include_summary, summary_words) from ?summary=true&summary_words=N"""
+    query_params = urllib.parse.parse_qs(parsed_path.query)
+    include_summary = 'summary' in query_params and query_params['summary'][0].lower() == 'true'
+    summary_words = int(query_params.get('summary_words', [100])[0]) if 'summary_words' in query_params else 100
+    return include_summary, summary_words
+
+class UltimateTranscriptHandler(TracingMixin, ProfilingMixin, MetricsMixin, http.server.BaseHTTPRequestHandler):
+    metrics_server = 'advanced'
+    metrics_endpoints = ('transcript', 'download', 'share', 'list', 'jobs', 'batch', 'health', 'livez', 'readyz', 'quota', 'admin')
     
     def do_GET(self):
+        status = 200
+        retry_after = None
         try:
             parsed_path = urllib.parse.urlparse(self.path)
             path_parts = parsed_path.path.strip('/').split('/')
             
-            # CORS headers
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
-            
-            if len(path_parts) >= 2 and path_parts[0] == 'transcript':
-                video_id = path_parts[1]
-                query_params = urllib.parse.parse_qs(parsed_path.query)
-                include_summary = 'summary' in query_params and query_params['summary'][0].lower() == 'true'
-                summary_words = int(query_params.get('summary_words', [100])[0]) if 'summary_words' in query_params else 100
-                response = self.get_ultimate_transcript(video_id, include_summary, summary_words)
-                
-            elif len(path_parts) >= 3 and path_parts[0] == 'download':
-                video_id = path_parts[1]
-                format_type = path_parts[2]  # txt, json, srt
-                query_params = urllib.parse.parse_qs(parsed_path.query)
-                include_summary = 'summary' in query_params and query_params['summary'][0].lower() == 'true'
-                summary_words = int(query_params.get('summary_words', [100])[0]) if 'summary_words' in query_params else 100
-                response = self.download_transcript(video_id, format_type, include_summary, summary_words)
-                
-            elif len(path_parts) >= 2 and path_parts[0] == 'share':
-                video_id = path_parts[1]
-                query_params = urllib.parse.parse_qs(parsed_path.query)
-                include_summary = 'summary' in query_params and query_params['summary'][0].lower() == 'true'
-                summary_words = int(query_params.get('summary_words', [100])[0]) if 'summary_words' in query_params else 100
-                response = self.generate_share_link(video_id, include_summary, summary_words)
-                
-            elif len(path_parts) >= 2 and path_parts[0] == 'list':
-                video_id = path_parts[1]
-                response = self.list_ultimate_transcripts(video_id)
-                
-            elif path_parts[0] == 'health':
-                response = {'status': 'ULTIMATE SERVER RUNNING', 'features': ['Multi-language', 'Translation', 'Fallbacks', 'Summary', 'Download', 'Share', 'Copy']}
-                
-            else:
-                response = {'error': 'Invalid endpoint'}
-            
-            self.wfile.write(json.dumps(response).encode())
+            if path_parts[0] == 'metrics':
+                self.send_metrics()
+                return
+            
+            # Load balancer probes: cached state only, never an upstream call
+            if path_parts[0] in ('livez', 'readyz'):
+                ok, details = health.live() if path_parts[0] == 'livez' else health.ready()
+                self.send_json_response(details, 200 if ok else 503)
+                return
+            
+            if path_parts[:2] == ['admin', 'profile']:
+                self.admin_profile(parsed_path)
+                return
+            
+            if path_parts[:2] == ['admin', 'memory']:
+                self.admin_memory(parsed_path)
+                return
+            
+            client = identify_client(self.headers, self.client_address)
+            annotate(client=client)
+            if path_parts[0] == 'quota':
+                self.send_json_response({'success': True, 'client': client, 'quotas': quotas.usage(client)})
+                return
+            
+            # The response is built before the headers go out so Server-Timing covers the work
+            with quotas.client(client), \
+                    admission.request(self.admission_class(parsed_path, path_parts), client) as ticket, \
+                    memory_budget.request() as reservation:
+                if ticket is not None:
+                    annotate(priority=ticket.priority.name, queued_ms=round(ticket.queued_seconds * 1000, 1))
+                body = self.build_get_response(parsed_path, path_parts)
+            annotate(memory_bytes=reservation.peak)
+            
+        except MemoryBudgetExceeded as e:
+            status = e.status
+            retry_after = 5 if status == 503 else None
+            body = dumps_bytes({'success': False, 'error': str(e)})
+            
+        except (Overloaded, QuotaExceeded) as e:
+            status = e.status
+            retry_after = e.retry_after
+            body = dumps_bytes({'success': False, 'error': str(e), 'retry_after': e.retry_after})
             
         except Exception as e:
             error_response = {'success': False, 'error': str(e)}
-            self.wfile.write(json.dumps(error_response).encode())
+            body = dumps_bytes(error_response)
+        
+        # CORS headers
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if retry_after:
+            self.send_header('Retry-After', str(retry_after))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Request-ID, X-Profile, X-API-Key, X-Install-ID')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def admission_class(self, parsed_path, path_parts):
+        """Priority class of a GET, decided from the URL and caches before any work is done"""
+        if len(path_parts) >= 2 and path_parts[0] in ('transcript', 'download', 'share'):
+            include_summary, summary_words = summary_options(parsed_path)
+            return transcript_admission_class(path_parts[1], include_summary, summary_words)
+        # Language lists, job status and health are cheap reads
+        return 'cached'
     
-    def get_ultimate_transcript(self, video_id, include_summary=False, summary_words=100):
-        """Ultimate transcript extraction with multiple fallbacks"""
+    def build_get_response(self, parsed_path, path_parts):
+        """JSON bytes for a GET endpoint"""
+        body = None
+        if len(path_parts) >= 2 and path_parts[0] == 'transcript':
+            video_id = path_parts[1]
+            include_summary, summary_words = summary_options(parsed_path)
+            entry, response = self.get_cached_transcript(video_id, include_summary, summary_words)
+            if entry is not None:
+                body = entry.body
+            
+        elif len(path_parts) >= 3 and path_parts[0] == 'download':
+            video_id = path_parts[1]
+            format_type = path_parts[2]  # txt, json, srt
+            include_summary, summary_words = summary_options(parsed_path)
+            response = self.download_transcript(video_id, format_type, include_summary, summary_words)
+            
+        elif len(path_parts) >= 2 and path_parts[0] == 'share':
+            video_id = path_parts[1]
+            include_summary, summary_words = summary_options(parsed_path)
+            response = self.generate_share_link(video_id, include_summary, summary_words)
+            
+        elif len(path_parts) >= 2 and path_parts[0] == 'list':
+            video_id = path_parts[1]
+            response = self.list_ultimate_transcripts(video_id)
+            
+        elif path_parts[0] == 'jobs':
+            response = self.job_status(path_parts[1] if len(path_parts) >= 2 else None)
+            
+        elif path_parts[0] == 'health':
+            response = {'status': 'ULTIMATE SERVER RUNNING', 'features': ['Multi-language', 'Translation', 'Fallbacks', 'Summary', 'Download', 'Share', 'Copy'],
+                        'youtube_rate_limit': upstream_limits.bucket(YOUTUBE_HOST).stats(),
+                        'proxies': proxy_pool.stats(),
+                        'admission': admission.stats(),
+                        'startup': startup}
+            ready, details = health.ready()
+            response.update(ready=ready, degraded=details['degraded'], dependencies=details['dependencies'])
+            
+        else:
+            response = {'error': 'Invalid endpoint'}
+        
+        if body is None:
+            body = dumps_bytes(response)
+        return body
+    
+    def do_POST(self):
+        parsed_path = urllib.parse.urlparse(self.path)
+        path_parts = parsed_path.path.strip('/').split('/')
+        
+        if path_parts[:2] == ['batch', 'transcripts']:
+            self.batch_transcripts()
+        elif path_parts == ['jobs']:
+            self.submit_job()
+        elif path_parts == ['admin', 'profile']:
+            self.admin_profile(parsed_path)
+        elif len(path_parts) == 3 and path_parts[0] == 'jobs' and path_parts[2] == 'cancel':
+            job = job_manager.cancel(path_parts[1]) if job_manager else None
+            if job:
+                self.send_json_response(job.to_dict())
+            else:
+                self.send_json_response({'success': False, 'error': 'Job not found'}, status=404)
+        else:
+            self.send_json_response({'success': False, 'error': 'Invalid endpoint'}, status=404)
+    
+    def admin_memory(self, parsed_path):
+        """GET /admin/memory?top=15&diff=true - budget, cache footprints and tracemalloc top sites"""
+        if not is_admin(self):
+            self.send_json_response({'success': False, 'error': 'Admin access required'}, status=403)
+            return
+        query_params = urllib.parse.parse_qs(parsed_path.query)
+        report = memory_report(int(query_params.get('top', [15])[0]),
+                               query_params.get('diff', ['false'])[0].lower() == 'true')
+        report['success'] = True
+        self.send_json_response(report)
+    
+    def admin_profile(self, parsed_path):
+        """GET /admin/profile - profiler status; POST /admin/profile?seconds=30 to start, ?stop=true to stop"""
+        if not is_admin(self):
+            self.send_json_response({'success': False, 'error': 'Admin access required'}, status=403)
+            return
+        if self.command != 'POST':
+            self.send_json_response({'success': True, 'profiler': sampling_profiler.status()})
+            return
+        
+        query_params = urllib.parse.parse_qs(parsed_path.query)
+        if query_params.get('stop', ['false'])[0].lower() == 'true':
+            result = sampling_profiler.stop()
+            self.send_json_response({'success': True, 'stopped': True, 'profile': result})
+        elif sampling_profiler.start(float(query_params.get('seconds', [30])[0])):
+            self.send_json_response({'success': True, 'profiler': sampling_profiler.status()}, status=202)
+        else:
+            self.send_json_response({'success': False, 'error': 'A profile is already running',
+                                     'profiler': sampling_profiler.status()}, status=409)
+    
+    def read_json_body(self):
+        """Parse the JSON request body"""
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0:
+            raise ValueError('Request body is empty')
+        return json.loads(self.rfile.read(length))
+    
+    def send_json_response(self, response, status=200):
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(dumps_bytes(response))
+    
+    def batch_transcripts(self):
+        """POST /batch/transcripts - stream NDJSON results in completion order"""
         try:
-            ytt_api = YouTubeTranscriptApi()
-            transcript_list = ytt_api.list(video_id)
-            
-            # Method 1: Try to get any available transcript first
-            language_priorities = [
-                ['en'],  # English first
-                ['hi', 'en'],  # Hindi with English fallback
-                ['es', 'en'],  # Spanish with English fallback
-                ['fr', 'en'],  # French with English fallback
-                ['de', 'en'],  # German with English fallback
-                ['ja', 'en'],  # Japanese with English fallback
-                ['ko', 'en'],  # Korean with English fallback
-                ['zh', 'en'],  # Chinese with English fallback
-                ['ar', 'en'],  # Arabic with English fallback
-                ['ru', 'en'],  # Russian with English fallback
-                ['pt', 'en'],  # Portuguese with English fallback
-                ['it', 'en'],  # Italian with English fallback
-            ]
-            
-            original_transcript = None
-            original_lang_code = None
-            
-            for langs in language_priorities:
-                try:
-                    transcript = ytt_api.fetch(video_id, languages=langs)
-                    text = '\n'.join([snippet.text for snippet in transcript])
-                    original_transcript = text
-                    original_lang_code = transcript.language_code
-                    
-                    # If we got English directly, return it
-                    if transcript.language_code == 'en':
-                        result = {
-                            'success': True,
-                            'transcript': text,
-                            'language': 'English (Direct)',
-                            'method': 'Direct English',
-                            'video_id': video_id,
-                            'word_count': len(text.split())
-                        }
-                        if include_summary:
-                            result['summary'] = self.generate_summary(text, 'en', summary_words)
-                        return result
-                    else:
-                        # Got non-English, continue to translation methods
-                        print(f"Got {transcript.language_code} transcript, will try translation")
-                        break
-                except Exception as e:
-                    print(f"Failed to get transcript for {langs}: {e}")
-                    continue
-            
-            # Method 2: YouTube Translation (try all available transcripts)
-            if original_transcript is None:
-                # If Method 1 failed, try to get any transcript
-                for transcript_info in transcript_list:
-                    try:
-                        transcript_data = transcript_info.fetch()
-                        original_transcript = '\n'.join([snippet.text for snippet in transcript_data])
-                        original_lang_code = transcript_info.language_code
-                        print(f"Got {transcript_info.language_code} transcript as fallback")
-                        break
-                    except Exception as e:
-                        print(f"Failed to fetch {transcript_info.language}: {e}")
-                        continue
-            
-            # Now try YouTube translation if we have a non-English transcript
-            if original_transcript and original_lang_code != 'en':
-                for transcript_info in transcript_list:
-                    if transcript_info.language_code == original_lang_code and transcript_info.is_translatable:
-                        try:
-                            english_transcript = transcript_info.translate('en')
-                            transcript_data = english_transcript.fetch()
-                            text = '\n'.join([snippet.text for snippet in transcript_data])
-                            result = {
-                                'success': True,
-                                'transcript': text,
-                                'language': f'{transcript_info.language} → English (YouTube)',
-                                'method': 'YouTube Translation',
-                                'video_id': video_id,
-                                'word_count': len(text.split())
-                            }
-                            if include_summary:
-                                result['summary'] = self.generate_summary(text, 'en', summary_words)
-                            return result
-                        except Exception as e:
-                            print(f"YouTube translation failed for {transcript_info.language}: {e}")
-                            continue
-            
-            # Method 3: Google Translate as final fallback
-            if original_transcript and original_lang_code != 'en':
-                try:
-                    print(f"Trying Google Translate for {original_lang_code} transcript")
-                    # Split text into smaller chunks for better translation
-                    max_chunk_size = 3000  # Reduced chunk size
-                    chunks = [original_transcript[i:i+max_chunk_size] for i in range(0, len(original_transcript), max_chunk_size)]
-                    translated_chunks = []
-                    
-                    for i, chunk in enumerate(chunks):
-                        try:
-                            print(f"Translating chunk {i+1}/{len(chunks)}")
-                            # Auto-detect source language if needed
-                            if original_lang_code in ['auto', 'unknown']:
-                                translated = self.translator.translate(chunk, dest='en')
-                            else:
-                                translated = self.translator.translate(chunk, src=original_lang_code, dest='en')
-                            translated_chunks.append(translated.text)
-                        except Exception as chunk_error:
-                            print(f"Chunk {i+1} translation failed: {chunk_error}")
-                            # Keep original chunk if translation fails
-                            translated_chunks.append(chunk)
-                    
-                    final_text = '\n'.join(translated_chunks)
-                    
-                    # Check if translation actually worked
-                    if final_text and final_text != original_transcript:
-                        result = {
-                            'success': True,
-                            'transcript': final_text,
-                            'language': f'{original_lang_code.upper()} → English (Google)',
-                            'method': 'Google Translate',
-                            'video_id': video_id,
-                            'word_count': len(final_text.split())
-                        }
-                        if include_summary:
-                            result['summary'] = self.generate_summary(final_text, 'en', summary_words)
-                        return result
-                    
-                except Exception as e:
-                    print(f"Google translate failed: {e}")
-            
-            # Method 4: Return original transcript if all translation methods fail
-            if original_transcript:
-                print(f"Returning original {original_lang_code} transcript")
-                result = {
-                    'success': True,
-                    'transcript': original_transcript,
-                    'language': f'{original_lang_code.upper()} (Original - Translation Failed)',
-                    'method': 'Original Language',
-                    'video_id': video_id,
-                    'word_count': len(original_transcript.split())
-                }
-                if include_summary:
-                    result['summary'] = self.generate_summary(original_transcript, original_lang_code, summary_words)
-                return result
-            
-            return {
-                'success': False, 
-                'error': 'No transcripts available for this video',
-                'details': 'This video does not have captions/subtitles. Try a different video with captions enabled.',
-                'suggestions': [
+            payload = self.read_json_body()
+            items = parse_batch_request(payload)
+            workers = int(payload.get('concurrency', DEFAULT_BATCH_WORKERS))
+            client = identify_client(self.headers, self.client_address)
+        except QuotaExceeded as e:
+            self.send_json_response({'success': False, 'error': str(e)}, status=e.status)
+            return
+        except Exception as e:
+            self.send_json_response({'success': False, 'error': str(e)}, status=400)
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        
+        # Upstream calls inside the pipeline share the adaptive YouTube limiter
+        def worker(item):
+            # Pool threads do not inherit the request's context; admit and charge each item explicitly
+            return self.get_background_transcript(item['video_id'], item['summary'], item['summary_words'], client)
+        
+        started = time.time()
+        succeeded = 0
+        for index, item, result, elapsed in run_batch(items, worker, workers):
+            if result.get('success'):
+                succeeded += 1
+            line = {'index': index, 'video_id': item['video_id'], 'elapsed_ms': round(elapsed * 1000)}
+            line.update(result)
+            try:
+                self.wfile.write(dumps_bytes(line) + b'\n')
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                print("Batch client disconnected")
+                return
+        
+        summary_line = {
+            'done': True,
+            'total': len(items),
+            'succeeded': succeeded,
+            'failed': len(items) - succeeded,
+            'elapsed_ms': round((time.time() - started) * 1000)
+        }
+        self.wfile.write(dumps_bytes(summary_line) + b'\n')
+    
+    def submit_job(self):
+        """POST /jobs - start a bulk ingestion job from video_ids or a local id_file"""
+        try:
+            if job_manager is None:
+                raise ValueError('Job manager is not running')
+            payload = self.read_json_body()
+            video_ids = [extract_video_id(v) for v in payload.get('video_ids', [])]
+            if payload.get('id_file'):
+                video_ids += read_id_file(payload['id_file'])
+            options = {
+                'summary': bool(payload.get('summary', False)),
+                'summary_words': int(payload.get('summary_words', 100)),
+                # Jobs draw on the submitting client's quotas as they run
+                'client': identify_client(self.headers, self.client_address)
+            }
+            job = job_manager.submit(
+                video_ids,
+                options,
+                concurrency=int(payload.get('concurrency', 4)),
+                rate=float(payload.get('rate', os.getenv('YOUTUBE_RATE_LIMIT', 2)))
+            )
+        except QuotaExceeded as e:
+            self.send_json_response({'success': False, 'error': str(e)}, status=e.status)
+            return
+        except Exception as e:
+            self.send_json_response({'success': False, 'error': str(e)}, status=400)
+            return
+        
+        response = job.to_dict()
+        response['status_url'] = f"/jobs/{job.id}"
+        self.send_json_response(response, status=202)
+    
+    def job_status(self, job_id=None):
+        """GET /jobs or /jobs/{id} - progress, throughput and ETA"""
+        if job_manager is None:
+            return {'success': False, 'error': 'Job manager is not running'}
+        if job_id is None:
+            return {'success': True, 'jobs': [job.to_dict() for job in job_manager.list()]}
+        
+        job = job_manager.get(job_id)
+        if job is None:
+            return {'success': False, 'error': 'Job not found'}
+        response = job.to_dict()
+        response['results_file'] = job_manager.results_path(job.id)
+        return response
+    
+    def get_cached_transcript(self, video_id, include_summary=False, summary_words=100):
+        """Return (cached_entry, result), fetching and caching the transcript on a miss.
+        On failure the entry is None and result holds the error response."""
+        key = transcript_cache_key(video_id, include_summary, summary_words)
+        entry = response_cache.get(key)
+        annotate(response_cache='hit' if entry is not None else 'miss')
+        if entry is not None:
+            return entry, entry.data
+        
+        result = self.get_ultimate_transcript(video_id, include_summary, summary_words)
+        if not result.get('success'):
+            return None, result
+        return response_cache.put(key, result), result
+    
+    def get_background_transcript(self, video_id, include_summary=False, summary_words=100, client=None):
+        """get_cached_transcript for one batch or job item: admitted as low-priority background work
+        with its own memory reservation, on `client`'s quotas. Raises Overloaded when shed."""
+        with quotas.client(client), \
+                admission.request(transcript_admission_class(video_id, include_summary, summary_words),
+                                  client, background=True), \
+                memory_budget.request():
+            entry, result = self.get_cached_transcript(video_id, include_summary, summary_words)
+        return result
+    
+    def get_ultimate_transcript(self, video_id, include_summary=False, summary_words=100, cancel_event=None):
+        """Ultimate transcript extraction with multiple fallbacks (see transcript_resolver)"""
+        try:
+            resolution = resolve_transcript(video_id, cancel_event=cancel_event)
+        except ResolutionError as e:
+            result = {'success': False, 'error': str(e)}
+            if e.details:
+                result['details'] = e.details
+                result['suggestions'] = [
                     'Look for videos with CC (Closed Captions) icon',
                     'Try popular videos which usually have auto-generated captions',
                     'Check if the video is age-restricted or private'
                 ]
-            }
-            
-        except Exception as e:
+            return result
+        except ResolutionCancelled as e:
             return {'success': False, 'error': str(e)}
+        
+        charge(resolution.text, 'transcript')
+        result = resolution.to_dict()
+        if include_summary:
+            charge(resolution.text, 'summary')
+            with admission.stage('summary'):
+                if os.getenv('GEMINI_API_KEY') or os.getenv('HUGGINGFACE_API_KEY') or os.getenv('HF_TOKEN'):
+                    quotas.consume('llm_calls')
+                result['summary'] = self.generate_summary(resolution.text, resolution.language_code, summary_words)
+        return result
     
     def generate_summary(self, text, language='en', target_words=100):
         """Generate intelligent summary with multi-language support and multiple methods"""
         try:
-            print(f"Generating summary for {len(text.split())} words in {language}")
+            print(f"Generating summary for {len(text)} characters in {language}")
             
             # Method 1: Try Google Gemini API if available
-            gemini_summary = self.try_openai_summary(text, language, target_words)
+            with span('summary_gemini'):
+                gemini_summary = self.try_openai_summary(text, language, target_words)
             if gemini_summary:
                 return gemini_summary
             
             # Method 2: Try Hugging Face API if available
-            hf_summary = self.try_huggingface_summary(text, language, target_words)
+            with span('summary_huggingface'):
+                hf_summary = self.try_huggingface_summary(text, language, target_words)
             if hf_summary:
                 return hf_summary
             
             # Method 3: Fallback to extractive summary
-            return self.extractive_summary(text, language, target_words)
+            with span('summary_extractive'):
+                return self.extractive_summary(text, language, target_words)
             
         except Exception as e:
             print(f"Summary generation error: {e}")
@@ -274,12 +442,22 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
             api_key = os.getenv('GEMINI_API_KEY')
             if not api_key:
                 print("Gemini API key not found")
+                annotate(skipped='no api key')
+                return None
+            
+            # Gemini has been failing: go straight to the next provider instead of waiting on timeouts
+            if not health.allow('gemini'):
+                annotate(skipped='circuit open')
                 return None
             
             # Truncate text if too long
             max_tokens = 3000
-            if len(text.split()) > max_tokens:
-                text = ' '.join(text.split()[:max_tokens]) + '...'
+            words = text.split()
+            if len(words) > max_tokens:
+                words = words[:max_tokens]
+                text = ' '.join(words) + '...'
+            original_words = len(words)
+            del words
             
             url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={api_key}"
             
@@ -297,25 +475,32 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
             
             response = requests.post(url, json=payload, timeout=30)
             
+            health.record('gemini', ok=response.status_code == 200)
             if response.status_code == 200:
                 result = response.json()
                 if 'candidates' in result and len(result['candidates']) > 0:
                     summary_text = result['candidates'][0]['content']['parts'][0]['text'].strip()
+                    summary_words = len(summary_text.split())
                     
                     return {
                         'text': summary_text,
-                        'original_words': len(text.split()),
-                        'summary_words': len(summary_text.split()),
-                        'compression': f"{len(summary_text.split())/len(text.split())*100:.1f}%",
+                        'original_words': original_words,
+                        'summary_words': summary_words,
+                        'compression': f"{summary_words/original_words*100:.1f}%",
                         'language': language,
                         'method': 'Google Gemini'
                     }
             
             print(f"Gemini API response: {response.status_code}")
+            record_upstream_error('gemini', response.status_code)
+            annotate(status=response.status_code)
             return None
             
         except Exception as e:
             print(f"Gemini summary failed: {e}")
+            record_upstream_error('gemini', e)
+            health.record('gemini', ok=False)
+            annotate(error=type(e).__name__)
             return None
     
     def try_huggingface_summary(self, text, language, target_words=100):
@@ -328,6 +513,11 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
             hf_token = os.getenv('HUGGINGFACE_API_KEY') or os.getenv('HF_TOKEN')
             if not hf_token:
                 print("Hugging Face API key not found")
+                annotate(skipped='no api key')
+                return None
+            
+            if not health.allow('huggingface'):
+                annotate(skipped='circuit open')
                 return None
             
             # Use different models based on language
@@ -338,8 +528,12 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
             
             # Truncate text if too long
             max_length = 1000
-            if len(text.split()) > max_length:
-                text = ' '.join(text.split()[:max_length])
+            words = text.split()
+            if len(words) > max_length:
+                words = words[:max_length]
+                text = ' '.join(words)
+            original_words = len(words)
+            del words
             
             headers = {"Authorization": f"Bearer {hf_token}"}
             
@@ -357,25 +551,32 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
                 timeout=30
             )
             
+            health.record('huggingface', ok=response.status_code == 200)
             if response.status_code == 200:
                 result = response.json()
                 if isinstance(result, list) and len(result) > 0:
                     summary_text = result[0].get('summary_text', '')
+                    summary_words = len(summary_text.split())
                     
                     return {
                         'text': summary_text,
-                        'original_words': len(text.split()),
-                        'summary_words': len(summary_text.split()),
-                        'compression': f"{len(summary_text.split())/len(text.split())*100:.1f}%",
+                        'original_words': original_words,
+                        'summary_words': summary_words,
+                        'compression': f"{summary_words/original_words*100:.1f}%",
                         'language': language,
                         'method': 'Hugging Face BART'
                     }
             
             print(f"HF API response: {response.status_code}")
+            record_upstream_error('huggingface', response.status_code)
+            annotate(status=response.status_code)
             return None
             
         except Exception as e:
             print(f"Hugging Face summary failed: {e}")
+            record_upstream_error('huggingface', e)
+            health.record('huggingface', ok=False)
+            annotate(error=type(e).__name__)
             return None
     
     def extractive_summary(self, text, language, target_words=100):
@@ -486,26 +687,29 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
         """Generate downloadable transcript in various formats"""
         try:
             # Get transcript data
-            transcript_data = self.get_ultimate_transcript(video_id, include_summary, summary_words)
-            
-            if not transcript_data.get('success'):
+            entry, transcript_data = self.get_cached_transcript(video_id, include_summary, summary_words)
+            if entry is None:
                 return transcript_data
+            charge(entry.body, 'download')
             
             timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"transcript_{video_id}_{timestamp}"
             
             if format_type.lower() == 'txt':
-                content = self.format_as_txt(transcript_data)
+                with span('format_txt'):
+                    content = self.format_as_txt(transcript_data).encode('utf-8')
                 filename += '.txt'
                 mime_type = 'text/plain'
                 
             elif format_type.lower() == 'json':
-                content = json.dumps(transcript_data, indent=2, ensure_ascii=False)
+                # Indented bytes are serialized once per cached transcript
+                content = entry.pretty
                 filename += '.json'
                 mime_type = 'application/json'
                 
             elif format_type.lower() == 'srt':
-                content = self.format_as_srt(transcript_data)
+                with span('format_srt'):
+                    content = self.format_as_srt(transcript_data).encode('utf-8')
                 filename += '.srt'
                 mime_type = 'text/plain'
                 
@@ -513,7 +717,7 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
                 return {'success': False, 'error': 'Invalid format. Use txt, json, or srt'}
             
             # Encode content for download
-            content_b64 = base64.b64encode(content.encode('utf-8')).decode('utf-8')
+            content_b64 = base64.b64encode(content).decode('ascii')
             
             return {
                 'success': True,
@@ -532,6 +736,8 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
                 }
             }
             
+        except (MemoryBudgetExceeded, Overloaded, QuotaExceeded):
+            raise
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -589,10 +795,10 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
         """Generate shareable link and copy-ready content"""
         try:
             # Get transcript data
-            transcript_data = self.get_ultimate_transcript(video_id, include_summary, summary_words)
-            
-            if not transcript_data.get('success'):
+            entry, transcript_data = self.get_cached_transcript(video_id, include_summary, summary_words)
+            if entry is None:
                 return transcript_data
+            charge(transcript_data.get('transcript', ''), 'share')
             
             # Generate share URL
             base_url = "http://localhost:5000"
@@ -638,24 +844,17 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
                 }
             }
             
+        except (MemoryBudgetExceeded, Overloaded, QuotaExceeded):
+            raise
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
     def list_ultimate_transcripts(self, video_id):
         """List all available transcripts with enhanced info"""
         try:
-            ytt_api = YouTubeTranscriptApi()
-            transcript_list = ytt_api.list(video_id)
-            
-            languages = []
-            for transcript in transcript_list:
-                languages.append({
-                    'language': transcript.language,
-                    'code': transcript.language_code,
-                    'generated': transcript.is_generated,
-                    'translatable': transcript.is_translatable,
-                    'can_translate_to_english': transcript.is_translatable or transcript.language_code == 'en'
-                })
+            languages = resolver.list_languages(video_id)
+            for lang in languages:
+                lang['can_translate_to_english'] = lang['translatable'] or lang['code'] == 'en'
             
             return {
                 'success': True,
@@ -673,12 +872,33 @@ class UltimateTranscriptHandler(http.server.BaseHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Request-ID, X-Profile, X-API-Key, X-Install-ID')
         self.end_headers()
     
     def log_message(self, format, *args):
         pass
 
+class TranscriptWorker(UltimateTranscriptHandler):
+    """Runs the transcript pipeline outside of an HTTP request (bulk jobs)"""
+    def __init__(self):
+        # Not bound to a connection, so skip BaseHTTPRequestHandler's request handling
+        pass
+    
+    def run_job_item(self, video_id, options):
+        # A job has no caller waiting on it: when shed, wait and retry rather than fail the item
+        for attempt in range(JOB_ADMISSION_ATTEMPTS):
+            try:
+                return self.get_background_transcript(video_id, options.get('summary', False),
+                                                      options.get('summary_words', 100), options.get('client'))
+            except Overloaded as e:
+                if attempt == JOB_ADMISSION_ATTEMPTS - 1:
+                    raise
+                time.sleep(e.retry_after)
+
+class ThreadedServer(socketserver.ThreadingTCPServer):
+    """One thread per connection so a long batch stream does not block other requests"""
+    daemon_threads = True
+
 if __name__ == '__main__':
     PORT = 5000
     
@@ -694,19 +914,46 @@ if __name__ == '__main__':
     print("✓ Hindi/English/Multi-language summaries")
     print("=" * 60)
     print(f"Server running on http://localhost:{PORT}")
+    print(f"JSON serializer: {backend_name()}")
+    print(f"Proxy pool: {len(proxy_pool)} proxies" if len(proxy_pool) else "Proxy pool: direct connection")
+    print(f"Admission: {'on' if admission.enabled else 'off'}, "
+          f"{admission.max_concurrency} concurrent requests (cached > fetch > translate > summary > audio)")
     print("\nAPI Endpoints:")
     print(f"• Transcript: /transcript/{{video_id}}?summary=true&summary_words=150")
     print(f"• Download:   /download/{{video_id}}/{{format}}")
     print(f"• Share:      /share/{{video_id}}")
     print(f"• Languages:  /list/{{video_id}}")
-    print(f"• Health:     /health")
+    print(f"• Batch:      POST /batch/transcripts (NDJSON stream)")
+    print(f"• Jobs:       POST /jobs, GET /jobs/{{job_id}}")
+    print(f"• Health:     /health, /livez (liveness), /readyz (readiness)")
+    print(f"• Metrics:    /metrics (Prometheus)")
+    print(f"• Profiler:   POST /admin/profile?seconds=30, GET /admin/profile")
+    print(f"• Memory:     /admin/memory?diff=true")
+    print(f"• Quota:      /quota (remaining allowance for X-API-Key / X-Install-ID)")
     print("\nFormats: txt, json, srt")
     print("Summary words: 50-500 (default: 100)")
     print("Press Ctrl+C to stop")
     print("=" * 60)
     
+    job_manager = JobManager(TranscriptWorker().run_job_item, os.getenv('JOBS_DIR', 'jobs'))
+    # Reloading checkpoints and results can take a while; serve requests meanwhile
+    threading.Thread(target=job_manager.resume_all, name='resume-jobs', daemon=True).start()
+    register_in_flight('jobs', lambda: sum(1 for job in job_manager.list() if job.status == 'running'))
+    if start_tracing():
+        print("🧠 tracemalloc enabled (MEMORY_TRACE=1): GET /admin/memory for top allocation sites")
+    restored = quotas.start()
+    if restored is not None:
+        print(f"🎟️  Quotas saved to {quotas.state_file} ({restored} clients restored)")
+    if health.start():
+        print(f"🩺 Dependency probes every {health.interval:.0f}s")
+    if install_signal_handler(sampling_profiler):
+        print(f"🔬 kill -USR2 {os.getpid()} toggles the sampling profiler")
+    
     try:
-        with socketserver.TCPServer(("", PORT), UltimateTranscriptHandler) as httpd:
+        with ThreadedServer(("", PORT), UltimateTranscriptHandler) as httpd:
+            startup['ready_ms'] = round((time.perf_counter() - STARTED) * 1000, 1)
+            health.accepting = True
+            print(f"⏱️  Startup: imports {startup['imports_ms']} ms, listening after {startup['ready_ms']} ms")
             httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nServer stopped")
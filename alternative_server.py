@@ -5,52 +5,25 @@ Alternative server using yt-dlp for transcript extraction
 
 import http.server
 import socketserver
-import json
+from fast_json import dumps_bytes
 import urllib.parse
-import subprocess
 import re
+from scratch import start_janitor
+from ytdlp_pool import YTDLP_AVAILABLE
+from subtitle_index import subtitle_index
+from metrics import MetricsMixin
+from transcript_resolver import TranscriptResolver, ResolutionError, ytdlp_subtitles
 
-def get_transcript_with_ytdlp(video_id):
-    """Extract transcript using yt-dlp as fallback"""
+# Same resolution engine as the other servers, with the yt-dlp subtitle index as its only strategy
+ytdlp_resolver = TranscriptResolver([ytdlp_subtitles], name='ytdlp_transcripts')
+
+def get_transcript_with_ytdlp(video_id, language='en'):
+    """Extract transcript using yt-dlp as fallback.
+    The first request for a video harvests every subtitle track in one yt-dlp run;
+    later requests (any language) are served from the local subtitle index."""
     try:
-        url = f"https://www.youtube.com/watch?v={video_id}"
-        cmd = ["yt-dlp", "--write-auto-sub", "--write-sub", "--sub-lang", "en", "--skip-download", "--print", "%(title)s", url]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0:
-            # Look for subtitle files
-            import os
-            import glob
-            
-            # Find subtitle files
-            sub_files = glob.glob(f"*{video_id}*.vtt") + glob.glob(f"*{video_id}*.srt")
-            
-            if sub_files:
-                with open(sub_files[0], 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Clean VTT/SRT format
-                lines = content.split('\n')
-                text_lines = []
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('WEBVTT') and not '-->' in line and not line.isdigit():
-                        # Remove HTML tags
-                        line = re.sub(r'<[^>]+>', '', line)
-                        if line:
-                            text_lines.append(line)
-                
-                # Cleanup files
-                for f in sub_files:
-                    try:
-                        os.remove(f)
-                    except:
-                        pass
-                
-                return '\n'.join(text_lines)
-        
-        return None
-    except Exception as e:
+        return ytdlp_resolver.resolve(video_id, language).text
+    except ResolutionError as e:
         print(f"yt-dlp failed: {e}")
         return None
 
@@ -89,12 +62,19 @@ def summarize_text(text, max_words=1500):
     
     return summary
 
-class AlternativeHandler(http.server.BaseHTTPRequestHandler):
+class AlternativeHandler(MetricsMixin, http.server.BaseHTTPRequestHandler):
+    metrics_server = 'alternative'
+    metrics_endpoints = ('transcript', 'list', 'summary', 'health')
+    
     def do_GET(self):
         try:
             parsed_path = urllib.parse.urlparse(self.path)
             path_parts = parsed_path.path.strip('/').split('/')
             
+            if path_parts[0] == 'metrics':
+                self.send_metrics()
+                return
+            
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
@@ -104,21 +84,40 @@ class AlternativeHandler(http.server.BaseHTTPRequestHandler):
             
             if len(path_parts) >= 2 and path_parts[0] == 'transcript':
                 video_id = path_parts[1]
-                text = get_transcript_with_ytdlp(video_id)
+                query_params = urllib.parse.parse_qs(parsed_path.query)
+                language = query_params.get('lang', ['en'])[0]
+                text = get_transcript_with_ytdlp(video_id, language)
                 
                 if text:
                     response = {
                         'success': True,
                         'transcript': text,
-                        'language': 'English (yt-dlp)',
+                        'language': 'English (yt-dlp)' if language == 'en' else f'{language} (yt-dlp)',
                         'video_id': video_id
                     }
                 else:
                     response = {
                         'success': False,
-                        'error': 'No transcript available via yt-dlp'
+                        'error': 'No transcript available via yt-dlp',
+                        'available_languages': subtitle_index.languages(video_id)
                     }
                     
+            elif len(path_parts) >= 2 and path_parts[0] == 'list':
+                video_id = path_parts[1]
+                if not subtitle_index.has(video_id):
+                    subtitle_index.harvest(video_id, skip_if_indexed=True)
+                manifest = subtitle_index.manifest(video_id) or {'languages': {}}
+                languages = [
+                    {'code': code, 'captions': info['captions'], 'words': info['words']}
+                    for code, info in sorted(manifest['languages'].items())
+                ]
+                response = {
+                    'success': True,
+                    'languages': languages,
+                    'video_id': video_id,
+                    'english_available': any(lang['code'] == 'en' and lang['captions'] for lang in languages)
+                }
+                    
             elif len(path_parts) >= 2 and path_parts[0] == 'summary':
                 video_id = path_parts[1]
                 query_params = urllib.parse.parse_qs(parsed_path.query)
@@ -147,14 +146,14 @@ class AlternativeHandler(http.server.BaseHTTPRequestHandler):
             else:
                 response = {'error': 'Invalid endpoint'}
             
-            self.wfile.write(json.dumps(response).encode())
+            self.wfile.write(dumps_bytes(response))
             
         except Exception as e:
             error_response = {
                 'success': False,
                 'error': f'Server error: {str(e)}'
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.wfile.write(dumps_bytes(error_response))
     
     def do_OPTIONS(self):
         self.send_response(200)
@@ -166,16 +165,24 @@ class AlternativeHandler(http.server.BaseHTTPRequestHandler):
     def log_message(self, format, *args):
         pass
 
+class ThreadedServer(socketserver.ThreadingTCPServer):
+    """One thread per connection so slow yt-dlp jobs do not block other requests"""
+    daemon_threads = True
+
 if __name__ == '__main__':
     PORT = 5001
     
     print("Starting Alternative YouTube Transcript Server (yt-dlp)...")
     print(f"Server running on http://localhost:{PORT}")
     print("This server uses yt-dlp to bypass IP blocks")
+    print(f"yt-dlp worker pool: {'in-process workers' if YTDLP_AVAILABLE else 'command line fallback'}")
     print("Press Ctrl+C to stop")
     
+    # Clear scratch directories left behind by crashed runs, then keep checking
+    start_janitor()
+    
     try:
-        with socketserver.TCPServer(("", PORT), AlternativeHandler) as httpd:
+        with ThreadedServer(("", PORT), AlternativeHandler) as httpd:
             httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nServer stopped")
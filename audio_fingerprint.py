@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Audio fingerprints for spotting re-uploads and mirrors
+Landmark hashes: spectral peaks of 8 kHz audio are paired into
+(f1, f2, dt) hashes. The index remembers every hash of a transcribed video,
+so a new upload whose audio lines up with a known one reuses its transcript
+instead of going through download-and-recognize again.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from fast_json import dumps_bytes
+
+try:
+    import numpy as np
+    FINGERPRINT_AVAILABLE = True
+except ImportError:
+    FINGERPRINT_AVAILABLE = False
+
+FINGERPRINT_RATE = 8000
+WINDOW = 1024             # 128 ms FFT window at 8 kHz
+HOP = 512                 # 64 ms between frames
+FRAME_SECONDS = HOP / FINGERPRINT_RATE
+# Frequency bands (FFT bins) that each contribute at most one peak per frame
+BANDS = [(10, 20), (20, 40), (40, 80), (80, 160), (160, 512)]
+PEAK_FLOOR = 50.0         # ignore peaks in (near) silence
+PEAK_NEIGHBOURS = 2       # frames on each side a peak must beat
+FAN_OUT = 5               # peaks paired with each anchor
+TARGET_FRAMES = 32        # pair with peaks up to ~2 s later
+
+# A stream is looked up at FIRST_CHECK seconds, then at twice that, ... up to PROBE_SECONDS
+PROBE_SECONDS = float(os.getenv('FINGERPRINT_PROBE_SECONDS', 180))
+PROBE_FIRST_CHECK_SECONDS = float(os.getenv('FINGERPRINT_FIRST_CHECK_SECONDS', 15))
+MIN_MATCHES = int(os.getenv('FINGERPRINT_MIN_MATCHES', 40))
+MIN_MATCH_RATIO = 0.02
+# Aligned hits must be spread over this share of the probe, so a shared
+# title sequence alone never counts as the same episode
+MIN_SPAN_RATIO = 0.5
+
+
+def _to_fingerprint_rate(pcm, sample_rate):
+    samples = np.frombuffer(pcm[:len(pcm) - len(pcm) % 2], dtype='<i2').astype(np.float32)
+    if sample_rate == FINGERPRINT_RATE or not len(samples):
+        return samples
+    if sample_rate % FINGERPRINT_RATE == 0:
+        factor = sample_rate // FINGERPRINT_RATE
+        count = len(samples) // factor
+        return samples[:count * factor].reshape(count, factor).mean(axis=1)
+    positions = np.arange(0, len(samples), sample_rate / FINGERPRINT_RATE)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _frame_peaks(samples, first_frame=0, emit=None):
+    """[(frame, bin), ...] band peaks for the whole frames of 8 kHz samples.
+
+    `emit` = (start, stop) limits the output to those local frames; the others
+    only serve as neighbours, so a stream can be processed block by block.
+    """
+    count = (len(samples) - WINDOW) // HOP + 1
+    if count <= 0:
+        return []
+    start, stop = emit or (0, count)
+    index = np.arange(WINDOW)[None, :] + HOP * np.arange(count)[:, None]
+    spectrum = np.abs(np.fft.rfft(samples[index] * np.hanning(WINDOW), axis=1))
+    peaks = []
+    for low, high in BANDS:
+        band = spectrum[:, low:high]
+        bins = band.argmax(axis=1)
+        values = band[np.arange(count), bins]
+        # Keep a band peak only if it is also the loudest of its neighbouring frames
+        padded = np.pad(values, PEAK_NEIGHBOURS, mode='constant')
+        neighbourhood = np.max([padded[i:i + count] for i in range(2 * PEAK_NEIGHBOURS + 1)], axis=0)
+        # A maximum sitting on the band edge is leakage from the next band, not a peak
+        interior = (bins > 0) & (bins < high - low - 1)
+        keep = (values > PEAK_FLOOR) & (values >= neighbourhood) & interior
+        for frame in np.nonzero(keep[start:stop])[0] + start:
+            peaks.append((first_frame + int(frame), low + int(bins[frame])))
+    peaks.sort()
+    return peaks
+
+
+def _pair_peaks(peaks, anchors_until=None):
+    """Landmark hashes [(hash, anchor_frame), ...] for anchors before `anchors_until`"""
+    hashes = []
+    for i, (t1, f1) in enumerate(peaks):
+        if anchors_until is not None and t1 >= anchors_until:
+            break
+        paired = 0
+        for t2, f2 in peaks[i + 1:]:
+            dt = t2 - t1
+            if dt > TARGET_FRAMES:
+                break
+            if dt == 0:
+                continue
+            hashes.append(((f1 << 16) | (f2 << 6) | dt, t1))
+            paired += 1
+            if paired == FAN_OUT:
+                break
+    return hashes
+
+
+class Fingerprinter:
+    """Incremental fingerprint of a mono 16-bit PCM stream (feed chunks, then flush)"""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.pending = b''
+        self.samples = np.zeros(0, dtype=np.float32)
+        self.base_frame = 0   # frame number of self.samples[0]
+        self.next_frame = 0   # first frame whose peaks are not known yet
+        self.peaks = []
+        self.hashes = []
+        self.seconds = 0.0
+
+    def _peaks(self, final):
+        """Collect peaks of buffered frames before local frame `final`"""
+        count = (len(self.samples) - WINDOW) // HOP + 1
+        start = self.next_frame - self.base_frame
+        if final <= start:
+            return
+        self.peaks += _frame_peaks(self.samples[:(count - 1) * HOP + WINDOW], self.base_frame, (start, final))
+        self.next_frame = self.base_frame + final
+        # Keep the frames the next block needs as left-hand neighbours
+        new_base = max(0, self.next_frame - PEAK_NEIGHBOURS)
+        self.samples = self.samples[(new_base - self.base_frame) * HOP:]
+        self.base_frame = new_base
+
+    def _hash(self, anchors_until=None):
+        self.hashes += _pair_peaks(self.peaks, anchors_until)
+        self.peaks = [peak for peak in self.peaks if anchors_until is not None and peak[0] >= anchors_until]
+
+    def feed(self, pcm):
+        data = self.pending + pcm
+        # Keep whole groups of input samples so downsampling stays aligned
+        group = 2 * max(1, self.sample_rate // FINGERPRINT_RATE)
+        usable = len(data) - len(data) % group
+        self.pending = data[usable:]
+        self.seconds += usable / (2 * self.sample_rate)
+        self.samples = np.concatenate([self.samples, _to_fingerprint_rate(data[:usable], self.sample_rate)])
+
+        # The last frames wait until their right-hand neighbours arrive
+        count = (len(self.samples) - WINDOW) // HOP + 1
+        self._peaks(count - PEAK_NEIGHBOURS)
+        # Anchors whose whole target zone has been seen can be hashed now
+        self._hash(self.next_frame - TARGET_FRAMES)
+
+    def flush(self):
+        count = (len(self.samples) - WINDOW) // HOP + 1
+        self._peaks(count)
+        self._hash()
+        return self.hashes
+
+
+def fingerprint(pcm, sample_rate):
+    """Landmark hashes [(hash, frame), ...] of a whole mono 16-bit PCM buffer"""
+    fingerprinter = Fingerprinter(sample_rate)
+    fingerprinter.feed(pcm)
+    return fingerprinter.flush()
+
+
+class FingerprintIndex:
+    """Hashes and transcript per video as <root>/<video_id>.json, with an in-memory inverted index"""
+
+    def __init__(self, root=os.getenv('FINGERPRINT_INDEX_DIR', 'fingerprint_index')):
+        self.root = root
+        self.lock = threading.Lock()
+        self._postings = None  # hash -> [(video_id, frame), ...], built on first lookup
+
+    def _path(self, video_id):
+        return os.path.join(self.root, f'{video_id}.json')
+
+    def _load_postings(self):
+        postings = defaultdict(list)
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.root, name), 'r', encoding='utf-8') as f:
+                        record = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                for value, frame in record['hashes']:
+                    postings[value].append((record['video_id'], frame))
+        return postings
+
+    def get(self, video_id):
+        try:
+            with open(self._path(video_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def add(self, video_id, hashes, transcript, duration=None, matched=None):
+        record = {
+            'video_id': video_id,
+            'transcript': transcript,
+            'duration': round(duration, 1) if duration else None,
+            'matched': matched,
+            'created_at': time.time(),
+            'hashes': hashes
+        }
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path(video_id) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(dumps_bytes(record))
+        os.replace(tmp_path, self._path(video_id))
+        with self.lock:
+            if self._postings is not None:
+                for value, frame in hashes:
+                    self._postings[value].append((video_id, frame))
+
+    def match(self, hashes, exclude=None):
+        """Best known video whose audio lines up with `hashes`: {'video_id', 'score', ...} or None"""
+        if not hashes:
+            return None
+        with self.lock:
+            if self._postings is None:
+                self._postings = self._load_postings()
+            # Votes per (video, time offset); true matches pile up on one offset
+            votes = Counter()
+            hits = []
+            for value, frame in hashes:
+                for video_id, known_frame in self._postings.get(value, ()):
+                    if video_id != exclude:
+                        votes[video_id, known_frame - frame] += 1
+                        hits.append((video_id, known_frame - frame, frame))
+        if not votes:
+            return None
+
+        # Neighbouring offsets are the same alignment off by one frame
+        merged = Counter()
+        for (video_id, offset), count in votes.items():
+            merged[video_id, offset] = count + votes.get((video_id, offset - 1), 0) + votes.get((video_id, offset + 1), 0)
+        (video_id, offset), score = merged.most_common(1)[0]
+        if score < MIN_MATCHES or score < MIN_MATCH_RATIO * len(hashes):
+            return None
+
+        frames = [frame for vid, hit_offset, frame in hits if vid == video_id and abs(hit_offset - offset) <= 1]
+        probe_frames = max(frame for _, frame in hashes) - min(frame for _, frame in hashes)
+        if max(frames) - min(frames) < MIN_SPAN_RATIO * probe_frames:
+            return None
+        return {
+            'video_id': video_id,
+            'score': score,
+            'ratio': round(score / len(hashes), 3),
+            'offset_seconds': round(offset * FRAME_SECONDS, 2)
+        }
+
+
+class ProbeMatched(Exception):
+    """Raised out of a StreamProbe to stop the consumer: the audio belongs to a known video"""
+
+    def __init__(self, match):
+        super().__init__(f"audio matches {match['video_id']}")
+        self.match = match
+
+
+class StreamProbe:
+    """Passes a PCM chunk stream through while fingerprinting it.
+
+    The caller transcribes the chunks as they come; meanwhile the fingerprint
+    is looked up after PROBE_FIRST_CHECK_SECONDS, then at doubling intervals
+    up to `probe_seconds`. On a match that `accept(match)` approves, the
+    iteration raises ProbeMatched, which stops the recognizer. The whole
+    stream is fingerprinted either way, so it can be indexed afterwards.
+    """
+
+    def __init__(self, chunks, sample_rate, index, probe_seconds=PROBE_SECONDS, exclude=None,
+                 first_check=PROBE_FIRST_CHECK_SECONDS, accept=None):
+        self.chunks = chunks
+        self.fingerprinter = Fingerprinter(sample_rate)
+        self.index = index
+        self.probe_seconds = probe_seconds
+        self.exclude = exclude
+        self.first_check = first_check
+        self.accept = accept
+        self.checks = 0
+
+    def __iter__(self):
+        next_check = min(self.first_check, self.probe_seconds)
+        for chunk in self.chunks:
+            self.fingerprinter.feed(chunk)
+            if next_check is not None and self.fingerprinter.seconds >= next_check:
+                self.checks += 1
+                match = self.index.match(self.fingerprinter.hashes, exclude=self.exclude)
+                if match and (self.accept is None or self.accept(match)):
+                    raise ProbeMatched(match)
+                next_check = min(next_check * 2, self.probe_seconds) if next_check < self.probe_seconds else None
+            yield chunk
+
+
+fingerprint_index = FingerprintIndex()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Chunked, parallel audio transcription
+Splits PCM audio into overlapping segments on quiet points, recognizes the
+segments concurrently and stitches the text back together in order with
+timestamps. Recognizer backends are pluggable so tests can run offline.
+"""
+
+import array
+import math
+import os
+import sys
+import wave
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import speech_recognition as sr
+    SPEECH_RECOGNITION = True
+except ImportError:
+    SPEECH_RECOGNITION = False
+
+FRAME_SECONDS = 0.02  # energy is measured on 20 ms frames
+TARGET_SEGMENT_SECONDS = 30.0
+MAX_SEGMENT_SECONDS = 45.0
+MIN_SEGMENT_SECONDS = 10.0
+OVERLAP_SECONDS = 0.5
+DEFAULT_WORKERS = int(os.getenv('TRANSCRIBE_WORKERS', 4))
+
+# Voice activity detection (needs NumPy; without it every segment is sent as is)
+VAD_ENABLED = os.getenv('VAD', '1') != '0'
+VAD_MIN_ENERGY = 300.0      # RMS below this is silence whatever the noise floor
+VAD_ENERGY_RATIO = 3.0      # speech must be this much louder than the quietest 10% of frames
+VAD_ZCR_WINDOW = 1.0        # seconds over which the zero-crossing rate must vary
+VAD_ZCR_STD = 0.04          # speech alternates voiced/unvoiced sounds; music beds stay steady
+VAD_PAD_SECONDS = 0.3       # kept around every speech region so word edges survive
+VAD_MIN_GAP_SECONDS = 0.5   # shorter pauses are kept
+VAD_JOIN_SECONDS = 0.1      # silence inserted between kept regions
+
+
+class PCMAudio:
+    """Mono 16-bit little-endian PCM plus its sample rate"""
+
+    sample_width = 2
+
+    def __init__(self, data, sample_rate):
+        self.data = data
+        self.sample_rate = sample_rate
+
+    @property
+    def duration(self):
+        return len(self.data) / (self.sample_width * self.sample_rate)
+
+    def slice(self, start, end):
+        """PCM bytes between two times in seconds"""
+        first = int(start * self.sample_rate) * self.sample_width
+        last = int(end * self.sample_rate) * self.sample_width
+        return self.data[first:last]
+
+
+def _samples(data):
+    samples = array.array('h')
+    samples.frombytes(data[:len(data) - len(data) % 2])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples
+
+
+def to_mono16(data, channels, sample_width):
+    """Convert interleaved PCM of any width/channel count to mono 16-bit"""
+    if sample_width != 2:
+        if sample_width == 1:
+            # 8-bit WAV is unsigned
+            data = bytes(((b - 128) & 0xFF) for b in data)
+        step = sample_width
+        data = b''.join(data[i + step - 2:i + step] if step > 1 else bytes([0, data[i]])
+                        for i in range(0, len(data) - step + 1, step))
+    if channels == 1:
+        return data
+    if NUMPY_AVAILABLE:
+        samples = np.frombuffer(data, dtype='<i2').reshape(-1, channels)
+        return samples.mean(axis=1).astype('<i2').tobytes()
+    samples = _samples(data)
+    mono = array.array('h', (sum(samples[i:i + channels]) // channels
+                             for i in range(0, len(samples) - channels + 1, channels)))
+    if sys.byteorder == 'big':
+        mono.byteswap()
+    return mono.tobytes()
+
+
+def read_wav(path):
+    """Load a WAV file as mono 16-bit PCMAudio"""
+    with wave.open(path, 'rb') as wav:
+        channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        sample_rate = wav.getframerate()
+        data = wav.readframes(wav.getnframes())
+    return PCMAudio(to_mono16(data, channels, sample_width), sample_rate)
+
+
+def frame_energies(audio, frame_seconds=FRAME_SECONDS):
+    """RMS energy of every whole frame"""
+    frame_samples = max(1, int(audio.sample_rate * frame_seconds))
+    if NUMPY_AVAILABLE:
+        samples = np.frombuffer(audio.data[:len(audio.data) - len(audio.data) % 2], dtype='<i2')
+        count = len(samples) // frame_samples
+        frames = samples[:count * frame_samples].astype(np.float32).reshape(count, frame_samples)
+        return np.sqrt((frames * frames).mean(axis=1)).tolist()
+    samples = _samples(audio.data)
+    energies = []
+    for i in range(0, len(samples) - frame_samples + 1, frame_samples):
+        frame = samples[i:i + frame_samples]
+        energies.append(math.sqrt(sum(s * s for s in frame) / frame_samples))
+    return energies
+
+
+def speech_regions(audio, frame_seconds=FRAME_SECONDS):
+    """[(start, end), ...] in seconds where `audio` sounds like speech.
+
+    A frame counts as speech when it is loud compared with the quietest frames
+    and its zero-crossing rate varies over the surrounding second (speech keeps
+    switching between voiced and unvoiced sounds, steady music does not).
+    Regions are padded and short pauses bridged.
+    """
+    if not NUMPY_AVAILABLE:
+        return [(0.0, audio.duration)]
+    frame_samples = max(1, int(audio.sample_rate * frame_seconds))
+    samples = np.frombuffer(audio.data[:len(audio.data) - len(audio.data) % 2], dtype='<i2')
+    count = len(samples) // frame_samples
+    if count == 0:
+        return []
+    frames = samples[:count * frame_samples].astype(np.float32).reshape(count, frame_samples)
+    energy = np.sqrt((frames * frames).mean(axis=1))
+    signs = np.signbit(frames)
+    zcr = (signs[:, 1:] != signs[:, :-1]).mean(axis=1)
+
+    # Moving standard deviation of the zero-crossing rate via cumulative sums
+    window = max(1, int(VAD_ZCR_WINDOW / frame_seconds))
+    padded = np.pad(zcr, (window // 2, window - window // 2 - 1), mode='edge').astype(np.float64)
+    sums = np.concatenate([[0.0], np.cumsum(padded)])
+    squares = np.concatenate([[0.0], np.cumsum(padded * padded)])
+    mean = (sums[window:] - sums[:-window]) / window
+    zcr_std = np.sqrt(np.maximum((squares[window:] - squares[:-window]) / window - mean * mean, 0))
+
+    threshold = max(VAD_MIN_ENERGY, float(np.percentile(energy, 10)) * VAD_ENERGY_RATIO)
+    speech = (energy > threshold) & (zcr_std > VAD_ZCR_STD)
+
+    # Pad every speech frame, which also bridges short pauses
+    pad = int(VAD_PAD_SECONDS / frame_seconds)
+    gap = int(VAD_MIN_GAP_SECONDS / frame_seconds)
+    reach = max(pad, gap // 2)
+    kernel = np.ones(2 * reach + 1)
+    speech = np.convolve(speech.astype(np.float32), kernel, mode='same') > 0
+
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], speech.astype(np.int8), [0]])))
+    step = frame_samples / audio.sample_rate
+    return [(round(start * step, 3), round(min(end * step, audio.duration), 3))
+            for start, end in zip(edges[::2], edges[1::2])]
+
+
+def keep_speech(audio):
+    """(pcm, regions): only the speech regions of `audio`, joined by short silences"""
+    regions = speech_regions(audio)
+    if regions == [(0.0, audio.duration)]:
+        return audio.data, regions
+    join = bytes(int(VAD_JOIN_SECONDS * audio.sample_rate) * audio.sample_width)
+    return join.join(audio.slice(start, end) for start, end in regions), regions
+
+
+class StreamingSegmenter:
+    """Incremental silence-aligned segmenter for a stream of mono 16-bit PCM.
+
+    feed() takes arbitrary byte chunks and yields (start, end, pcm) segments as
+    soon as enough audio is buffered; at most `maximum` seconds are held at once.
+    Each cut lands on the quietest frame between `minimum` and `maximum` seconds,
+    preferring `target`, and segments overlap by `overlap` seconds.
+    """
+
+    def __init__(self, sample_rate, target=TARGET_SEGMENT_SECONDS, maximum=MAX_SEGMENT_SECONDS,
+                 minimum=MIN_SEGMENT_SECONDS, overlap=OVERLAP_SECONDS):
+        self.sample_rate = sample_rate
+        self.frame_samples = max(1, int(sample_rate * FRAME_SECONDS))
+        self.frame_bytes = self.frame_samples * PCMAudio.sample_width
+        self.frame_seconds = self.frame_samples / sample_rate
+        self.min_frames = int(minimum / self.frame_seconds)
+        self.max_frames = int(maximum / self.frame_seconds)
+        self.target_frame = target / self.frame_seconds
+        self.overlap_bytes = int(overlap / self.frame_seconds) * self.frame_bytes
+        self.pending = bytearray()  # bytes that do not fill a whole frame yet
+        self.buffer = bytearray()
+        self.energies = []
+        self.offset = 0.0
+
+    def _segment(self, data):
+        start = self.offset
+        return start, start + len(data) / (self.sample_rate * PCMAudio.sample_width), data
+
+    def feed(self, data):
+        self.pending += data
+        usable = len(self.pending) - len(self.pending) % self.frame_bytes
+        if usable:
+            chunk = bytes(self.pending[:usable])
+            del self.pending[:usable]
+            self.buffer += chunk
+            self.energies += frame_energies(PCMAudio(chunk, self.sample_rate), self.frame_seconds)
+
+        while len(self.energies) > self.max_frames:
+            best = min(range(self.min_frames, self.max_frames),
+                       key=lambda i: (self.energies[i], abs(i - self.target_frame)))
+            cut = best * self.frame_bytes
+            yield self._segment(bytes(self.buffer[:cut + self.overlap_bytes]))
+            del self.buffer[:cut]
+            del self.energies[:best]
+            self.offset += best * self.frame_seconds
+
+    def flush(self):
+        """Yield whatever is left at the end of the stream"""
+        self.buffer += self.pending
+        self.pending = bytearray()
+        if self.buffer:
+            yield self._segment(bytes(self.buffer))
+        self.buffer = bytearray()
+        self.energies = []
+
+
+def plan_segments(audio, **options):
+    """Return [(start, end), ...] for a whole PCMAudio"""
+    segmenter = StreamingSegmenter(audio.sample_rate, **options)
+    segments = list(segmenter.feed(audio.data)) + list(segmenter.flush())
+    return [(start, end) for start, end, _ in segments]
+
+
+# --- Recognizer backends -------------------------------------------------
+
+class GoogleRecognizer:
+    """speech_recognition's free Google Web Speech endpoint"""
+
+    def __init__(self, language='en-US'):
+        if not SPEECH_RECOGNITION:
+            raise RuntimeError('Speech recognition not available. Install: pip install SpeechRecognition')
+        self.language = language
+        self.recognizer = sr.Recognizer()
+
+    def recognize(self, pcm, sample_rate, sample_width=2):
+        audio_data = sr.AudioData(pcm, sample_rate, sample_width)
+        try:
+            return self.recognizer.recognize_google(audio_data, language=self.language)
+        except sr.UnknownValueError:
+            return ''
+
+
+class SphinxRecognizer(GoogleRecognizer):
+    """Offline CMU Sphinx (needs pocketsphinx)"""
+
+    def recognize(self, pcm, sample_rate, sample_width=2):
+        audio_data = sr.AudioData(pcm, sample_rate, sample_width)
+        try:
+            return self.recognizer.recognize_sphinx(audio_data, language=self.language)
+        except sr.UnknownValueError:
+            return ''
+
+
+BACKENDS = {
+    'google': GoogleRecognizer,
+    'sphinx': SphinxRecognizer,
+}
+
+
+def register_backend(name, factory):
+    """Add a recognizer backend; factory(**options) must return an object with recognize(pcm, rate, width)"""
+    BACKENDS[name] = factory
+
+
+def get_recognizer(name=None, **options):
+    name = name or os.getenv('SPEECH_BACKEND', 'google')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown speech backend '{name}'. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
+
+
+# --- Pipeline ------------------------------------------------------------
+
+def merge_overlap(previous_text, text, max_words=6):
+    """Drop words at the start of `text` that repeat the end of `previous_text`"""
+    if not previous_text or not text:
+        return text
+    prev_words = previous_text.split()
+    words = text.split()
+    for size in range(min(max_words, len(prev_words), len(words)), 0, -1):
+        if [w.lower() for w in prev_words[-size:]] == [w.lower() for w in words[:size]]:
+            return ' '.join(words[size:])
+    return text
+
+
+def iter_stream_transcription(chunks, sample_rate, recognizer, max_workers=DEFAULT_WORKERS, vad=VAD_ENABLED):
+    """Segment a PCM byte stream on the fly and recognize segments concurrently.
+
+    Yields dicts {'index', 'start', 'end', 'text'} in order as soon as each prefix
+    is ready; a failed segment gets an empty text and an 'error' key instead of
+    aborting the transcription. At most 2 * max_workers segments are buffered, so
+    memory stays bounded however long the audio is.
+
+    With `vad`, silence and music are cut out of each segment before it reaches
+    the recognizer; 'speech' lists the kept [start, end] ranges in stream time
+    and 'speech_seconds' their total, while 'start'/'end' still describe the
+    whole segment.
+    """
+    max_workers = max(1, max_workers)
+    segmenter = StreamingSegmenter(sample_rate)
+    in_flight = deque()
+    state = {'index': 0, 'previous_text': ''}
+
+    def segments():
+        for chunk in chunks:
+            yield from segmenter.feed(chunk)
+        yield from segmenter.flush()
+
+    def submit(pool, start, end, pcm):
+        result = {'index': state['index'], 'start': round(start, 2), 'end': round(end, 2)}
+        state['index'] += 1
+        if vad:
+            pcm, regions = keep_speech(PCMAudio(pcm, sample_rate))
+            result['speech'] = [[round(start + a, 2), round(start + b, 2)] for a, b in regions]
+            result['speech_seconds'] = round(sum(b - a for a, b in regions), 2)
+            if not regions:
+                # Nothing to recognize; don't spend a recognizer call on it
+                future = Future()
+                future.set_result('')
+                return result, future
+        return result, pool.submit(recognizer.recognize, pcm, sample_rate, PCMAudio.sample_width)
+
+    def finish(result, future):
+        try:
+            text = (future.result() or '').strip()
+            result['text'] = merge_overlap(state['previous_text'], text)
+            if text:
+                state['previous_text'] = text
+        except Exception as e:
+            result['text'] = ''
+            result['error'] = str(e)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asr') as pool:
+        for start, end, pcm in segments():
+            in_flight.append(submit(pool, start, end, pcm))
+            # Emit the finished prefix, and wait when too much audio is queued
+            while in_flight and (in_flight[0][1].done() or len(in_flight) >= 2 * max_workers):
+                yield finish(*in_flight.popleft())
+        while in_flight:
+            yield finish(*in_flight.popleft())
+
+
+def iter_transcription(audio, recognizer, max_workers=DEFAULT_WORKERS, vad=VAD_ENABLED):
+    """iter_stream_transcription over an in-memory PCMAudio"""
+    return iter_stream_transcription([audio.data], audio.sample_rate, recognizer, max_workers, vad)
+
+
+def collect_transcription(results, on_segment=None):
+    """Gather ordered segment results into (text, segments), calling on_segment for each"""
+    segments = []
+    for segment in results:
+        segments.append(segment)
+        if on_segment:
+            on_segment(segment)
+    text = ' '.join(segment['text'] for segment in segments if segment['text'])
+    return text, segments
+
+
+def transcribe_audio(audio, recognizer, max_workers=DEFAULT_WORKERS, on_segment=None, vad=VAD_ENABLED):
+    """Transcribe a PCMAudio; returns (text, segments). on_segment(segment) streams partial results."""
+    return collect_transcription(iter_transcription(audio, recognizer, max_workers, vad), on_segment)
+
+
+def transcribe_stream(chunks, sample_rate, recognizer=None, max_workers=DEFAULT_WORKERS, on_segment=None,
+                      vad=VAD_ENABLED):
+    """Transcribe an iterable of mono 16-bit PCM chunks while it is still being produced"""
+    recognizer = recognizer or get_recognizer()
+    return collect_transcription(
+        iter_stream_transcription(chunks, sample_rate, recognizer, max_workers, vad), on_segment)
+
+
+def transcribe_wav(path, recognizer=None, max_workers=DEFAULT_WORKERS, on_segment=None, vad=VAD_ENABLED):
+    """Load a WAV file and transcribe it with the configured backend"""
+    recognizer = recognizer or get_recognizer()
+    return transcribe_audio(read_wav(path), recognizer, max_workers, on_segment, vad)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Streaming audio source: yt-dlp | ffmpeg -> fixed-size PCM frames
+The downloader writes the audio stream to stdout, ffmpeg decodes it to mono
+16-bit PCM on its stdout, and the transcription stage reads frames as they
+arrive, so nothing is written to disk and recognition starts on the first frames
+"""
+
+import shutil
+import subprocess
+import threading
+
+STREAM_SAMPLE_RATE = 16000
+CHUNK_SECONDS = 0.5
+BYTES_PER_SAMPLE = 2
+
+YTDLP_CLI = shutil.which('yt-dlp')
+FFMPEG_CLI = shutil.which('ffmpeg')
+STREAMING_AVAILABLE = bool(YTDLP_CLI and FFMPEG_CLI)
+
+
+class StreamFailed(RuntimeError):
+    """The download/decode pipeline was killed or exited with an error before the end of the audio"""
+
+
+def downloader_command(video_id):
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    return [YTDLP_CLI or "yt-dlp", "-f", "bestaudio/best", "-o", "-", "--quiet", "--no-warnings", url]
+
+
+def decoder_command(sample_rate=STREAM_SAMPLE_RATE):
+    return [FFMPEG_CLI or "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+            "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"]
+
+
+def iter_pcm_frames(stream, frame_bytes):
+    """Read fixed-size frames from a binary stream until EOF (the last one may be short)"""
+    while True:
+        data = stream.read(frame_bytes)
+        if not data:
+            return
+        yield data
+
+
+def stream_audio_frames(video_id, sample_rate=STREAM_SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS, timeout=None):
+    """Yield mono 16-bit PCM chunks of `chunk_seconds` for a video while it downloads.
+
+    Both child processes are killed when the consumer stops early, on errors,
+    or when `timeout` seconds have passed. A stream cut short by the timeout or
+    by a non-zero exit of either process raises StreamFailed after its last
+    frame, so a truncated transcript is never mistaken for a complete one.
+    """
+    downloader = subprocess.Popen(downloader_command(video_id), stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL)
+    decoder = subprocess.Popen(decoder_command(sample_rate), stdin=downloader.stdout,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    # Only ffmpeg reads the downloader's output; closing our copy lets SIGPIPE propagate
+    downloader.stdout.close()
+
+    def kill():
+        for process in (decoder, downloader):
+            if process.poll() is None:
+                process.kill()
+
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        kill()
+
+    watchdog = threading.Timer(timeout, expire) if timeout else None
+    if watchdog:
+        watchdog.daemon = True
+        watchdog.start()
+
+    frame_bytes = int(sample_rate * chunk_seconds) * BYTES_PER_SAMPLE
+    try:
+        yield from iter_pcm_frames(decoder.stdout, frame_bytes)
+        # EOF only means ffmpeg closed its output; check how both processes ended
+        decoder.wait()
+        downloader.wait()
+        if timed_out.is_set():
+            raise StreamFailed(f"audio stream for {video_id} timed out after {timeout}s")
+        for name, process in (('yt-dlp', downloader), ('ffmpeg', decoder)):
+            if process.returncode != 0:
+                raise StreamFailed(f"{name} exited with code {process.returncode} for {video_id}")
+    finally:
+        if watchdog:
+            watchdog.cancel()
+        kill()
+        decoder.stdout.close()
+        decoder.wait()
+        downloader.wait()
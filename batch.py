@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Batch transcript processing
+Fans a list of video ids out over a bounded worker pool and yields results as they finish
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MAX_BATCH_ITEMS = 500
+MAX_BATCH_WORKERS = 16
+DEFAULT_BATCH_WORKERS = 4
+
+
+def parse_batch_request(payload, max_items=MAX_BATCH_ITEMS):
+    """Normalize a batch request body into a list of per-item option dicts.
+
+    Accepts {"video_ids": [...]} or {"items": [{"video_id": ..., "summary": ..., "summary_words": ...}]};
+    top-level "summary" / "summary_words" act as defaults for every item.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError('Request body must be a JSON object')
+
+    default_summary = bool(payload.get('summary', False))
+    default_words = int(payload.get('summary_words', 100))
+
+    raw_items = payload.get('items')
+    if raw_items is None:
+        raw_items = [{'video_id': video_id} for video_id in payload.get('video_ids', [])]
+    if not isinstance(raw_items, list) or not raw_items:
+        raise ValueError('Provide a non-empty "video_ids" or "items" list')
+    if len(raw_items) > max_items:
+        raise ValueError(f'Too many items: {len(raw_items)} (max {max_items})')
+
+    items = []
+    for raw in raw_items:
+        if isinstance(raw, str):
+            raw = {'video_id': raw}
+        video_id = str(raw.get('video_id', '')).strip()
+        if not video_id:
+            raise ValueError('Every item needs a video_id')
+        items.append({
+            'video_id': video_id,
+            'summary': bool(raw.get('summary', default_summary)),
+            'summary_words': int(raw.get('summary_words', default_words))
+        })
+    return items
+
+
+def run_batch(items, worker, max_workers=DEFAULT_BATCH_WORKERS):
+    """Run worker(item) for every item, yielding (index, item, result, seconds) in completion order.
+
+    Exceptions raised by the worker become {'success': False, 'error': ...} results
+    so one bad item never fails the whole batch.
+    """
+    max_workers = max(1, min(int(max_workers), MAX_BATCH_WORKERS, len(items) or 1))
+
+    def timed(item):
+        started = time.time()
+        try:
+            result = worker(item)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        return result, time.time() - started
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch') as pool:
+        futures = {pool.submit(timed, item): (index, item) for index, item in enumerate(items)}
+        try:
+            for future in as_completed(futures):
+                index, item = futures[future]
+                result, elapsed = future.result()
+                yield index, item, result, elapsed
+        finally:
+            # Drop queued work if the consumer stops early (e.g. client disconnected)
+            for future in futures:
+                future.cancel()
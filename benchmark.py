@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite
+Replays the bundled Episode 527 subtitle files and synthetic multi-hour
+transcripts through stubbed YouTube / Google Translate / LLM backends and
+times parsing, resolution, translation chunking, each summarizer and each
+export format. Results are written as JSON so runs can be compared:
+
+    python benchmark.py                          # run everything
+    python benchmark.py --only parse,export      # some sections
+    python benchmark.py --compare benchmark_results/previous.json
+"""
+
+import argparse
+import base64
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import stub_backends
+from fast_json import dumps_bytes, backend_name
+from subtitle_parser import captions_to_text, iter_captions, parse_file
+
+RESULTS_DIR = os.getenv('BENCHMARK_RESULTS_DIR', 'benchmark_results')
+SECTIONS = ['parse', 'resolve', 'summary', 'export']
+RESOLVE_SCENARIOS = ['direct', 'youtube-translate', 'google-translate', 'long-direct', 'long-google-translate']
+
+
+def measure(fn, repeat, units=None, unit='words'):
+    """Run fn once to warm up, then `repeat` times; latency stats in ms plus throughput"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    result = {
+        'runs': repeat,
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(samples), 3)
+    }
+    if units:
+        result[unit] = units
+        result[f'{unit}_per_second'] = round(units / (result['median_ms'] / 1000), 1) if result['median_ms'] else None
+    return result
+
+
+def bench_parse(youtube, options):
+    results = {}
+    for path in sorted(p for p in os.listdir(stub_backends.FIXTURE_DIR) if p.endswith('.vtt')):
+        language = path.rsplit('.', 2)[-2]
+        full_path = os.path.join(stub_backends.FIXTURE_DIR, path)
+        size = os.path.getsize(full_path)
+        results[f'parse/episode527.{language}'] = measure(
+            lambda: captions_to_text(parse_file(full_path)), options.repeat, size, 'bytes')
+
+    vtt = stub_backends.to_vtt(stub_backends.synthetic_captions(youtube.english, options.hours))
+    lines = vtt.splitlines(True)
+    results[f'parse/synthetic_{options.hours}h'] = measure(
+        lambda: captions_to_text(iter_captions(lines)), options.repeat, len(vtt.encode('utf-8')), 'bytes')
+    return results
+
+
+def bench_resolve(youtube, options):
+    from transcript_resolver import resolver
+    results = {}
+    for video_id in RESOLVE_SCENARIOS:
+        words = resolver.resolve(video_id, use_cache=False).word_count
+        results[f'resolve/{video_id}'] = measure(
+            lambda: resolver.resolve(video_id, use_cache=False), options.repeat, words)
+    # Warm transcript cache, the path most extension requests take
+    resolver.resolve('direct')
+    results['resolve/cached'] = measure(lambda: resolver.resolve('direct'), options.repeat)
+    return results
+
+
+def _transcripts(options):
+    from transcript_resolver import resolver
+    return {
+        'episode': resolver.resolve('direct').to_dict(),
+        f'synthetic_{options.hours}h': resolver.resolve('long-direct').to_dict()
+    }
+
+
+def _worker():
+    """Handler methods bound to no connection, as the bulk job runner uses them"""
+    from advanced_server import TranscriptWorker
+    return TranscriptWorker()
+
+
+def bench_summary(youtube, options):
+    worker = _worker()
+    providers = {'extractive': worker.extractive_summary}
+    # Without requests the API providers return at the import, which times nothing useful
+    if importlib.util.find_spec('requests') is not None:
+        providers = {'gemini': worker.try_openai_summary, 'huggingface': worker.try_huggingface_summary,
+                     **providers}
+    else:
+        print("⚠️  requests is not installed: Gemini and Hugging Face summaries skipped")
+    results = {}
+    for name, transcript in _transcripts(options).items():
+        for provider, summarize in providers.items():
+            results[f'summary/{provider}/{name}'] = measure(
+                lambda: summarize(transcript['transcript'], 'en', 100), options.repeat, transcript['word_count'])
+    return results
+
+
+def bench_export(youtube, options):
+    worker = _worker()
+    formats = {
+        'txt': lambda data: worker.format_as_txt(data).encode('utf-8'),
+        'srt': lambda data: worker.format_as_srt(data).encode('utf-8'),
+        'json': lambda data: dumps_bytes(data, pretty=True)
+    }
+    results = {}
+    for name, transcript in _transcripts(options).items():
+        for format_type, export in formats.items():
+            results[f'export/{format_type}/{name}'] = measure(
+                lambda: export(transcript), options.repeat, transcript['word_count'])
+            # The download endpoint ships the file base64-encoded inside JSON
+            results[f'export/{format_type}+download/{name}'] = measure(
+                lambda: dumps_bytes({'content': base64.b64encode(export(transcript)).decode('ascii')}),
+                options.repeat, transcript['word_count'])
+        results[f'export/response/{name}'] = measure(
+            lambda: dumps_bytes(transcript), options.repeat, transcript['word_count'])
+    return results
+
+
+BENCHMARKS = {'parse': bench_parse, 'resolve': bench_resolve, 'summary': bench_summary, 'export': bench_export}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=10, cwd=stub_backends.FIXTURE_DIR).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print median changes against an earlier run; returns the names that regressed"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    regressions = []
+    print(f"\nCompared with {baseline_path}:")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or not before['median_ms']:
+            continue
+        change = (result['median_ms'] - before['median_ms']) / before['median_ms']
+        marker = '❌' if change > threshold else ('✅' if change < -threshold else '  ')
+        print(f"{marker} {name:<45} {before['median_ms']:>10.3f} → {result['median_ms']:>10.3f} ms ({change:+.0%})")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks with stubbed backends')
+    parser.add_argument('--only', help=f'comma-separated sections ({",".join(SECTIONS)})')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per benchmark')
+    parser.add_argument('--hours', type=int, default=3, help='length of the synthetic transcript')
+    parser.add_argument('--output', help='results file (default: benchmark_results/<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='median slowdown counted as a regression')
+    options = parser.parse_args()
+
+    sections = options.only.split(',') if options.only else SECTIONS
+    youtube = stub_backends.install(hours=options.hours)
+
+    results = {}
+    skipped = {}
+    for section in sections:
+        print(f"⏱️  {section}...")
+        try:
+            section_results = BENCHMARKS[section](youtube, options)
+        except ImportError as e:
+            # The summary and export code lives in advanced_server and needs its dependencies
+            print(f"⚠️  Skipping {section}: {e}")
+            skipped[section] = str(e)
+            continue
+        for name, result in section_results.items():
+            rate = next((f"{v:>12,.0f} {k.replace('_per_second', '')}/s" for k, v in result.items()
+                         if k.endswith('_per_second') and v), '')
+            print(f"   {name:<45} median {result['median_ms']:>10.3f} ms  p95 {result['p95_ms']:>10.3f} ms {rate}")
+        results.update(section_results)
+
+    report = {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'json_backend': backend_name(),
+        'options': {'repeat': options.repeat, 'hours': options.hours, 'sections': sections},
+        'skipped': skipped,
+        'results': results
+    }
+    output = options.output or os.path.join(
+        RESULTS_DIR, f"benchmark-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'wb') as f:
+        f.write(dumps_bytes(report, pretty=True))
+    print(f"\n💾 Results saved to {output}")
+
+    if options.compare:
+        regressions = compare(results, options.compare, options.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} benchmark(s) slower by more than {options.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,37 @@ console.log('YouTube Transcript Extractor - Background script loaded');
 class YouTubeTranscriptAPI {
     constructor() {
         this.serverUrl = 'http://localhost:5000';
+        // A successful health check is reused for a while instead of preceding every request
+        this.serverCheckTtl = 30000;
+        this.serverCheckedAt = 0;
+    }
+
+    // Identifies this install to the server's per-client quotas; created once and kept in storage
+    async getInstallId() {
+        if (!this.installId) {
+            const stored = await chrome.storage.local.get('installId');
+            this.installId = stored.installId || crypto.randomUUID();
+            if (!stored.installId) {
+                await chrome.storage.local.set({ installId: this.installId });
+            }
+        }
+        return this.installId;
+    }
+
+    async serverFetch(path) {
+        return fetch(`${this.serverUrl}${path}`, { headers: { 'X-Install-ID': await this.getInstallId() } });
     }
 
     async checkServer() {
+        if (Date.now() - this.serverCheckedAt < this.serverCheckTtl) {
+            return true;
+        }
         try {
             const response = await fetch(`${this.serverUrl}/health`);
+            this.serverCheckedAt = response.ok ? Date.now() : 0;
             return response.ok;
         } catch (error) {
+            this.serverCheckedAt = 0;
             return false;
         }
     }
@@ -23,7 +47,7 @@ class YouTubeTranscriptAPI {
                 throw new Error('Local server not running. Please start simple_server.py first.');
             }
 
-            const response = await fetch(`${this.serverUrl}/transcript/${videoId}`);
+            const response = await this.serverFetch(`/transcript/${videoId}`);
             const data = await response.json();
 
             if (data.success) {
@@ -33,6 +57,7 @@ class YouTubeTranscriptAPI {
             }
         } catch (error) {
             if (error.message.includes('fetch')) {
+                this.serverCheckedAt = 0;
                 throw new Error('Cannot connect to local server. Make sure to run: python simple_server.py');
             }
             throw error;
@@ -46,7 +71,7 @@ class YouTubeTranscriptAPI {
                 throw new Error('Local server not running. Please start simple_server.py first.');
             }
 
-            const response = await fetch(`${this.serverUrl}/list/${videoId}`);
+            const response = await this.serverFetch(`/list/${videoId}`);
             const data = await response.json();
 
             if (data.success) {
@@ -61,6 +86,7 @@ class YouTubeTranscriptAPI {
             }
         } catch (error) {
             if (error.message.includes('fetch')) {
+                this.serverCheckedAt = 0;
                 throw new Error('Cannot connect to local server. Make sure to run: python simple_server.py');
             }
             throw error;
@@ -74,7 +100,7 @@ class YouTubeTranscriptAPI {
                 throw new Error('Local server not running. Please start simple_server.py first.');
             }
 
-            const response = await fetch(`${this.serverUrl}/summary/${videoId}?words=${maxWords}`);
+            const response = await this.serverFetch(`/summary/${videoId}?words=${maxWords}`);
             const data = await response.json();
 
             if (data.success) {
@@ -84,6 +110,7 @@ class YouTubeTranscriptAPI {
             }
         } catch (error) {
             if (error.message.includes('fetch')) {
+                this.serverCheckedAt = 0;
                 throw new Error('Cannot connect to local server. Make sure to run: python simple_server.py');
             }
             throw error;
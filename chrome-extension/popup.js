@@ -21,6 +21,21 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize
     init();
 
+    // Identifies this install to the server's per-client quotas; created once and kept in storage
+    async function getInstallId() {
+        const stored = await chrome.storage.local.get('installId');
+        if (stored.installId) {
+            return stored.installId;
+        }
+        const installId = crypto.randomUUID();
+        await chrome.storage.local.set({ installId });
+        return installId;
+    }
+
+    async function serverFetch(url) {
+        return fetch(url, { headers: { 'X-Install-ID': await getInstallId() } });
+    }
+
     async function init() {
         await loadCurrentVideo();
         setupEventListeners();
@@ -95,7 +110,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             const summaryLength = document.getElementById('summaryLength').value;
             const summaryParam = includeSummary ? `?summary=true&summary_words=${summaryLength}` : '';
-            const response = await fetch(`http://localhost:5000/transcript/${currentVideoId}${summaryParam}`);
+            const response = await serverFetch(`http://localhost:5000/transcript/${currentVideoId}${summaryParam}`);
             const data = await response.json();
             
             if (data.success) {
@@ -205,7 +220,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 url += `?summary=true&summary_words=${summaryLength}`;
             }
             
-            const response = await fetch(url);
+            const response = await serverFetch(url);
             const data = await response.json();
             
             if (data.success) {
@@ -263,7 +278,7 @@ document.addEventListener('DOMContentLoaded', function() {
         if (!currentTranscriptData) return;
         
         try {
-            const response = await fetch(`http://localhost:5000/share/${currentVideoId}`);
+            const response = await serverFetch(`http://localhost:5000/share/${currentVideoId}`);
             const data = await response.json();
             
             if (data.success) {
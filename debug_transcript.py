@@ -1,63 +1,55 @@
 #!/usr/bin/env python3
 """
 Debug script to test transcript extraction for specific videos
+Runs the same resolution engine as the servers and shows every stage
 """
 
-from youtube_transcript_api import YouTubeTranscriptApi
 import sys
 
+from jobs import extract_video_id
+from transcript_resolver import ResolutionContext, DEFAULT_STRATEGIES, friendly_error
+
 def debug_video(video_id):
     print(f"Debugging video: {video_id}")
     print("-" * 50)
-    
+
     try:
-        # List available transcripts
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        ctx = ResolutionContext(video_id)
         print("Available transcripts:")
-        
-        for transcript in transcript_list:
+
+        for transcript in ctx.listing():
             print(f"  - {transcript.language} ({transcript.language_code})")
             print(f"    Generated: {transcript.is_generated}")
             print(f"    Translatable: {transcript.is_translatable}")
-        
-        print("\nTrying to fetch English transcript...")
-        
-        # Try direct English
-        try:
-            transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-            print("✓ Found direct English transcript")
-            print(f"First few lines: {transcript[0]['text'][:100]}...")
-            return True
-        except:
-            print("✗ No direct English transcript")
-        
-        # Try translatable transcripts
-        for transcript_info in transcript_list:
-            if transcript_info.is_translatable:
-                try:
-                    english_transcript = transcript_info.translate('en')
-                    transcript_data = english_transcript.fetch()
-                    print(f"✓ Translated from {transcript_info.language} to English")
-                    print(f"First few lines: {transcript_data[0]['text'][:100]}...")
-                    return True
-                except Exception as e:
-                    print(f"✗ Failed to translate from {transcript_info.language}: {e}")
-        
-        # Try any available transcript
-        for transcript_info in transcript_list:
+
+        # Run each strategy on its own so failures further down the chain show up too
+        print("\nTrying each resolution strategy:")
+        found = None
+        for strategy in DEFAULT_STRATEGIES:
             try:
-                transcript_data = transcript_info.fetch()
-                print(f"✓ Found transcript in {transcript_info.language}")
-                print(f"First few lines: {transcript_data[0]['text'][:100]}...")
-                return True
+                resolution = strategy(ctx)
             except Exception as e:
-                print(f"✗ Failed to fetch {transcript_info.language}: {e}")
-        
-        print("✗ No transcripts could be fetched")
-        return False
-        
+                print(f"✗ {strategy.__name__}: {friendly_error(e)}")
+                continue
+            if resolution is None:
+                print(f"✗ {strategy.__name__}: not applicable")
+                continue
+            found = found or resolution
+            print(f"✓ {strategy.__name__}: {resolution.language} ({resolution.word_count} words)")
+            print(f"  First few lines: {resolution.text[:100]}...")
+
+        print("\nStage timings:")
+        for timing in ctx.timings:
+            print(f"  {'✓' if timing['ok'] else '✗'} {timing['stage']:<22} {timing['ms']:>8.1f} ms")
+
+        if found:
+            print(f"\nServers would return: {found.language} via {found.method}")
+        else:
+            print("✗ No transcripts could be fetched")
+        return found is not None
+
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"Error: {friendly_error(e)}")
         return False
 
 if __name__ == "__main__":
@@ -65,11 +57,8 @@ if __name__ == "__main__":
         video_id = sys.argv[1]
     else:
         video_id = input("Enter YouTube video ID (or full URL): ").strip()
-        
-        # Extract video ID from URL if needed
-        if "youtube.com/watch?v=" in video_id:
-            video_id = video_id.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in video_id:
-            video_id = video_id.split("youtu.be/")[1].split("?")[0]
-    
-    debug_video(video_id)
\ No newline at end of file
+
+    # Extract video ID from URL if needed
+    video_id = extract_video_id(video_id)
+
+    debug_video(video_id)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Fast JSON serialization for the transcript servers
+Uses orjson when it is installed and falls back to the stdlib json module
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from memory import deep_size, register_cache
+from metrics import record_cache, stage_seconds
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _stdlib_dumps(obj, pretty=False):
+    """Serialize with the stdlib json module"""
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _orjson_dumps(obj, pretty=False):
+    """Serialize with orjson, falling back to stdlib for types orjson rejects"""
+    try:
+        if pretty:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        return orjson.dumps(obj)
+    except (TypeError, orjson.JSONEncodeError):
+        return _stdlib_dumps(obj, pretty)
+
+
+BACKENDS = {'stdlib': _stdlib_dumps}
+if ORJSON_AVAILABLE:
+    BACKENDS['orjson'] = _orjson_dumps
+
+_backend_name = None
+_backend = None
+
+
+def set_backend(name=None):
+    """Select the serializer backend ('orjson', 'stdlib' or None for best available)"""
+    global _backend_name, _backend
+    if name is None:
+        name = os.getenv('JSON_BACKEND') or ('orjson' if ORJSON_AVAILABLE else 'stdlib')
+    if name not in BACKENDS:
+        print(f"JSON backend '{name}' not available, using stdlib")
+        name = 'stdlib'
+    _backend_name = name
+    _backend = BACKENDS[name]
+    return name
+
+
+def backend_name():
+    """Name of the active serializer backend"""
+    return _backend_name
+
+
+def dumps_bytes(obj, pretty=False):
+    """Serialize obj to UTF-8 JSON bytes ready to write to the socket"""
+    start = time.perf_counter()
+    data = _backend(obj, pretty)
+    stage_seconds.observe(time.perf_counter() - start, stage='serialize')
+    return data
+
+
+set_backend()
+
+
+class CachedResponse:
+    """A response dict together with its pre-serialized bytes"""
+
+    def __init__(self, data):
+        self.data = data
+        self.body = dumps_bytes(data)
+        self._pretty = None
+        # Counted up front with room for the indented copy, so the cache total stays put
+        self.size = deep_size(data) + 2 * len(self.body)
+
+    @property
+    def pretty(self):
+        """Indented JSON bytes, serialized once on first use"""
+        if self._pretty is None:
+            self._pretty = dumps_bytes(self.data, pretty=True)
+        return self._pretty
+
+
+class ResponseCache:
+    """Small thread-safe LRU cache of CachedResponse objects with a TTL.
+
+    Bounded by entry count and, with max_bytes, by approximate memory footprint.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, name=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.name = name  # lookups are counted in /metrics under this cache name
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            register_cache(name, self)
+
+    def get(self, key):
+        entry = self._get(key)
+        if self.name:
+            record_cache(self.name, entry is not None)
+        return entry
+
+    def __contains__(self, key):
+        """Fresh entry present; unlike get() not counted as a lookup and not refreshed"""
+        with self._lock:
+            item = self._entries.get(key)
+            return item is not None and time.time() - item[0] <= self.ttl
+
+    def _get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            stored_at, entry = item
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.nbytes -= entry.size
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, data):
+        """Serialize data once and store it; returns the CachedResponse"""
+        entry = CachedResponse(data)
+        if self.max_bytes is not None and entry.size > self.max_bytes:
+            # Would evict everything else; serve it once without keeping it
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1].size
+            self._entries[key] = (time.time(), entry)
+            self.nbytes += entry.size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self.nbytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted.size
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
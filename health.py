@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Dependency health for liveness and readiness checks
+A background thread probes YouTube, Googletrans, Gemini and Hugging Face on
+an interval, and a circuit breaker per dependency counts failures seen by
+real traffic. /livez and /readyz only read that cached state, so a load
+balancer can poll them as often as it likes.
+"""
+
+import os
+import threading
+import time
+
+from metrics import Gauge
+from rate_limit import is_throttle_error
+
+HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', 60))   # 0 disables the probes
+HEALTH_PROBE_TIMEOUT = float(os.getenv('HEALTH_PROBE_TIMEOUT', 10))
+# A short public video with captions ("Me at the zoo")
+HEALTH_PROBE_VIDEO = os.getenv('HEALTH_PROBE_VIDEO', 'jNQXAC9IVRw')
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', 5))
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', 30))
+# A dependency that throttled us this recently is reported as degraded (not down)
+THROTTLED_SECONDS = float(os.getenv('HEALTH_THROTTLED_SECONDS', 60))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class ProbeSkipped(Exception):
+    """The probe could not run (e.g. our own rate limit queue was full); says nothing about the dependency"""
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failures; after `reset_seconds` lets one trial call through"""
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_started = None
+        self.opened_count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self):
+        """False while open; in half-open state only one trial call at a time is let through"""
+        with self.lock:
+            state = self.state
+            if state == CLOSED:
+                return True
+            if state == OPEN:
+                return False
+            now = time.monotonic()
+            # A trial that never reported back (killed thread) should not wedge the breaker
+            if self.trial_started is not None and now - self.trial_started < self.reset_seconds:
+                return False
+            self.trial_started = now
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_started = None
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            self.trial_started = None
+            if self.opened_at is not None or self.consecutive_failures >= self.failures:
+                # A failed trial re-opens for another full reset period
+                if self.opened_at is None:
+                    self.opened_count += 1
+                self.opened_at = time.monotonic()
+
+    def to_dict(self):
+        with self.lock:
+            return {'state': self.state, 'consecutive_failures': self.consecutive_failures,
+                    'opened_count': self.opened_count}
+
+
+class Dependency:
+    """One upstream: its probe, the result of the last probe and its circuit breaker.
+
+    A probe returns normally when the dependency works, returns False when it is
+    not configured here (no API key, package missing) and raises when it is down.
+    A 429 / IP block means the dependency is up but asking us to slow down: the
+    rate limiter backs off, and the dependency is only marked throttled. A probe
+    raising ProbeSkipped leaves the status 'skipped' and the breaker untouched.
+
+    With `feeds_breaker=False` the probe's call already reports to the breaker
+    itself (like YouTube's, which goes through proxy_pool.call), so check() only
+    records the status and does not count the outcome a second time.
+    """
+
+    def __init__(self, name, probe, critical=False, feeds_breaker=True):
+        self.name = name
+        self.probe = probe
+        self.critical = critical
+        self.feeds_breaker = feeds_breaker
+        self.breaker = CircuitBreaker()
+        self.status = 'unknown'
+        self.error = None
+        self.checked_at = None
+        self.latency_ms = None
+        self.throttled_at = None
+
+    def check(self):
+        started = time.perf_counter()
+        try:
+            configured = self.probe()
+        except ProbeSkipped as e:
+            self.status = 'skipped'
+            self.error = str(e)[:200]
+        except Exception as e:
+            self.error = f'{type(e).__name__}: {e}'[:200]
+            if is_throttle_error(e):
+                self.status = 'throttled'
+                self.throttled_at = time.monotonic()
+            else:
+                self.status = 'failing'
+                if self.feeds_breaker:
+                    self.breaker.record_failure()
+        else:
+            self.status = 'disabled' if configured is False else 'ok'
+            self.error = None
+            if configured is not False and self.feeds_breaker:
+                self.breaker.record_success()
+        self.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.checked_at = time.time()
+
+    @property
+    def up(self):
+        return self.status != 'failing' and self.breaker.state != OPEN
+
+    @property
+    def throttled(self):
+        return self.throttled_at is not None and time.monotonic() - self.throttled_at < THROTTLED_SECONDS
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'up': self.up,
+            'throttled': self.throttled,
+            'critical': self.critical,
+            'checked_at': self.checked_at,
+            'latency_ms': self.latency_ms,
+            'error': self.error,
+            'breaker': self.breaker.to_dict()
+        }
+
+
+class HealthMonitor:
+    """Background probes plus cached liveness / readiness answers"""
+
+    def __init__(self, interval=HEALTH_PROBE_INTERVAL):
+        self.interval = interval
+        self.dependencies = {}
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.heartbeat = None
+        self.accepting = False
+
+    def add(self, name, probe, critical=False, feeds_breaker=True):
+        self.dependencies[name] = Dependency(name, probe, critical, feeds_breaker)
+
+    def allow(self, name):
+        """Whether a call to `name` should be attempted (its breaker is not open)"""
+        dependency = self.dependencies.get(name)
+        return dependency is None or dependency.breaker.allow()
+
+    def record(self, name, ok):
+        """Outcome of a real call to `name`, feeding its circuit breaker"""
+        dependency = self.dependencies.get(name)
+        if dependency is None:
+            return
+        if ok:
+            dependency.breaker.record_success()
+        else:
+            dependency.breaker.record_failure()
+
+    def record_throttled(self, name):
+        """`name` answered with a 429 / block: the rate limiter backs off, the breaker stays closed"""
+        dependency = self.dependencies.get(name)
+        if dependency is not None:
+            dependency.throttled_at = time.monotonic()
+
+    def start(self):
+        """Start probing in the background; returns False when HEALTH_PROBE_INTERVAL is 0"""
+        if self.interval <= 0 or self.thread is not None:
+            return False
+        self.thread = threading.Thread(target=self._run, name='health-probes', daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            for dependency in list(self.dependencies.values()):
+                dependency.check()
+                self.heartbeat = time.monotonic()
+            self.stop_event.wait(self.interval)
+
+    def live(self):
+        """(alive, details): the process serves requests and the probe loop is not stuck"""
+        details = {'alive': True}
+        if self.thread is not None:
+            # A probe can take a while; only a loop silent for several rounds counts as wedged
+            age = time.monotonic() - (self.heartbeat or 0)
+            limit = 3 * (self.interval + HEALTH_PROBE_TIMEOUT * len(self.dependencies))
+            if self.heartbeat is not None:
+                details['probe_age_seconds'] = round(age, 1)
+            if not self.thread.is_alive() or (self.heartbeat is not None and age > limit):
+                details['alive'] = False
+                details['reason'] = 'health probe loop stopped'
+        return details['alive'], details
+
+    def ready(self):
+        """(ready, details): accepting traffic and no critical dependency is down.
+
+        Non-critical dependencies that are down, and throttled ones, only mark
+        the server degraded, since the pipeline falls back or backs off.
+        """
+        reasons = []
+        if not self.accepting:
+            reasons.append('starting')
+        down = [name for name, dependency in self.dependencies.items() if not dependency.up]
+        reasons += [f'{name} unavailable' for name in down if self.dependencies[name].critical]
+        details = {
+            'ready': not reasons,
+            'degraded': [name for name, dependency in self.dependencies.items()
+                         if (name in down and not dependency.critical) or (dependency.throttled and name not in down)],
+            'dependencies': {name: dependency.to_dict() for name, dependency in self.dependencies.items()}
+        }
+        if reasons:
+            details['reasons'] = reasons
+        return not reasons, details
+
+
+# --- Probes ----------------------------------------------------------------
+# Imports happen inside the probes: this module is loaded by rate_limit and
+# the resolver, and the clients are heavy
+
+
+def probe_youtube():
+    """List the captions of a known video through the shared proxy pool and rate limiter.
+
+    proxy_pool.call scores the outcome for the breaker. A full limiter queue means
+    we are busy, not that YouTube is down, and an answer like "no transcript"
+    means YouTube responded; only transport errors count as failing.
+    """
+    from proxy_pool import proxy_pool, is_proxy_error
+    from rate_limit import RateLimitTimeout
+    api, proxy = proxy_pool.api_for(HEALTH_PROBE_VIDEO)
+    try:
+        proxy_pool.call(proxy, api.list, HEALTH_PROBE_VIDEO, queue_timeout=HEALTH_PROBE_TIMEOUT)
+    except RateLimitTimeout as e:
+        raise ProbeSkipped(f'rate limit queue busy: {e}') from e
+    except Exception as e:
+        if is_proxy_error(e):
+            raise
+
+
+def probe_googletrans():
+    import transcript_resolver
+    if not transcript_resolver.TRANSLATOR_AVAILABLE:
+        return False
+    with transcript_resolver.translators.client() as translator:
+        translator.translate('hola', src='es', dest='en')
+
+
+def probe_gemini():
+    """Model metadata lookup: checks the key and the API without spending tokens"""
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        return False
+    import requests
+    response = requests.get(f'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro?key={api_key}',
+                            timeout=HEALTH_PROBE_TIMEOUT)
+    response.raise_for_status()
+
+
+def probe_huggingface():
+    """Token check against the Hub; free, unlike a call to the inference endpoint"""
+    hf_token = os.getenv('HUGGINGFACE_API_KEY') or os.getenv('HF_TOKEN')
+    if not hf_token:
+        return False
+    import requests
+    response = requests.get('https://huggingface.co/api/whoami-v2', headers={'Authorization': f'Bearer {hf_token}'},
+                            timeout=HEALTH_PROBE_TIMEOUT)
+    response.raise_for_status()
+
+
+# Shared by the server process. Without YouTube nothing works; the others have fallbacks
+health = HealthMonitor()
+health.add('youtube', probe_youtube, critical=True, feeds_breaker=False)
+health.add('googletrans', probe_googletrans)
+health.add('gemini', probe_gemini)
+health.add('huggingface', probe_huggingface)
+
+dependency_up = Gauge('dependency_up', 'Whether each upstream dependency is usable (1) or down (0)',
+                      ('dependency',))
+dependency_up.set_function(lambda: {(name,): int(dependency.up) for name, dependency in health.dependencies.items()})
+breaker_open = Gauge('circuit_breaker_open', 'Whether the circuit breaker of each dependency is open',
+                     ('dependency',))
+breaker_open.set_function(lambda: {(name,): int(dependency.breaker.state == OPEN)
+                                   for name, dependency in health.dependencies.items()})
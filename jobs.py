@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion jobs with resumable progress
+Each job is checkpointed to disk so it can resume after a crash or restart
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from fast_json import dumps_bytes
+from rate_limit import TokenBucket
+
+DEFAULT_JOBS_DIR = 'jobs'
+MAX_JOB_WORKERS = 16
+
+
+def extract_video_id(value):
+    """Accept a bare video id or a youtube.com / youtu.be URL"""
+    value = value.strip()
+    if "youtube.com/watch?v=" in value:
+        return value.split("v=")[1].split("&")[0]
+    if "youtu.be/" in value:
+        return value.split("youtu.be/")[1].split("?")[0]
+    return value
+
+
+def read_id_file(path):
+    """Read video ids (or URLs) from a text file, one per line; '#' starts a comment"""
+    if not os.path.isfile(path):
+        raise ValueError(f'ID file not found: {path}')
+    video_ids = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                video_ids.append(extract_video_id(line))
+    return video_ids
+
+
+class Job:
+    """A bulk ingestion job and its progress counters"""
+
+    def __init__(self, job_id, video_ids, options=None, concurrency=4, rate=2.0, created_at=None):
+        self.id = job_id
+        # Keep order but drop duplicates
+        self.video_ids = list(dict.fromkeys(video_ids))
+        self.options = options or {}
+        self.concurrency = max(1, min(int(concurrency), MAX_JOB_WORKERS))
+        self.rate = float(rate)
+        self.created_at = created_at or time.time()
+        self.status = 'queued'
+        self.error = None
+        self.succeeded = set()
+        self.failed = {}
+        self.run_started = None
+        self.run_processed = 0
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+
+    @property
+    def processed(self):
+        return len(self.succeeded) + len(self.failed)
+
+    def pending_ids(self):
+        return [v for v in self.video_ids if v not in self.succeeded and v not in self.failed]
+
+    def spec(self):
+        """The part of the job written to the checkpoint file"""
+        return {
+            'id': self.id,
+            'video_ids': self.video_ids,
+            'options': self.options,
+            'concurrency': self.concurrency,
+            'rate': self.rate,
+            'created_at': self.created_at,
+            'status': self.status,
+            'error': self.error,
+            'finished_at': self.finished_at
+        }
+
+    def to_dict(self):
+        with self.lock:
+            total = len(self.video_ids)
+            processed = self.processed
+            throughput = 0.0
+            eta = None
+            if self.run_started and self.run_processed:
+                elapsed = (self.finished_at or time.time()) - self.run_started
+                if elapsed > 0:
+                    throughput = self.run_processed / elapsed
+            if throughput > 0 and self.status == 'running':
+                eta = round((total - processed) / throughput, 1)
+            return {
+                'success': True,
+                'job_id': self.id,
+                'status': self.status,
+                'total': total,
+                'processed': processed,
+                'succeeded': len(self.succeeded),
+                'failed': len(self.failed),
+                'progress': f"{processed / total * 100:.1f}%" if total else '100.0%',
+                'throughput_per_min': round(throughput * 60, 2),
+                'eta_seconds': eta,
+                'concurrency': self.concurrency,
+                'rate_limit': self.rate,
+                'options': self.options,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+                'recent_errors': dict(list(self.failed.items())[-10:]),
+                'error': self.error
+            }
+
+
+class JobManager:
+    """Schedules jobs on worker pools and checkpoints progress under `jobs_dir`.
+
+    `worker(video_id, options)` does the actual work and returns a result dict
+    with a 'success' key.  Results are appended to `<job_id>.results.jsonl`;
+    on restart the results file tells us which ids are already done.
+    """
+
+    def __init__(self, worker, jobs_dir=DEFAULT_JOBS_DIR):
+        self.worker = worker
+        self.jobs_dir = jobs_dir
+        self.jobs = {}
+        self.lock = threading.Lock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def _spec_path(self, job_id):
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def results_path(self, job_id):
+        return os.path.join(self.jobs_dir, f'{job_id}.results.jsonl')
+
+    def _save_spec(self, job):
+        path = self._spec_path(job.id)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(dumps_bytes(job.spec(), pretty=True))
+        os.replace(tmp_path, path)
+
+    def submit(self, video_ids, options=None, concurrency=4, rate=2.0):
+        if not video_ids:
+            raise ValueError('Job has no video ids')
+        job = Job(uuid.uuid4().hex[:12], video_ids, options, concurrency, rate)
+        with self.lock:
+            self.jobs[job.id] = job
+        self._save_spec(job)
+        self._start(job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job:
+            job.cancel_event.set()
+        return job
+
+    def resume_all(self):
+        """Load checkpointed jobs and restart any that had not finished"""
+        resumed = []
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), 'r', encoding='utf-8') as f:
+                    spec = json.load(f)
+                job = Job(spec['id'], spec['video_ids'], spec.get('options'),
+                          spec.get('concurrency', 4), spec.get('rate', 2.0), spec.get('created_at'))
+            except Exception as e:
+                print(f"Skipping unreadable job checkpoint {name}: {e}")
+                continue
+
+            self._load_results(job)
+            job.status = spec.get('status', 'queued')
+            job.error = spec.get('error')
+            job.finished_at = spec.get('finished_at')
+            with self.lock:
+                self.jobs[job.id] = job
+
+            if job.status in ('queued', 'running') and job.pending_ids():
+                print(f"Resuming job {job.id}: {len(job.pending_ids())} of {len(job.video_ids)} ids left")
+                self._start(job)
+                resumed.append(job)
+        return resumed
+
+    def _load_results(self, job):
+        path = self.results_path(job.id)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r+b') as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Partially written last line from a crash: cut it off so
+                    # records appended on resume start on a line of their own
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                video_id = record.get('video_id')
+                if record.get('success'):
+                    job.succeeded.add(video_id)
+                    job.failed.pop(video_id, None)
+                else:
+                    job.failed[video_id] = record.get('error', 'Unknown error')
+
+    def _start(self, job):
+        thread = threading.Thread(target=self._run, args=(job,), name=f'job-{job.id}', daemon=True)
+        thread.start()
+
+    def _run(self, job):
+        job.status = 'running'
+        job.run_started = time.time()
+        job.run_processed = 0
+        job.finished_at = None
+        self._save_spec(job)
+
+        bucket = TokenBucket(job.rate, capacity=max(1.0, job.rate))
+        results_lock = threading.Lock()
+
+        def process(video_id):
+            if job.cancel_event.is_set():
+                return
+            bucket.acquire()
+            try:
+                result = self.worker(video_id, job.options)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            record = {'video_id': video_id, 'finished_at': time.time()}
+            record.update(result)
+            with results_lock:
+                with open(self.results_path(job.id), 'ab') as f:
+                    f.write(dumps_bytes(record) + b'\n')
+            with job.lock:
+                if result.get('success'):
+                    job.succeeded.add(video_id)
+                    job.failed.pop(video_id, None)
+                else:
+                    job.failed[video_id] = result.get('error', 'Unknown error')
+                job.run_processed += 1
+
+        try:
+            with ThreadPoolExecutor(max_workers=job.concurrency, thread_name_prefix=f'job-{job.id}') as pool:
+                list(pool.map(process, job.pending_ids()))
+            job.status = 'cancelled' if job.cancel_event.is_set() else 'completed'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished_at = time.time()
+        self._save_spec(job)
+        print(f"Job {job.id} {job.status}: {len(job.succeeded)} ok, {len(job.failed)} failed")
+
+
+class QueueFull(Exception):
+    """Raised when too many background tasks are already waiting"""
+
+
+class FairQueue:
+    """Round-robin between clients, first in first out within a client"""
+
+    def __init__(self):
+        self.queues = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, client, item):
+        with self.lock:
+            self.queues.setdefault(client, deque()).append(item)
+
+    def get(self):
+        with self.lock:
+            client, queue = next(iter(self.queues.items()))
+            item = queue.popleft()
+            if queue:
+                # Back of the line until every other waiting client had a turn
+                self.queues.move_to_end(client)
+            else:
+                del self.queues[client]
+            return item
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(queue) for queue in self.queues.values())
+
+
+class Task:
+    """One background task with a progress stage and streamed partial results"""
+
+    def __init__(self, task_id, key, client=None):
+        self.id = task_id
+        self.key = key
+        self.client = client
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.progress = {}
+        self.partial = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+        self.done_event = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+    def update(self, stage=None, **progress):
+        """Called by the worker to report what it is doing"""
+        with self.lock:
+            if stage:
+                self.stage = stage
+            self.progress.update(progress)
+
+    def add_partial(self, text):
+        with self.lock:
+            self.partial.append(text)
+
+    def wait(self, timeout=None):
+        return self.done_event.wait(timeout)
+
+    def to_dict(self, include_partial=True):
+        with self.lock:
+            end = self.finished_at or time.time()
+            data = {
+                'success': True,
+                'job_id': self.id,
+                'key': self.key,
+                'status': self.status,
+                'stage': self.stage,
+                'progress': dict(self.progress),
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'elapsed_seconds': round(end - (self.started_at or end), 1),
+                'error': self.error
+            }
+            if include_partial and self.active:
+                data['partial_transcript'] = ' '.join(self.partial)
+            if self.status == 'completed':
+                data['result'] = self.result
+            return data
+
+
+class TaskQueue:
+    """Runs slow per-item work on its own thread pool and tracks it as pollable tasks.
+
+    `worker(task, *args)` returns the result; it may call task.update() and
+    task.add_partial() while running.  Submitting a key that is already queued
+    or running returns the existing task instead of starting the work twice.
+    Queued tasks are started fairly across the `client` they were submitted
+    for, so one client queueing many tasks does not delay everyone else's.
+    Finished tasks are forgotten after `keep_seconds`.
+    """
+
+    def __init__(self, worker, max_workers=2, max_pending=32, keep_seconds=3600, on_complete=None,
+                 max_pending_per_client=None):
+        self.worker = worker
+        self.max_pending = max_pending
+        self.max_pending_per_client = max_pending_per_client
+        self.keep_seconds = keep_seconds
+        self.on_complete = on_complete
+        self.tasks = {}
+        self.active_by_key = {}
+        self.lock = threading.Lock()
+        self.queue = FairQueue()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task')
+
+    def submit(self, key, *args, client=None):
+        with self.lock:
+            self._expire()
+            task = self.active_by_key.get(key)
+            if task:
+                return task
+            if len(self.active_by_key) >= self.max_pending:
+                raise QueueFull(f'{len(self.active_by_key)} tasks already queued, try again shortly')
+            if client is not None and self.max_pending_per_client is not None:
+                mine = sum(1 for other in self.active_by_key.values() if other.client == client)
+                if mine >= self.max_pending_per_client:
+                    raise QueueFull(f'You already have {mine} tasks queued, try again when one finishes')
+            task = Task(uuid.uuid4().hex[:12], key, client)
+            self.tasks[task.id] = task
+            self.active_by_key[key] = task
+        # Each pool slot takes whichever task is next in fair order when it frees up
+        self.queue.put(client, (task, args))
+        self.executor.submit(self._run_next)
+        return task
+
+    def get(self, task_id):
+        with self.lock:
+            return self.tasks.get(task_id)
+
+    def list(self):
+        with self.lock:
+            self._expire()
+            return list(self.tasks.values())
+
+    def _expire(self):
+        cutoff = time.time() - self.keep_seconds
+        for task_id, task in list(self.tasks.items()):
+            if task.finished_at and task.finished_at < cutoff:
+                del self.tasks[task_id]
+
+    def _run_next(self):
+        task, args = self.queue.get()
+        self._run(task, args)
+
+    def _run(self, task, args):
+        task.status = task.stage = 'running'
+        task.started_at = time.time()
+        try:
+            task.result = self.worker(task, *args)
+            task.status = 'completed' if task.result is not None else 'failed'
+            if task.result is None:
+                task.error = task.error or 'No result'
+        except Exception as e:
+            task.status = 'failed'
+            task.error = str(e)
+        # Publish the result before the key stops counting as active, so a
+        # request arriving in between finds it instead of starting over
+        if self.on_complete and task.status == 'completed':
+            try:
+                self.on_complete(task)
+            except Exception as e:
+                print(f"Task {task.id} completion hook failed: {e}")
+        task.stage = task.status
+        task.finished_at = time.time()
+        with self.lock:
+            if self.active_by_key.get(task.key) is task:
+                del self.active_by_key[task.key]
+        task.done_event.set()
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Load tester for the transcript servers
+Replays extension-like sessions (/health, then /transcript, then often
+/download and /share for the same video) at a target request rate, with
+video popularity following a Zipf distribution, and reports latency
+percentiles, error rates and the saturation point.
+
+    python loadtest.py --serve advanced --rps 20 --duration 30
+    python loadtest.py --serve advanced --ramp 10,20,40,80 --youtube-latency 150
+    python loadtest.py --url http://localhost:5000 --mix transcript-only --rps 5
+
+--serve starts the server in a child process with stubbed YouTube,
+translation and summary backends (see stub_backends), so nothing leaves
+the machine; --url points at a server that is already running.
+"""
+
+import argparse
+import bisect
+import datetime
+import json
+import os
+import random
+import socket
+import socketserver
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Handler class and default server class of each server module
+SERVERS = {
+    'advanced': ('advanced_server', 'UltimateTranscriptHandler'),
+    'simple': ('simple_server', 'TranscriptHandler'),
+    'alternative': ('alternative_server', 'AlternativeHandler'),
+    'audio': ('simple_audio_server', 'SimpleAudioHandler'),
+}
+
+# A session is a list of (path template, probability) steps run in order for one video.
+# "extension" mirrors background.js: checkServer() before every call.
+MIXES = {
+    'extension': [
+        ('/health', 1.0),
+        ('/transcript/{video}{summary}', 1.0),
+        ('/health', 0.4),
+        ('/download/{video}/{format}{summary}', 0.4),
+        ('/health', 0.2),
+        ('/share/{video}{summary}', 0.2),
+    ],
+    'transcript-only': [('/transcript/{video}{summary}', 1.0)],
+    'languages': [('/health', 1.0), ('/list/{video}', 1.0)],
+    'health': [('/health', 1.0)],
+}
+FORMATS = ['txt', 'json', 'srt']
+# Stub scenarios (see StubYouTube) and the share of the catalogue they make up
+DEFAULT_SCENARIOS = 'direct=0.7,youtube-translate=0.2,google-translate=0.1'
+
+
+class ZipfVideos:
+    """Video ids drawn with probability proportional to 1 / rank^s"""
+
+    def __init__(self, count, s, scenarios, seed=0):
+        weights = [1 / rank ** s for rank in range(1, count + 1)]
+        total = sum(weights)
+        self.cumulative = []
+        running = 0.0
+        for weight in weights:
+            running += weight / total
+            self.cumulative.append(running)
+        rng = random.Random(seed)
+        names, shares = zip(*scenarios.items())
+        self.ids = [f'{rng.choices(names, shares)[0]}_{rank:06d}' for rank in range(count)]
+
+    def sample(self, rng):
+        return self.ids[min(bisect.bisect_left(self.cumulative, rng.random()), len(self.ids) - 1)]
+
+
+def parse_scenarios(value):
+    scenarios = {}
+    for part in value.split(','):
+        name, share = part.split('=')
+        scenarios[name.strip()] = float(share)
+    return scenarios
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 1)
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []   # (endpoint, ms, outcome)
+        self.start_delays = []
+
+    def add(self, endpoint, ms, outcome):
+        with self.lock:
+            self.samples.append((endpoint, ms, outcome))
+
+    def summary(self, elapsed):
+        with self.lock:
+            samples = list(self.samples)
+            delays = list(self.start_delays)
+
+        def stats(rows):
+            latencies = [ms for _, ms, _ in rows]
+            outcomes = [outcome for _, _, outcome in rows]
+            failures = sum(1 for outcome in outcomes if outcome not in ('ok', 'app_error'))
+            return {
+                'requests': len(rows),
+                'rps': round(len(rows) / elapsed, 2) if elapsed else None,
+                'p50_ms': percentile(latencies, 0.50),
+                'p90_ms': percentile(latencies, 0.90),
+                'p95_ms': percentile(latencies, 0.95),
+                'p99_ms': percentile(latencies, 0.99),
+                'max_ms': round(max(latencies), 1) if latencies else None,
+                'mean_ms': round(statistics.fmean(latencies), 1) if latencies else None,
+                'error_rate': round(failures / len(rows), 4) if rows else 0.0,
+                'outcomes': {outcome: outcomes.count(outcome) for outcome in sorted(set(outcomes))}
+            }
+
+        result = stats(samples)
+        result['endpoints'] = {endpoint: stats([row for row in samples if row[0] == endpoint])
+                               for endpoint in sorted({row[0] for row in samples})}
+        # Sessions that could not start on time: the client pool (or the server) fell behind
+        result['start_delay_p95_ms'] = percentile(delays, 0.95)
+        return result
+
+
+def request(base_url, path, timeout):
+    """(ms, outcome) for one GET; app_error is a 200 whose JSON says success: false"""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(base_url + path, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return (time.perf_counter() - start) * 1000, f'http_{e.code}'
+    except socket.timeout:
+        return (time.perf_counter() - start) * 1000, 'timeout'
+    except (urllib.error.URLError, OSError) as e:
+        reason = getattr(e, 'reason', e)
+        return (time.perf_counter() - start) * 1000, 'timeout' if isinstance(reason, socket.timeout) else 'connection_error'
+    ms = (time.perf_counter() - start) * 1000
+    if status >= 400:
+        return ms, f'http_{status}'
+    try:
+        if json.loads(body).get('success') is False:
+            return ms, 'app_error'
+    except (ValueError, AttributeError):
+        pass
+    return ms, 'ok'
+
+
+def run_session(base_url, steps, video, rng, options, recorder):
+    summary = f'?summary=true&summary_words={options.summary_words}' if rng.random() < options.summary_share else ''
+    params = {'video': video, 'summary': summary, 'format': rng.choice(FORMATS)}
+    for template, probability in steps:
+        if probability < 1 and rng.random() >= probability:
+            continue
+        path = template.format(**params)
+        ms, outcome = request(base_url, path, options.timeout)
+        recorder.add(path.strip('/').split('/')[0].split('?')[0], ms, outcome)
+
+
+def run_step(base_url, rps, options, videos, seed):
+    """Open-loop load at `rps` requests/s for options.duration seconds"""
+    steps = MIXES[options.mix]
+    requests_per_session = sum(probability for _, probability in steps)
+    session_rate = rps / requests_per_session
+    rng = random.Random(seed)
+    recorder = Recorder()
+
+    def session(scheduled, video, session_seed):
+        recorder.start_delays.append((time.perf_counter() - scheduled) * 1000)
+        run_session(base_url, steps, video, random.Random(session_seed), options, recorder)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+        scheduled = started
+        while True:
+            # Poisson arrivals, like independent extension users
+            scheduled += rng.expovariate(session_rate)
+            if scheduled - started >= options.duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(session, scheduled, videos.sample(rng), rng.random())
+    elapsed = time.perf_counter() - started
+    result = recorder.summary(elapsed)
+    result['target_rps'] = rps
+    return result
+
+
+def saturated(result, options):
+    """Why this step counts as past the saturation point, or None"""
+    if result['rps'] is not None and result['rps'] < 0.9 * result['target_rps']:
+        return f"achieved {result['rps']} of {result['target_rps']} rps"
+    if result['error_rate'] > options.max_error_rate:
+        return f"error rate {result['error_rate']:.1%}"
+    if result['p99_ms'] is not None and result['p99_ms'] > options.slo_ms:
+        return f"p99 {result['p99_ms']} ms over the {options.slo_ms} ms objective"
+    return None
+
+
+def print_step(result):
+    print(f"\n📊 target {result['target_rps']} rps → achieved {result['rps']} rps, "
+          f"{result['requests']} requests, errors {result['error_rate']:.1%}")
+    print(f"   {'endpoint':<12} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  errors")
+    for endpoint, stats in result['endpoints'].items():
+        print(f"   {endpoint:<12} {stats['requests']:>7} {stats['p50_ms']:>9} {stats['p95_ms']:>9} "
+              f"{stats['p99_ms']:>9} {stats['max_ms']:>9}  {stats['error_rate']:.1%}")
+    print(f"   {'all':<12} {result['requests']:>7} {result['p50_ms']!s:>9} {result['p95_ms']!s:>9} "
+          f"{result['p99_ms']!s:>9} {result['max_ms']!s:>9}  {result['outcomes']}")
+
+
+# --- Stubbed server ---------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(options):
+    """Child process: run one server on options.port against the stub backends"""
+    import importlib
+    import stub_backends
+    stub_backends.install(youtube_latency=options.youtube_latency / 1000,
+                          translate_latency=options.translate_latency / 1000,
+                          summary_latency=options.summary_latency / 1000)
+    module_name, handler_name = SERVERS[options.serve]
+    module = importlib.import_module(module_name)
+    handler = getattr(module, handler_name)
+    # Same server class the module uses when run directly
+    server_class = getattr(module, 'ThreadedServer', socketserver.TCPServer)
+    server_class.allow_reuse_address = True
+    with server_class(('127.0.0.1', options.port), handler) as httpd:
+        from health import health
+        health.accepting = True
+        httpd.serve_forever()
+
+
+def start_server(options):
+    port = free_port()
+    command = [sys.executable, os.path.abspath(__file__), '--serve', options.serve, '--child',
+               '--port', str(port), '--youtube-latency', str(options.youtube_latency),
+               '--translate-latency', str(options.translate_latency),
+               '--summary-latency', str(options.summary_latency)]
+    env = dict(os.environ, TRACE_LOG='0')
+    log = open(options.server_log, 'wb') if options.server_log else subprocess.DEVNULL
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{options.serve} server exited with code {process.returncode}'
+                               + ('' if options.server_log else ' (use --server-log to see why)'))
+        try:
+            urllib.request.urlopen(base_url + '/health', timeout=1).read()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{options.serve} server did not become ready within 30s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the transcript servers')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='base URL of a running server')
+    target.add_argument('--serve', choices=sorted(SERVERS), help='start this server with stub backends')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='extension', help='traffic mix')
+    parser.add_argument('--rps', type=float, default=10, help='target requests per second')
+    parser.add_argument('--ramp', help='comma-separated rps steps to find the saturation point')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per step')
+    parser.add_argument('--concurrency', type=int, default=64, help='max sessions in flight')
+    parser.add_argument('--timeout', type=float, default=60, help='per-request timeout in seconds')
+    parser.add_argument('--videos', type=int, default=5000, help='catalogue size')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of video popularity')
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIOS,
+                        help='share of stub scenarios in the catalogue (--serve only)')
+    parser.add_argument('--summary-share', type=float, default=0.3, help='share of sessions asking for a summary')
+    parser.add_argument('--summary-words', type=int, default=100)
+    parser.add_argument('--slo-ms', type=float, default=5000, help='p99 objective used for saturation')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--youtube-latency', type=float, default=100, help='stub YouTube latency (ms)')
+    parser.add_argument('--translate-latency', type=float, default=200, help='stub Google Translate latency (ms)')
+    parser.add_argument('--summary-latency', type=float, default=1500, help='stub Gemini / HF latency (ms)')
+    parser.add_argument('--server-log', help='file for the stubbed server output')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        serve(options)
+        return
+
+    process = None
+    if options.serve:
+        print(f"🚀 Starting {options.serve} server with stub backends...")
+        process, base_url = start_server(options)
+        scenarios = parse_scenarios(options.scenarios)
+    else:
+        base_url = options.url.rstrip('/')
+        # A real server knows nothing about stub scenarios
+        scenarios = {'video': 1.0}
+    videos = ZipfVideos(options.videos, options.zipf, scenarios, options.seed)
+    steps = [float(rps) for rps in options.ramp.split(',')] if options.ramp else [options.rps]
+
+    print(f"🎯 {base_url}, mix {options.mix}, {options.videos} videos (Zipf s={options.zipf}), "
+          f"{options.duration:.0f}s per step")
+    results = []
+    saturation = None
+    try:
+        for i, rps in enumerate(steps):
+            result = run_step(base_url, rps, options, videos, options.seed + i)
+            results.append(result)
+            print_step(result)
+            reason = saturated(result, options)
+            if reason:
+                saturation = {'rps': rps, 'reason': reason}
+                print(f"\n⚠️  Saturated at {rps} rps: {reason}")
+                break
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if saturation is None and len(steps) > 1:
+        print(f"\n✅ Not saturated up to {steps[-1]} rps")
+
+    if options.output:
+        report = {
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'target': options.serve or base_url,
+            'options': {key: value for key, value in vars(options).items() if key not in ('child', 'port')},
+            'steps': results,
+            'saturation': saturation
+        }
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {options.output}")
+
+
+if __name__ == "__main__":
+    main()
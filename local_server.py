@@ -4,48 +4,60 @@ Local server for YouTube Transcript API
 Run this to provide transcript extraction for the Chrome extension
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from youtube_transcript_api import YouTubeTranscriptApi
+from metrics import render, CONTENT_TYPE
+from transcript_resolver import resolver, resolve_transcript, ResolutionError
+from admission import Overloaded
+from quotas import QuotaExceeded
+from memory import MemoryBudgetExceeded
 import sys
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from Chrome extension
 
+def error_response(e):
+    """JSON error with the same status codes (and Retry-After) as the advanced server"""
+    body = {'success': False, 'error': str(e)}
+    retry_after = None
+    if isinstance(e, ResolutionError):
+        status = 400
+    elif isinstance(e, MemoryBudgetExceeded):
+        status = e.status
+        retry_after = 5 if status == 503 else None
+    elif isinstance(e, (Overloaded, QuotaExceeded)):
+        status = e.status
+        retry_after = e.retry_after
+        body['retry_after'] = retry_after
+    else:
+        status = 500
+    response = jsonify(body)
+    response.status_code = status
+    if retry_after:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
 @app.route('/transcript/<video_id>')
 def get_transcript(video_id):
     try:
-        ytt_api = YouTubeTranscriptApi()
-        transcript = ytt_api.fetch(video_id)
-        
-        # Convert to simple text
-        text = '\n'.join([snippet.text for snippet in transcript])
+        resolution = resolve_transcript(video_id)
         
         return jsonify({
             'success': True,
-            'transcript': text,
-            'language': transcript.language,
+            'transcript': resolution.text,
+            'language': resolution.language,
             'video_id': video_id
         })
     except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 400
+        return error_response(e)
 
 @app.route('/list/<video_id>')
 def list_transcripts(video_id):
     try:
-        ytt_api = YouTubeTranscriptApi()
-        transcript_list = ytt_api.list(video_id)
-        
-        languages = []
-        for transcript in transcript_list:
-            languages.append({
-                'language': transcript.language,
-                'code': transcript.language_code,
-                'generated': transcript.is_generated
-            })
+        languages = [
+            {'language': lang['language'], 'code': lang['code'], 'generated': lang['generated']}
+            for lang in resolver.list_languages(video_id)
+        ]
         
         return jsonify({
             'success': True,
@@ -53,15 +65,16 @@ def list_transcripts(video_id):
             'video_id': video_id
         })
     except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 400
+        return error_response(e)
 
 @app.route('/health')
 def health():
     return jsonify({'status': 'running'})
 
+@app.route('/metrics')
+def metrics():
+    return Response(render(), content_type=CONTENT_TYPE)
+
 if __name__ == '__main__':
     print("Starting YouTube Transcript API Server...")
     print("Server will run on http://localhost:5000")
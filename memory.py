@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Memory accounting and budgets
+A long episode is copied several times on its way out (joined text, cleaned
+text, word lists, translated chunks, JSON, base64 download). Requests charge
+an estimate of those copies against a per-request cap and a process-wide
+budget and are rejected cleanly when either would be exceeded; caches report
+their footprint; tracemalloc snapshots show where memory actually goes.
+"""
+
+import contextvars
+import os
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from metrics import Counter, Gauge
+
+MB = 1024 * 1024
+MEMORY_BUDGET = int(float(os.getenv('MEMORY_BUDGET_MB', 512)) * MB)
+REQUEST_MEMORY_LIMIT = int(float(os.getenv('REQUEST_MEMORY_MB', 128)) * MB)
+MEMORY_TRACE = os.getenv('MEMORY_TRACE') == '1'
+MEMORY_TRACE_FRAMES = int(os.getenv('MEMORY_TRACE_FRAMES', 1))
+
+# Bytes held per byte of transcript text by each kind of work, counting the
+# intermediate copies (a word list costs ~10x the text it was split from)
+COPY_FACTORS = {
+    'transcript': 3,     # text, response dict, serialized JSON
+    'summary': 12,       # cleaned text, word lists, sentence lists and scores
+    'translation': 4,    # chunk list, translated chunks, joined result
+    'download': 4,       # formatted file, base64, JSON around it
+    'share': 2,          # copy_content and email_body
+}
+
+
+class MemoryBudgetExceeded(Exception):
+    """A request needs more memory than its cap or than the process has left"""
+
+    def __init__(self, message, status=503):
+        super().__init__(message)
+        self.status = status
+
+
+def deep_size(obj):
+    """Approximate bytes held by a JSON-like structure (dicts, lists, strings, numbers)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key) + deep_size(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(item) for item in obj)
+    return size
+
+
+class Reservation:
+    """Memory charged by one request; released as a whole when the request ends"""
+
+    def __init__(self, budget, limit):
+        self.budget = budget
+        self.limit = limit
+        self.bytes = 0
+        self.peak = 0
+        self.charges = {}
+
+    def charge(self, nbytes, what):
+        nbytes = int(nbytes)
+        if self.bytes + nbytes > self.limit:
+            self.budget._reject(f'This video is too large to process ({(self.bytes + nbytes) / MB:.0f} MB needed, '
+                                f'limit {self.limit / MB:.0f} MB per request)', status=413)
+        self.budget._take(nbytes)
+        self.bytes += nbytes
+        self.peak = max(self.peak, self.bytes)
+        self.charges[what] = self.charges.get(what, 0) + nbytes
+
+
+class MemoryBudget:
+    """Process-wide byte budget shared by all in-flight requests"""
+
+    def __init__(self, limit=MEMORY_BUDGET, request_limit=REQUEST_MEMORY_LIMIT):
+        self.limit = limit
+        self.request_limit = request_limit
+        self.reserved = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def _take(self, nbytes):
+        with self.lock:
+            fits = self.reserved + nbytes <= self.limit
+            if fits:
+                self.reserved += nbytes
+        if not fits:
+            self._reject('Server is busy with large transcripts. Please try again shortly')
+
+    def _reject(self, message, status=503):
+        """Count a rejection (per-request 413 or process-wide 503) and raise it"""
+        with self.lock:
+            self.rejected += 1
+        memory_rejected.inc(status=str(status))
+        raise MemoryBudgetExceeded(message, status=status)
+
+    def _release(self, nbytes):
+        with self.lock:
+            self.reserved -= nbytes
+
+    @contextmanager
+    def request(self):
+        """Make a Reservation current for the block; charge() adds to it"""
+        reservation = Reservation(self, self.request_limit)
+        token = _current.set(reservation)
+        try:
+            yield reservation
+        finally:
+            _current.reset(token)
+            self._release(reservation.bytes)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'limit_bytes': self.limit,
+                'request_limit_bytes': self.request_limit,
+                'reserved_bytes': self.reserved,
+                'rejected': self.rejected
+            }
+
+
+_current = contextvars.ContextVar('memory_reservation', default=None)
+
+
+def charge(text_or_bytes, what):
+    """Charge the current request for work on `text_or_bytes` (a size, str or bytes).
+
+    The size is multiplied by COPY_FACTORS[what]. A no-op outside a request
+    (bulk jobs, CLIs). Raises MemoryBudgetExceeded when a limit would be crossed.
+    """
+    reservation = _current.get()
+    if reservation is None:
+        return
+    if isinstance(text_or_bytes, str):
+        # Worst case for CPython's compact strings: 4 bytes per character
+        size = len(text_or_bytes) * (1 if text_or_bytes.isascii() else 4)
+    elif isinstance(text_or_bytes, (bytes, bytearray)):
+        size = len(text_or_bytes)
+    else:
+        size = int(text_or_bytes)
+    reservation.charge(size * COPY_FACTORS.get(what, 1), what)
+
+
+# --- Reporting -------------------------------------------------------------
+
+_caches = {}
+
+
+def register_cache(name, cache):
+    """Report cache.nbytes as cache_bytes{cache=name} and in memory_report()"""
+    _caches[name] = cache
+
+
+def resident_bytes():
+    """Resident set size of this process, or None where it cannot be read"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes; this is the peak, the best available
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+
+def start_tracing():
+    """Start tracemalloc when MEMORY_TRACE=1 (it slows allocations down, so it is opt-in)"""
+    if MEMORY_TRACE and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+        return True
+    return False
+
+
+_last_snapshot = None
+
+
+def memory_report(top=15, diff=False):
+    """Budget, cache footprints, RSS and, with tracemalloc running, the top allocation sites.
+
+    With diff=True the allocation sites are the growth since the previous diff report.
+    """
+    global _last_snapshot
+    report = {
+        'resident_bytes': resident_bytes(),
+        'budget': memory_budget.stats(),
+        'caches': {name: {'entries': len(cache), 'bytes': cache.nbytes, 'max_bytes': cache.max_bytes}
+                   for name, cache in list(_caches.items())},
+        'tracemalloc': tracemalloc.is_tracing()
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        report['traced_bytes'] = current
+        report['traced_peak_bytes'] = peak
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        if diff and _last_snapshot is not None:
+            stats = snapshot.compare_to(_last_snapshot, 'lineno')
+            report['top_growth'] = [{'where': str(stat.traceback[0]), 'size_diff_bytes': stat.size_diff,
+                                     'count_diff': stat.count_diff} for stat in stats[:top]]
+        else:
+            report['top_allocations'] = [{'where': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count}
+                                         for stat in snapshot.statistics('lineno')[:top]]
+        if diff:
+            _last_snapshot = snapshot
+    return report
+
+
+# Shared by every request in this process
+memory_budget = MemoryBudget()
+
+memory_reserved = Gauge('memory_reserved_bytes', 'Memory charged by in-flight requests')
+memory_reserved.set_function(lambda: memory_budget.reserved)
+memory_rejected = Counter('memory_rejected_requests_total', 'Requests rejected by the memory budget',
+                          ('status',))
+cache_bytes = Gauge('cache_bytes', 'Approximate bytes held by each cache', ('cache',))
+cache_bytes.set_function(lambda: {(name,): cache.nbytes for name, cache in list(_caches.items())})
+process_resident = Gauge('process_resident_bytes', 'Resident set size of the process')
+process_resident.set_function(lambda: resident_bytes() or 0)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+In-process metrics in the Prometheus text format
+Counters, gauges and histograms with labels, plus the shared metrics every
+server exports on GET /metrics: per-endpoint requests and latency, per-stage
+pipeline timings, cache hit ratios, in-flight counts and upstream errors.
+No dependencies, so any module can record into it.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; the tail covers yt-dlp, audio transcription and slow summaries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(Counter):
+    """A value that goes up and down; set_function() reads it at scrape time instead"""
+    type = 'gauge'
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.function = None
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def set_function(self, function):
+        """function() returns {label_values_tuple: value}, or a number when there are no labels"""
+        self.function = function
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                values = self.function()
+            except Exception:
+                return []
+            if not isinstance(values, dict):
+                values = {(): values}
+            with self.lock:
+                self.values = dict(values)
+        return super().samples()
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self.values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {count}')
+        return lines
+
+
+# --- Shared metrics --------------------------------------------------------
+
+http_requests = Counter('http_requests_total', 'HTTP requests handled',
+                        ('server', 'endpoint', 'method', 'status'))
+http_request_seconds = Histogram('http_request_duration_seconds', 'HTTP request latency',
+                                 ('server', 'endpoint'))
+http_in_flight = Gauge('http_requests_in_flight', 'HTTP requests being handled', ('server',))
+stage_seconds = Histogram('pipeline_stage_duration_seconds',
+                          'Time spent per pipeline stage (list, fetch, translation, summary providers, '
+                          'formatting, serialization)', ('stage',))
+cache_lookups = Counter('cache_lookups_total', 'Cache lookups by result', ('cache', 'result'))
+cache_hit_ratio = Gauge('cache_hit_ratio', 'Share of cache lookups that hit, since start', ('cache',))
+upstream_errors = Counter('upstream_errors_total', 'Failed upstream calls by error class or HTTP status',
+                          ('upstream', 'error'))
+in_flight = Gauge('pipeline_in_flight', 'Work in progress outside HTTP handlers', ('kind',))
+_in_flight_sources = {}
+
+
+def _hit_ratios():
+    with cache_lookups.lock:
+        values = dict(cache_lookups.values)
+    ratios = {}
+    for cache in {key[0] for key in values}:
+        hits = values.get((cache, 'hit'), 0)
+        total = hits + values.get((cache, 'miss'), 0)
+        ratios[(cache,)] = round(hits / total, 4) if total else 0.0
+    return ratios
+
+
+cache_hit_ratio.set_function(_hit_ratios)
+in_flight.set_function(lambda: {(kind,): source() for kind, source in list(_in_flight_sources.items())})
+
+
+def register_in_flight(kind, source):
+    """Export source() (a callable returning a count) as pipeline_in_flight{kind=...}"""
+    _in_flight_sources[kind] = source
+
+
+def time_stage(stage):
+    """Context manager adding the block's duration to pipeline_stage_duration_seconds"""
+    return stage_seconds.time(stage=stage)
+
+
+def record_cache(cache, hit):
+    cache_lookups.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def record_upstream_error(upstream, error):
+    """error is an exception or an HTTP status code"""
+    name = str(error) if isinstance(error, int) else type(error).__name__
+    upstream_errors.inc(upstream=upstream, error=name)
+
+
+def render():
+    return REGISTRY.render().encode('utf-8')
+
+
+class MetricsMixin:
+    """Mixin for BaseHTTPRequestHandler subclasses: counts and times every request.
+
+    Set `metrics_server` to a name and `metrics_endpoints` to the first path
+    segments worth their own label; anything else is reported as 'other'.
+    """
+
+    metrics_server = 'server'
+    metrics_endpoints = ()
+
+    def send_response(self, code, message=None):
+        self._metrics_status = code
+        super().send_response(code, message)
+
+    def metrics_endpoint(self):
+        first = getattr(self, 'path', '/').split('?', 1)[0].strip('/').split('/', 1)[0]
+        return first if first in self.metrics_endpoints or first == 'metrics' else 'other'
+
+    def handle_one_request(self):
+        self._metrics_status = None
+        start = time.perf_counter()
+        http_in_flight.inc(server=self.metrics_server)
+        try:
+            super().handle_one_request()
+        finally:
+            http_in_flight.dec(server=self.metrics_server)
+            # No command means the connection closed without a request
+            if getattr(self, 'command', None) and self._metrics_status is not None:
+                endpoint = self.metrics_endpoint()
+                http_request_seconds.observe(time.perf_counter() - start,
+                                             server=self.metrics_server, endpoint=endpoint)
+                http_requests.inc(server=self.metrics_server, endpoint=endpoint,
+                                  method=self.command, status=str(self._metrics_status))
+
+    def send_metrics(self):
+        body = render()
+        self.send_response(200)
+        self.send_header('Content-type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
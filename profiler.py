@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Runtime profiling for the servers
+A sampling profiler that can be started and stopped while the server runs
+(admin endpoint or SIGUSR2) and writes collapsed stacks, the input format of
+flamegraph.pl / speedscope / inferno, plus an opt-in deterministic cProfile
+of a single request selected with the X-Profile header.
+"""
+
+import cProfile
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', 30))
+MAX_PROFILE_SECONDS = 600
+PROFILE_HEADER = 'X-Profile'
+# Leaf functions of threads that are only waiting (accept loop, idle workers, socket reads)
+IDLE_FUNCTIONS = {'select', 'poll', 'wait', 'accept', 'readinto', 'readline', '_wait_for_tstate_lock', 'sleep'}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def _profile_path(kind, extension):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(PROFILE_DIR, f'{kind}-{stamp}-{os.getpid()}-{threading.get_ident() % 10000}.{extension}')
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack `interval` seconds apart from a background thread"""
+
+    def __init__(self, interval=PROFILE_INTERVAL, include_idle=False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.until = None
+        self.last_result = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds=PROFILE_SECONDS):
+        """Start sampling for `seconds`; returns False if a profile is already running"""
+        seconds = max(1.0, min(float(seconds), MAX_PROFILE_SECONDS))
+        with self.lock:
+            if self.running:
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self.until = self.started_at + seconds
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self.thread.start()
+        print(f"🔬 Sampling profiler started for {seconds:.0f}s")
+        return True
+
+    def stop(self):
+        """Stop early; the profile is written by the sampling thread"""
+        self.stop_event.set()
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout=10)
+        return self.last_result
+
+    def _sample(self, own_ident):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            if not self.include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f'thread-{ident}'))
+            self.stacks[';'.join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        next_sample = time.perf_counter()
+        while not self.stop_event.is_set() and time.time() < self.until:
+            self._sample(own_ident)
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                self.stop_event.wait(delay)
+            else:
+                # Fell behind (GIL contention): don't burst to catch up
+                next_sample = time.perf_counter()
+        self.last_result = self._write()
+
+    def _write(self):
+        path = _profile_path('cpu', 'folded')
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        result = {
+            'file': path,
+            'samples': self.samples,
+            'stacks': len(self.stacks),
+            'seconds': round(time.time() - self.started_at, 1),
+            'interval_ms': self.interval * 1000
+        }
+        print(f"🔬 Profile written to {path} ({self.samples} samples)")
+        return result
+
+    def status(self):
+        return {
+            'running': self.running,
+            'remaining_seconds': round(max(0.0, self.until - time.time()), 1) if self.running else 0,
+            'samples': self.samples,
+            'last_profile': self.last_result
+        }
+
+
+def install_signal_handler(profiler, signum=getattr(signal, 'SIGUSR2', None)):
+    """`kill -USR2 <pid>` starts a PROFILE_SECONDS profile, or stops a running one (POSIX only)"""
+    if signum is None:
+        return False
+
+    def toggle(received, frame):
+        # Joining the sampler inside a signal handler could deadlock; stop asynchronously
+        if profiler.running:
+            threading.Thread(target=profiler.stop, daemon=True).start()
+        else:
+            profiler.start()
+
+    signal.signal(signum, toggle)
+    return True
+
+
+def is_admin(handler):
+    """ADMIN_TOKEN in X-Admin-Token when configured, otherwise local clients only"""
+    token = os.getenv('ADMIN_TOKEN')
+    if token:
+        return handler.headers.get('X-Admin-Token') == token
+    return handler.client_address[0] in ('127.0.0.1', '::1')
+
+
+class ProfilingMixin:
+    """Mixin for BaseHTTPRequestHandler subclasses: `X-Profile: 1` runs cProfile over one request.
+
+    Only honoured for admin clients (see is_admin) or when PROFILE_REQUESTS=1.
+    The .prof path is returned in X-Profile-File; open it with pstats or snakeviz.
+    """
+
+    def parse_request(self):
+        ok = super().parse_request()
+        self._request_profile = None
+        if ok and self.headers.get(PROFILE_HEADER) == '1' and (
+                os.getenv('PROFILE_REQUESTS') == '1' or is_admin(self)):
+            self._request_profile = (cProfile.Profile(), _profile_path('request', 'prof'))
+            self._request_profile[0].enable()
+        return ok
+
+    def end_headers(self):
+        if getattr(self, '_request_profile', None):
+            self.send_header('X-Profile-File', self._request_profile[1])
+        super().end_headers()
+
+    def handle_one_request(self):
+        self._request_profile = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self._request_profile:
+                profile, path = self._request_profile
+                profile.disable()
+                profile.dump_stats(path)
+                print(f"🔬 Request profile written to {path}")
+
+
+# Shared by the server process
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Proxy pool for transcript fetching
+Scores proxies by latency and error rate, ejects failing ones for a cooldown,
+re-admits them on probation and keeps each video on the same proxy
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+
+from health import health
+from rate_limit import RateLimitTimeout, youtube_call, is_throttle_error, YOUTUBE_HOST
+
+# Errors that say something about the proxy rather than the video
+PROXY_ERRORS = ('ProxyError', 'ConnectTimeout', 'ConnectionError', 'ReadTimeout', 'Timeout',
+                'RemoteDisconnected', 'URLError', 'ConnectionRefusedError', 'ConnectionResetError')
+
+
+def is_proxy_error(error):
+    """True if the failure should count against the proxy that carried the request"""
+    if is_throttle_error(error):
+        return True
+    name = type(error).__name__
+    return any(marker in name for marker in PROXY_ERRORS) or isinstance(error, OSError)
+
+
+class Proxy:
+    """Health state for one proxy URL"""
+
+    def __init__(self, url, alpha=0.3):
+        self.url = url
+        self.alpha = alpha
+        self.latency = 1.0  # EWMA seconds, optimistic start
+        self.error_rate = 0.0  # EWMA of failures
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.eject_seconds = 0.0
+        self.probation = False
+
+    @property
+    def score(self):
+        """Lower is better"""
+        return self.latency * (1 + 4 * self.error_rate)
+
+    def is_available(self, now):
+        return now >= self.ejected_until
+
+    def to_dict(self, now):
+        return {
+            'url': self.url,
+            'available': self.is_available(now),
+            'latency_ms': round(self.latency * 1000),
+            'error_rate': round(self.error_rate, 3),
+            'score': round(self.score, 3),
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejected_for': round(max(0.0, self.ejected_until - now), 1)
+        }
+
+
+class ProxyPool:
+    """Pick a proxy per video, track its health and eject/re-admit on failures.
+
+    Assignment uses weighted rendezvous hashing: a video keeps landing on the same
+    proxy while that proxy stays healthy, and only moves when it is ejected.
+    """
+
+    def __init__(self, proxy_urls, eject_after=3, eject_seconds=30.0, max_eject_seconds=600.0):
+        self.proxies = [Proxy(url) for url in dict.fromkeys(proxy_urls)]
+        self.eject_after = eject_after
+        self.base_eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.lock = threading.Lock()
+        self._apis = {}
+
+    @classmethod
+    def from_env(cls):
+        """Build from TRANSCRIPT_PROXIES (comma separated) and/or TRANSCRIPT_PROXY_FILE"""
+        urls = [u.strip() for u in os.getenv('TRANSCRIPT_PROXIES', '').split(',') if u.strip()]
+        proxy_file = os.getenv('TRANSCRIPT_PROXY_FILE')
+        if proxy_file and os.path.isfile(proxy_file):
+            with open(proxy_file, 'r', encoding='utf-8') as f:
+                urls += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        return cls(urls)
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def choose(self, video_id):
+        """Sticky, health-weighted proxy for this video (None when the pool is empty)"""
+        if not self.proxies:
+            return None
+        now = time.time()
+        with self.lock:
+            candidates = [p for p in self.proxies if p.is_available(now)]
+            if not candidates:
+                # Everything is ejected: use whichever comes back first
+                return min(self.proxies, key=lambda p: p.ejected_until)
+
+            def weight(proxy):
+                digest = hashlib.md5(f'{video_id}|{proxy.url}'.encode()).digest()
+                h = (int.from_bytes(digest[:8], 'big') + 1) / (2 ** 64 + 2)
+                return -(1.0 / proxy.score) / math.log(h)
+
+            return max(candidates, key=weight)
+
+    def report(self, proxy, latency, ok):
+        """Record the outcome of one request through `proxy`"""
+        if proxy is None:
+            return
+        with self.lock:
+            proxy.requests += 1
+            proxy.latency = proxy.alpha * latency + (1 - proxy.alpha) * proxy.latency
+            proxy.error_rate = (1 - proxy.alpha) * proxy.error_rate + (0 if ok else proxy.alpha)
+            if ok:
+                proxy.consecutive_failures = 0
+                if proxy.probation:
+                    proxy.probation = False
+                    proxy.eject_seconds = 0.0
+                    print(f"Proxy re-admitted: {proxy.url}")
+                return
+
+            proxy.failures += 1
+            proxy.consecutive_failures += 1
+            # One failure on probation, or a run of failures, ejects the proxy
+            if proxy.probation or proxy.consecutive_failures >= self.eject_after:
+                if proxy.eject_seconds:
+                    proxy.eject_seconds = min(self.max_eject_seconds, proxy.eject_seconds * 2)
+                else:
+                    proxy.eject_seconds = self.base_eject_seconds
+                proxy.ejected_until = time.time() + proxy.eject_seconds
+                proxy.consecutive_failures = 0
+                proxy.probation = True
+                print(f"Proxy ejected for {proxy.eject_seconds:.0f}s: {proxy.url}")
+
+    def call(self, proxy, fn, *args, **kwargs):
+        """Run an upstream call through the rate limiter for this proxy's egress and score it"""
+        egress = proxy.url if proxy else YOUTUBE_HOST
+        started = time.monotonic()
+        try:
+            result = youtube_call(fn, *args, egress=egress, **kwargs)
+        except Exception as e:
+            self.report(proxy, time.monotonic() - started, ok=not is_proxy_error(e))
+            # Our own queue timing out says nothing about YouTube; "no transcript" means it answered;
+            # a 429 means it is up but wants us slower, which is not a reason to leave rotation
+            if is_throttle_error(e):
+                health.record_throttled('youtube')
+            elif not isinstance(e, RateLimitTimeout):
+                health.record('youtube', ok=not is_proxy_error(e))
+            raise
+        self.report(proxy, time.monotonic() - started, ok=True)
+        health.record('youtube', ok=True)
+        return result
+
+    def api_for(self, video_id):
+        """Return (YouTubeTranscriptApi, proxy) for this video; one API client per proxy"""
+        proxy = self.choose(video_id)
+        key = proxy.url if proxy else None
+        with self.lock:
+            api = self._apis.get(key)
+            if api is None:
+                from youtube_transcript_api import YouTubeTranscriptApi
+                if proxy is None:
+                    api = YouTubeTranscriptApi()
+                else:
+                    from youtube_transcript_api.proxies import GenericProxyConfig
+                    api = YouTubeTranscriptApi(proxy_config=GenericProxyConfig(
+                        http_url=proxy.url, https_url=proxy.url))
+                self._apis[key] = api
+        return api, proxy
+
+    def stats(self):
+        now = time.time()
+        with self.lock:
+            return [p.to_dict(now) for p in self.proxies]
+
+
+# Shared by every server in this process; empty unless proxies are configured
+proxy_pool = ProxyPool.from_env()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Per-client quotas
+Clients are identified by an API key (X-API-Key) from the configured set, or
+the extension's install id (X-Install-ID), falling back to their address.
+Install ids are self-asserted, so they also draw from a shared bucket per
+address that is QUOTA_INSTALLS_PER_ADDRESS times a single allowance: rotating
+ids cannot multiply what one machine gets. Expensive work draws from
+per-client token buckets that refill over an hour: Google Translate
+characters, LLM summary calls and audio transcription minutes. Buckets live
+in memory and are optionally saved to QUOTA_STATE_FILE so a restart does not
+hand every client a fresh allowance.
+"""
+
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from fast_json import dumps_bytes
+from metrics import Counter, Gauge
+from rate_limit import TokenBucket
+
+API_KEY_HEADER = 'X-API-Key'
+INSTALL_ID_HEADER = 'X-Install-ID'
+QUOTA_STATE_FILE = os.getenv('QUOTA_STATE_FILE')
+QUOTA_SAVE_SECONDS = float(os.getenv('QUOTA_SAVE_SECONDS', 60))
+MAX_CLIENTS = int(os.getenv('QUOTA_MAX_CLIENTS', 10000))
+# Accepted API keys: comma-separated in QUOTA_API_KEYS and/or one per line in QUOTA_API_KEYS_FILE
+QUOTA_API_KEYS = os.getenv('QUOTA_API_KEYS', '')
+QUOTA_API_KEYS_FILE = os.getenv('QUOTA_API_KEYS_FILE')
+INSTALLS_PER_ADDRESS = float(os.getenv('QUOTA_INSTALLS_PER_ADDRESS', 4))
+
+# Allowance per hour, which is also the burst; QUOTA_<RESOURCE>_PER_HOUR overrides, 0 means unlimited
+DEFAULT_QUOTAS = {
+    'translation_chars': 2000000,
+    'llm_calls': 60,
+    'audio_minutes': 120,
+}
+RESOURCE_LABELS = {
+    'translation_chars': 'Translation',
+    'llm_calls': 'AI summary',
+    'audio_minutes': 'Audio transcription',
+}
+
+_INSTALL_ID = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+class QuotaExceeded(Exception):
+    """The client has used up a quota; the message is safe to show to users"""
+
+    def __init__(self, message, retry_after=60, status=429):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+
+class UnknownApiKey(QuotaExceeded):
+    """X-API-Key is not one of the configured keys"""
+
+    def __init__(self):
+        super().__init__('Unknown API key', retry_after=None, status=401)
+
+
+class QuotaBucket(TokenBucket):
+    """Token bucket that can also be debited below zero, for work only measured afterwards"""
+
+    def debit(self, tokens):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+
+    def remaining(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+def _digest(secret):
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()[:16]
+
+
+def load_api_keys(keys=QUOTA_API_KEYS, path=QUOTA_API_KEYS_FILE):
+    """Digests of the accepted API keys ('#' starts a comment in the file)"""
+    accepted = [key.strip() for key in keys.split(',')]
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            accepted += [line.split('#', 1)[0].strip() for line in f]
+    return {_digest(key) for key in accepted if key}
+
+
+def identify_client(headers, client_address, api_keys=None):
+    """'key:<hash>', 'install:<hash>@<address>' or 'ip:<address>' for a request.
+
+    Keys and install ids are hashed so the ids that show up in traces, job
+    specs and the state file cannot be replayed to spend someone's quota.
+    A key that is not in `api_keys` (default: the configured ones) raises
+    UnknownApiKey instead of starting a fresh allowance.
+    """
+    api_key = headers.get(API_KEY_HEADER)
+    if api_key:
+        digest = _digest(api_key)
+        if digest not in (API_KEYS if api_keys is None else api_keys):
+            raise UnknownApiKey()
+        return 'key:' + digest
+    install_id = headers.get(INSTALL_ID_HEADER, '')
+    if _INSTALL_ID.match(install_id):
+        return f'install:{_digest(install_id)}@{client_address[0]}'
+    return 'ip:' + client_address[0]
+
+
+def _address_pool(client):
+    """Shared bucket owner for an install id's address, or None for other clients"""
+    if client.startswith('install:') and '@' in client:
+        return 'installs@' + client.rsplit('@', 1)[1]
+    return None
+
+
+class QuotaManager:
+    """Token buckets per (client, resource). Work outside a client context (CLIs) is not metered."""
+
+    def __init__(self, quotas=None, state_file=QUOTA_STATE_FILE):
+        self.limits = {name: float(os.getenv(f'QUOTA_{name.upper()}_PER_HOUR', per_hour))
+                       for name, per_hour in (quotas or DEFAULT_QUOTAS).items()}
+        self.state_file = state_file
+        self.buckets = {}
+        self.rejected = 0
+        self.lock = threading.Lock()
+        self.saver = None
+
+    def _bucket(self, client, resource, tokens=None):
+        key = (client, resource)
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= MAX_CLIENTS * len(self.limits):
+                    self._prune()
+                per_hour = self.limits[resource]
+                if client.startswith('installs@'):
+                    per_hour *= INSTALLS_PER_ADDRESS
+                bucket = self.buckets[key] = QuotaBucket(per_hour / 3600, per_hour)
+                if tokens is not None:
+                    bucket.tokens = min(bucket.capacity, tokens)
+            return bucket
+
+    def _buckets(self, client, resource):
+        """The client's own bucket, plus the shared one of its address for install ids"""
+        buckets = [self._bucket(client, resource)]
+        pool = _address_pool(client)
+        if pool:
+            buckets.append(self._bucket(pool, resource))
+        return buckets
+
+    def _prune(self):
+        """Forget buckets that have refilled completely; they are the same as new ones"""
+        for key, bucket in list(self.buckets.items()):
+            if bucket.remaining() >= bucket.capacity:
+                del self.buckets[key]
+
+    def _metered(self, resource, client):
+        client = client or _current.get()
+        return client if client is not None and self.limits.get(resource) else None
+
+    def _exceeded(self, resource, wait):
+        self.rejected += 1
+        quota_rejected.inc(resource=resource)
+        retry_after = max(1, min(int(wait) + 1, 3600))
+        raise QuotaExceeded(f'{RESOURCE_LABELS.get(resource, resource)} quota exceeded '
+                            f'({self.limits[resource]:g} per hour). Try again in {retry_after}s',
+                            retry_after=retry_after)
+
+    def consume(self, resource, amount=1, client=None):
+        """Take `amount` from the client's bucket up front; raises QuotaExceeded when it is short"""
+        client = self._metered(resource, client)
+        if client is None:
+            return
+        taken = []
+        for bucket in self._buckets(client, resource):
+            wait = bucket.try_acquire(amount)
+            if wait:
+                for charged in taken:
+                    charged.debit(-amount)      # give back what the other bucket already took
+                self._exceeded(resource, wait)
+            taken.append(bucket)
+        quota_consumed.inc(amount, resource=resource)
+
+    def check(self, resource, client=None):
+        """Raise QuotaExceeded if the client has nothing left (for work charged afterwards)"""
+        client = self._metered(resource, client)
+        if client is None:
+            return
+        for bucket in self._buckets(client, resource):
+            remaining = bucket.remaining()
+            if remaining <= 0:
+                self._exceeded(resource, (1 - remaining) / bucket.rate)
+
+    def debit(self, resource, amount, client=None):
+        """Charge work measured after the fact; the bucket may go negative"""
+        client = self._metered(resource, client)
+        if client is None:
+            return
+        for bucket in self._buckets(client, resource):
+            bucket.debit(amount)
+        quota_consumed.inc(amount, resource=resource)
+
+    def usage(self, client):
+        """Remaining allowance of each resource for one client"""
+        usage = {}
+        for resource, per_hour in self.limits.items():
+            if not per_hour:
+                usage[resource] = {'per_hour': None, 'remaining': None}
+                continue
+            remaining = min(bucket.remaining() for bucket in self._buckets(client, resource))
+            usage[resource] = {'per_hour': per_hour, 'remaining': round(max(0.0, remaining), 1)}
+        return usage
+
+    @contextmanager
+    def client(self, client_id):
+        """Make `client_id` the client charged for work in the block"""
+        token = _current.set(client_id)
+        try:
+            yield client_id
+        finally:
+            _current.reset(token)
+
+    # --- Persistence -------------------------------------------------------
+
+    def save(self):
+        """Write partly used buckets to the state file (full ones are the default anyway)"""
+        if not self.state_file:
+            return
+        with self.lock:
+            buckets = list(self.buckets.items())
+        state = {}
+        for (client, resource), bucket in buckets:
+            remaining = bucket.remaining()
+            if remaining < bucket.capacity:
+                state.setdefault(client, {})[resource] = round(remaining, 3)
+        tmp_path = self.state_file + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(dumps_bytes({'saved_at': time.time(), 'clients': state}))
+        os.replace(tmp_path, self.state_file)
+
+    def load(self):
+        """Restore buckets, refilled for the time the server was down"""
+        if not self.state_file or not os.path.isfile(self.state_file):
+            return 0
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        elapsed = max(0.0, time.time() - state.get('saved_at', 0))
+        for client, resources in state.get('clients', {}).items():
+            for resource, tokens in resources.items():
+                per_hour = self.limits.get(resource)
+                if per_hour:
+                    self._bucket(client, resource, tokens + elapsed * per_hour / 3600)
+        return len(state.get('clients', {}))
+
+    def start(self):
+        """Load saved quotas and keep saving them; returns the clients restored, or None without a state file"""
+        if not self.state_file or self.saver is not None:
+            return None
+        try:
+            restored = self.load()
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not load quota state from {self.state_file}: {e}")
+            restored = 0
+
+        def run():
+            while True:
+                time.sleep(QUOTA_SAVE_SECONDS)
+                try:
+                    self.save()
+                except OSError as e:
+                    print(f"⚠️  Could not save quota state: {e}")
+
+        self.saver = threading.Thread(target=run, name='quota-saver', daemon=True)
+        self.saver.start()
+        atexit.register(self.save)
+        return restored
+
+
+_current = contextvars.ContextVar('quota_client', default=None)
+
+
+def current_client():
+    return _current.get()
+
+
+# Shared by the server process
+API_KEYS = load_api_keys()
+quotas = QuotaManager()
+
+quota_consumed = Counter('quota_consumed_total', 'Metered work charged to clients', ('resource',))
+quota_rejected = Counter('quota_rejected_total', 'Requests refused because a client quota ran out',
+                         ('resource',))
+quota_clients = Gauge('quota_clients', 'Clients with a quota bucket in memory')
+quota_clients.set_function(lambda: len({client for client, _ in list(quotas.buckets)
+                                         if not client.startswith('installs@')}))
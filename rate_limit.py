@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Rate limiting helpers shared by the transcript servers
+Token buckets keyed by upstream host, with AIMD adjustment and jittered backoff
+when YouTube starts throttling us
+"""
+
+import os
+import random
+import threading
+import time
+
+from metrics import record_upstream_error
+
+YOUTUBE_HOST = 'www.youtube.com'
+
+# Exception class names / message fragments that mean "slow down"
+THROTTLE_ERRORS = ('TooManyRequests', 'RequestBlocked', 'IpBlocked')
+THROTTLE_MESSAGES = ('Too Many Requests', '429 Client Error', 'HTTP Error 429')
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call could not get a token before its deadline"""
+
+
+def is_throttle_error(error):
+    """True if the exception looks like a 429 / IP block from YouTube"""
+    name = type(error).__name__
+    if any(marker in name for marker in THROTTLE_ERRORS):
+        return True
+    message = str(error)
+    return any(marker in message for marker in THROTTLE_MESSAGES)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens without waiting; returns seconds to wait if not enough (0 on success)"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available; returns False if timeout expires first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or wait > remaining:
+                    return False
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """Token bucket whose rate follows AIMD: +increase per success, *decrease per throttle"""
+
+    def __init__(self, rate, capacity=None, min_rate=0.1, max_rate=None,
+                 increase=0.05, decrease=0.5, cooldown=5.0):
+        super().__init__(rate, capacity)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.last_throttle = 0.0
+        self.throttle_count = 0
+
+    def on_success(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            # Hold the reduced rate for a while after a throttle before probing upwards
+            if time.monotonic() - self.last_throttle < self.cooldown:
+                return
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.throttle_count += 1
+            # Several workers usually see the same burst of 429s; cut once per cooldown
+            if now - self.last_throttle >= self.cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                # Drain the burst allowance too
+                self.tokens = min(self.tokens, 0.0)
+            self.last_throttle = now
+
+    def stats(self):
+        with self.lock:
+            return {
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'tokens': round(self.tokens, 2),
+                'throttle_count': self.throttle_count
+            }
+
+
+class HostRateLimiter:
+    """One token bucket per upstream host"""
+
+    def __init__(self, default_rate=2.0, default_capacity=None, rates=None, bucket_class=TokenBucket):
+        self.default_rate = default_rate
+        self.default_capacity = default_capacity
+        self.rates = dict(rates or {})
+        self.bucket_class = bucket_class
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host):
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                rate = self.rates.get(host, self.default_rate)
+                bucket = self.bucket_class(rate, self.default_capacity)
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire(self, host, tokens=1, timeout=None):
+        return self.bucket(host).acquire(tokens, timeout)
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_backoff(fn, *args, limiter=None, retries=3, base_delay=1.0, max_delay=30.0,
+                      queue_timeout=None, **kwargs):
+    """Call fn under `limiter`, retrying throttle errors with jittered backoff.
+
+    `queue_timeout` is the total deadline in seconds for queueing plus retries; when
+    it cannot be met RateLimitTimeout is raised instead of piling up more calls.
+    (Any other keyword, including `timeout`, is passed on to fn.)
+    Non-throttle errors (no transcript, video unavailable, ...) are raised immediately
+    and leave the limiter's rate alone.
+    """
+    deadline = None if queue_timeout is None else time.monotonic() + queue_timeout
+    attempt = 0
+    while True:
+        if limiter is not None:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not limiter.acquire(timeout=remaining):
+                raise RateLimitTimeout('Upstream rate limit queue is full. Please try again later')
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if not is_throttle_error(e):
+                raise
+            if limiter is not None and hasattr(limiter, 'on_throttle'):
+                limiter.on_throttle()
+            if attempt >= retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            print(f"Throttled by upstream ({type(e).__name__}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        if limiter is not None and hasattr(limiter, 'on_success'):
+            limiter.on_success()
+        return result
+
+
+# Shared by every server in this process
+upstream_limits = HostRateLimiter(
+    default_rate=float(os.getenv('YOUTUBE_RATE_LIMIT', 2)),
+    default_capacity=float(os.getenv('YOUTUBE_RATE_BURST', 4)),
+    bucket_class=AdaptiveRateLimiter
+)
+YOUTUBE_QUEUE_TIMEOUT = float(os.getenv('YOUTUBE_QUEUE_TIMEOUT', 30))
+
+
+def youtube_call(fn, *args, egress=YOUTUBE_HOST, queue_timeout=YOUTUBE_QUEUE_TIMEOUT, **kwargs):
+    """Run a YouTubeTranscriptApi call under the shared adaptive limiter.
+
+    `egress` selects the bucket: each proxy gets its own budget, direct calls share one.
+    """
+    try:
+        return call_with_backoff(fn, *args, limiter=upstream_limits.bucket(egress),
+                                 queue_timeout=queue_timeout, **kwargs)
+    except Exception as e:
+        record_upstream_error('youtube', e)
+        raise
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Per-job scratch directories for yt-dlp downloads
+Every subtitle/audio job writes into its own directory, which is removed when
+the job ends; a janitor clears directories left behind by crashed processes
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+SCRATCH_ROOT = os.getenv('SCRATCH_DIR') or os.path.join(tempfile.gettempdir(), 'yt-transcript-scratch')
+OWNER_FILE = '.owner'
+
+# yt-dlp output template relative to the job directory (-P <dir> -o <template>)
+OUTPUT_TEMPLATE = '%(id)s.%(ext)s'
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        # Exists but owned by someone else (or we cannot tell): leave it alone
+        return True
+    return True
+
+
+def create_job_dir(prefix='job'):
+    """Create a fresh scratch directory and record which process owns it"""
+    os.makedirs(SCRATCH_ROOT, exist_ok=True)
+    path = tempfile.mkdtemp(prefix=f'{prefix}-', dir=SCRATCH_ROOT)
+    with open(os.path.join(path, OWNER_FILE), 'w') as f:
+        f.write(f'{os.getpid()} {time.time()}')
+    return path
+
+
+def remove_job_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@contextmanager
+def job_dir(prefix='job'):
+    """Scratch directory that is always removed when the block exits"""
+    path = create_job_dir(prefix)
+    try:
+        yield path
+    finally:
+        remove_job_dir(path)
+
+
+def cleanup_orphans(max_age=3600):
+    """Remove scratch dirs whose owning process is gone.
+
+    Age only matters for directories without a readable owner file: a long
+    job of a live process keeps its directory however old it is.
+    """
+    if not os.path.isdir(SCRATCH_ROOT):
+        return 0
+    removed = 0
+    now = time.time()
+    for name in os.listdir(SCRATCH_ROOT):
+        path = os.path.join(SCRATCH_ROOT, name)
+        if not os.path.isdir(path):
+            continue
+        try:
+            with open(os.path.join(path, OWNER_FILE), 'r') as f:
+                pid_text, created_text = f.read().split()
+            pid, created = int(pid_text), float(created_text)
+        except (OSError, ValueError):
+            # No readable owner file: fall back to the directory mtime
+            pid, created = None, os.path.getmtime(path)
+
+        orphaned = not _pid_alive(pid) if pid is not None else now - created > max_age
+        if orphaned:
+            remove_job_dir(path)
+            removed += 1
+    if removed:
+        print(f"🧹 Removed {removed} orphaned scratch directories")
+    return removed
+
+
+def start_janitor(interval=600, max_age=3600):
+    """Run cleanup_orphans now and then every `interval` seconds in a daemon thread"""
+    def loop():
+        while True:
+            try:
+                cleanup_orphans(max_age)
+            except Exception as e:
+                print(f"Scratch janitor error: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name='scratch-janitor', daemon=True)
+    thread.start()
+    return thread
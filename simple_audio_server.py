@@ -5,63 +5,57 @@ Simple Audio Transcription Server for Videos WITHOUT Captions
 
 import http.server
 import socketserver
-import json
+from fast_json import dumps_bytes, ResponseCache
 import urllib.parse
-import subprocess
 import os
-import time
-from youtube_transcript_api import YouTubeTranscriptApi
+from scratch import job_dir, start_janitor
+from jobs import TaskQueue, QueueFull
+from ytdlp_pool import ytdlp_pool
+from metrics import MetricsMixin, register_in_flight
+from admission import Overloaded, admission
+from quotas import QuotaExceeded, identify_client, quotas
+from transcript_resolver import resolver, ResolutionError, TRANSLATOR_AVAILABLE as GOOGLE_TRANSLATE
 
-try:
-    from googletrans import Translator
-    GOOGLE_TRANSLATE = True
-except ImportError:
-    GOOGLE_TRANSLATE = False
+from audio_pipeline import get_recognizer, read_wav, transcribe_audio, transcribe_stream, SPEECH_RECOGNITION
+from audio_fingerprint import fingerprint, fingerprint_index, ProbeMatched, StreamProbe, FINGERPRINT_AVAILABLE
+from audio_stream import stream_audio_frames, StreamFailed, STREAMING_AVAILABLE, STREAM_SAMPLE_RATE
 
-try:
-    import speech_recognition as sr
-    SPEECH_RECOGNITION = True
-except ImportError:
-    SPEECH_RECOGNITION = False
+# Upper bound for download + recognition of one streamed video (seconds)
+AUDIO_STREAM_TIMEOUT = int(os.getenv('AUDIO_STREAM_TIMEOUT', 3600))
 
-def download_and_transcribe_audio(video_id):
+def download_and_transcribe_audio(video_id, on_segment=None):
     """Download audio and transcribe it"""
     try:
         print(f"🎵 Processing video without captions: {video_id}")
         
-        # Step 1: Download audio
-        url = f"https://www.youtube.com/watch?v={video_id}"
-        audio_file = f"temp_{video_id}.wav"
-        
-        cmd = [
-            "yt-dlp", 
-            "-x", 
-            "--audio-format", "wav",
-            "--audio-quality", "5",
-            "-o", audio_file,
-            "--no-warnings",
-            url
-        ]
-        
-        print("📥 Downloading audio...")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-        
-        if not os.path.exists(audio_file):
-            print("❌ Audio download failed")
-            return None
-        
-        print("✅ Audio downloaded successfully")
-        
-        # Step 2: Transcribe audio
         if not SPEECH_RECOGNITION:
-            cleanup_file(audio_file)
             return "Speech recognition not available. Install: pip install SpeechRecognition"
         
-        print("🎤 Transcribing audio...")
-        transcript = transcribe_audio_file(audio_file)
+        # Transcribed before (the in-memory cache may have expired since)
+        known = fingerprint_index.get(video_id)
+        if known and known.get('transcript'):
+            print(f"🧬 Reusing stored transcript for {video_id}")
+            return known['transcript']
         
-        # Cleanup
-        cleanup_file(audio_file)
+        if STREAMING_AVAILABLE:
+            # yt-dlp | ffmpeg straight into the recognizer, no WAV file on disk
+            print("📡 Streaming audio into the recognizer...")
+            transcript = stream_and_transcribe_audio(video_id, on_segment)
+        else:
+            # Step 1: Download audio into a private scratch directory
+            with job_dir(f"audio-{video_id}") as work_dir:
+                print("📥 Downloading audio...")
+                audio_file = ytdlp_pool.download_audio(video_id, work_dir, timeout=120)
+                
+                if not audio_file:
+                    print("❌ Audio download failed")
+                    return None
+                
+                print("✅ Audio downloaded successfully")
+                
+                # Step 2: Transcribe audio
+                print("🎤 Transcribing audio...")
+                transcript = transcribe_audio_file(audio_file, on_segment, video_id)
         
         if transcript:
             print(f"✅ Transcription successful: {len(transcript)} characters")
@@ -74,63 +68,93 @@ def download_and_transcribe_audio(video_id):
         print(f"❌ Audio processing error: {e}")
         return None
 
-def transcribe_audio_file(audio_file):
-    """Transcribe audio file using speech recognition"""
+def print_segment(segment):
+    """Progress line for each transcribed segment"""
+    speech = f", {segment['speech_seconds']:.0f}s speech" if 'speech_seconds' in segment else ''
+    print(f"🎤 Segment {segment['index'] + 1} [{segment['start']:.0f}s-{segment['end']:.0f}s{speech}]: "
+          f"{len(segment['text'].split())} words")
+
+def has_stored_transcript(video_id):
+    known = fingerprint_index.get(video_id)
+    return bool(known and known.get('transcript'))
+
+def reuse_matched_transcript(video_id, match, hashes):
+    """Transcript of a known video with the same audio; remembers the new id as its mirror"""
+    known = fingerprint_index.get(match['video_id'])
+    if not known or not known.get('transcript'):
+        return None
+    print(f"🧬 Audio matches {match['video_id']} (score {match['score']}, "
+          f"offset {match['offset_seconds']}s), reusing its transcript")
+    fingerprint_index.add(video_id, hashes, known['transcript'], matched=match['video_id'])
+    return known['transcript']
+
+def stream_and_transcribe_audio(video_id, on_segment=None):
+    """Transcribe PCM frames as they come out of the downloader/decoder pipe"""
+    source = stream_audio_frames(video_id, STREAM_SAMPLE_RATE, timeout=AUDIO_STREAM_TIMEOUT)
     try:
-        r = sr.Recognizer()
+        frames, probe = source, None
+        if FINGERPRINT_AVAILABLE:
+            # Recognition starts right away; the probe stops it if the audio is a known video
+            frames = probe = StreamProbe(source, STREAM_SAMPLE_RATE, fingerprint_index, exclude=video_id,
+                                         accept=lambda match: has_stored_transcript(match['video_id']))
         
-        # Load audio file
-        with sr.AudioFile(audio_file) as source:
-            # Adjust for noise and record
-            r.adjust_for_ambient_noise(source, duration=1)
-            audio_data = r.record(source, duration=300)  # Max 5 minutes
-            
-            # Recognize speech
-            text = r.recognize_google(audio_data, language='en-US')
-            return text
-            
-    except sr.UnknownValueError:
-        print("⚠️ Could not understand audio")
-        return None
-    except sr.RequestError as e:
-        print(f"❌ Speech recognition error: {e}")
+        recognizer = get_recognizer(language='en-US')
+        try:
+            text, segments = transcribe_stream(frames, STREAM_SAMPLE_RATE, recognizer,
+                                               on_segment=on_segment or print_segment)
+        except ProbeMatched as matched:
+            return reuse_matched_transcript(video_id, matched.match, probe.fingerprinter.hashes)
+        if not text:
+            print("⚠️ Could not understand audio")
+            return None
+        if probe:
+            fingerprint_index.add(video_id, probe.fingerprinter.flush(), text, duration=probe.fingerprinter.seconds)
+        return text
+    except StreamFailed as e:
+        # Partial text is dropped: indexing or caching it would serve it as the final transcript
+        print(f"❌ Audio stream incomplete: {e}")
         return None
     except Exception as e:
-        print(f"❌ Transcription error: {e}")
+        print(f"❌ Streaming transcription error: {e}")
         return None
+    finally:
+        # Stops yt-dlp/ffmpeg if we returned early
+        source.close()
 
-def cleanup_file(filename):
-    """Remove temporary file"""
+def transcribe_audio_file(audio_file, on_segment=None, video_id=None):
+    """Transcribe the whole audio file: silence-aligned segments recognized in parallel"""
     try:
-        if os.path.exists(filename):
-            os.remove(filename)
-    except:
-        pass
+        audio = read_wav(audio_file)
+        hashes = None
+        if FINGERPRINT_AVAILABLE and video_id:
+            hashes = fingerprint(audio.data, audio.sample_rate)
+            match = fingerprint_index.match(hashes, exclude=video_id)
+            if match:
+                transcript = reuse_matched_transcript(video_id, match, hashes)
+                if transcript:
+                    return transcript
+        
+        recognizer = get_recognizer(language='en-US')
+        text, segments = transcribe_audio(audio, recognizer, on_segment=on_segment or print_segment)
+        if not text:
+            print("⚠️ Could not understand audio")
+            return None
+        if hashes is not None:
+            fingerprint_index.add(video_id, hashes, text, duration=audio.duration)
+        return text
+            
+    except Exception as e:
+        print(f"❌ Transcription error: {e}")
+        return None
 
 def try_normal_transcript(video_id):
-    """Try normal transcript extraction first"""
+    """Try normal transcript extraction first (captions in any language, translated when possible)"""
     try:
-        # Try English first
-        transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-        text = '\n'.join([item['text'] for item in transcript])
-        return text, "English (captions)"
-    except:
-        try:
-            # Try any language
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            for transcript_info in transcript_list:
-                try:
-                    if transcript_info.is_translatable:
-                        english_transcript = transcript_info.translate('en')
-                        data = english_transcript.fetch()
-                        text = '\n'.join([item['text'] for item in data])
-                        return text, f"{transcript_info.language} → English (captions)"
-                except:
-                    continue
-        except:
-            pass
-    
-    return None, None
+        resolution = resolver.resolve(video_id)
+        return resolution.text, f"{resolution.language} (captions)"
+    except ResolutionError as e:
+        print(f"No usable captions: {e}")
+        return None, None
 
 def simple_summarize(text, max_words=300):
     """Simple text summarization"""
@@ -163,32 +187,106 @@ def simple_summarize(text, max_words=300):
     
     return summary
 
-class SimpleAudioHandler(http.server.BaseHTTPRequestHandler):
+# --- Audio transcription jobs -------------------------------------------
+
+# Finished audio transcripts by video id
+transcript_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', 256)),
+    ttl=int(os.getenv('RESPONSE_CACHE_TTL', 3600)),
+    name='audio_transcripts',
+    max_bytes=int(float(os.getenv('RESPONSE_CACHE_MAX_MB', 128)) * 1024 * 1024)
+)
+
+def audio_job(task, video_id, client=None):
+    """Background worker: transcribe audio, publishing progress and partial text"""
+    task.update('downloading', segments=0, audio_seconds=0)
+
+    def on_segment(segment):
+        print_segment(segment)
+        if segment['text']:
+            task.add_partial(segment['text'])
+        task.update('transcribing', segments=segment['index'] + 1, audio_seconds=segment['end'])
+
+    # Queued jobs wait for an audio slot; AUDIO_JOB_MAX_PENDING bounds the queue
+    try:
+        with admission.stage('audio'):
+            return download_and_transcribe_audio(video_id, on_segment)
+    finally:
+        # The length is only known once the audio has been read; charge what was processed
+        quotas.debit('audio_minutes', task.progress.get('audio_seconds', 0) / 60, client)
+
+def cache_audio_result(task):
+    transcript_cache.put(task.key, {'text': task.result, 'method': 'Audio Transcription'})
+
+audio_jobs = TaskQueue(
+    audio_job,
+    max_workers=int(os.getenv('AUDIO_JOB_WORKERS', 2)),
+    max_pending=int(os.getenv('AUDIO_JOB_MAX_PENDING', 32)),
+    on_complete=cache_audio_result,
+    max_pending_per_client=int(os.getenv('AUDIO_JOB_MAX_PENDING_PER_CLIENT', 4))
+)
+register_in_flight('audio_jobs', lambda: len(audio_jobs.active_by_key))
+
+def resolve_transcript(video_id, wait=0, client=None):
+    """Return (text, method, task); task is set while audio transcription is still running"""
+    entry = transcript_cache.get(video_id)
+    if entry:
+        return entry.data['text'], entry.data['method'], None
+
+    # Caption results are cached by the shared resolver; cache hits above skip admission
+    with admission.request('fetch', client):
+        text, method = try_normal_transcript(video_id)
+    if text:
+        return text, method, None
+
+    if not SPEECH_RECOGNITION:
+        return None, None, None
+
+    # No captions: transcribe the audio in the background instead of holding the request
+    print("🎵 No captions found, queueing audio transcription...")
+    quotas.check('audio_minutes', client)
+    task = audio_jobs.submit(video_id, video_id, client, client=client)
+    if wait > 0 and task.wait(wait) and task.status == 'completed':
+        return task.result, 'Audio Transcription', None
+    return None, None, task
+
+def pending_response(task):
+    response = task.to_dict(include_partial=False)
+    response.update({
+        'success': False,
+        'pending': True,
+        'status_url': f'/jobs/{task.id}',
+        'error': f'No captions; audio transcription is {task.status}. Poll /jobs/{task.id} for progress.'
+    })
+    return response
+
+class SimpleAudioHandler(MetricsMixin, http.server.BaseHTTPRequestHandler):
+    metrics_server = 'audio'
+    metrics_endpoints = ('transcript', 'summary', 'jobs', 'health')
+    
     def do_GET(self):
+        status = 200
+        retry_after = None
         try:
             parsed_path = urllib.parse.urlparse(self.path)
             path_parts = parsed_path.path.strip('/').split('/')
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
+            if path_parts[0] == 'metrics':
+                self.send_metrics()
+                return
+            client = identify_client(self.headers, self.client_address)
+            query_params = urllib.parse.parse_qs(parsed_path.query)
+            # ?wait=N keeps the request open up to N seconds for a queued transcription
+            wait = min(float(query_params.get('wait', [0])[0]), 300)
             
             if len(path_parts) >= 2 and path_parts[0] == 'transcript':
                 video_id = path_parts[1]
+                with quotas.client(client):
+                    text, method, task = resolve_transcript(video_id, wait, client)
                 
-                # Try normal transcript first
-                text, method = try_normal_transcript(video_id)
-                
-                # If no captions, try audio transcription
-                if not text:
-                    print("🎵 No captions found, trying audio transcription...")
-                    text = download_and_transcribe_audio(video_id)
-                    method = "Audio Transcription" if text else None
-                
-                if text:
+                if task:
+                    status = 202
+                    response = pending_response(task)
+                elif text:
                     response = {
                         'success': True,
                         'transcript': text,
@@ -203,19 +301,14 @@ class SimpleAudioHandler(http.server.BaseHTTPRequestHandler):
                     
             elif len(path_parts) >= 2 and path_parts[0] == 'summary':
                 video_id = path_parts[1]
-                query_params = urllib.parse.parse_qs(parsed_path.query)
                 max_words = int(query_params.get('words', [300])[0])
+                with quotas.client(client):
+                    text, method, task = resolve_transcript(video_id, wait, client)
                 
-                # Try normal transcript first
-                text, method = try_normal_transcript(video_id)
-                
-                # If no captions, try audio transcription
-                if not text:
-                    print("🎵 No captions found, trying audio transcription...")
-                    text = download_and_transcribe_audio(video_id)
-                    method = "Audio Transcription" if text else None
-                
-                if text:
+                if task:
+                    status = 202
+                    response = pending_response(task)
+                elif text:
                     summary = simple_summarize(text, max_words)
                     response = {
                         'success': True,
@@ -230,35 +323,70 @@ class SimpleAudioHandler(http.server.BaseHTTPRequestHandler):
                         'success': False,
                         'error': 'Could not extract transcript for summarization'
                     }
+            
+            elif path_parts[0] == 'jobs' and len(path_parts) >= 2:
+                task = audio_jobs.get(path_parts[1])
+                if task:
+                    response = task.to_dict()
+                else:
+                    status = 404
+                    response = {'success': False, 'error': 'Job not found'}
+            
+            elif path_parts[0] == 'jobs':
+                response = {
+                    'success': True,
+                    'jobs': [task.to_dict(include_partial=False) for task in audio_jobs.list()]
+                }
                     
             elif path_parts[0] == 'health':
                 response = {
                     'status': 'running',
                     'audio_transcription': SPEECH_RECOGNITION,
-                    'google_translate': GOOGLE_TRANSLATE
+                    'google_translate': GOOGLE_TRANSLATE,
+                    'active_jobs': len(audio_jobs.active_by_key),
+                    'cached_transcripts': len(transcript_cache)
                 }
             else:
                 response = {'error': 'Invalid endpoint'}
             
-            self.wfile.write(json.dumps(response).encode())
-            
+        except QueueFull as e:
+            status = 503
+            retry_after = admission.classes['audio'].retry_after
+            response = {'success': False, 'error': str(e)}
+        except (Overloaded, QuotaExceeded) as e:
+            status = e.status
+            retry_after = e.retry_after
+            response = {'success': False, 'error': str(e)}
         except Exception as e:
-            error_response = {
+            response = {
                 'success': False,
                 'error': f'Server error: {str(e)}'
             }
-            self.wfile.write(json.dumps(error_response).encode())
+        
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        if retry_after:
+            self.send_header('Retry-After', str(retry_after))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-API-Key, X-Install-ID')
+        self.end_headers()
+        self.wfile.write(dumps_bytes(response))
     
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-API-Key, X-Install-ID')
         self.end_headers()
     
     def log_message(self, format, *args):
         pass
 
+class ThreadedServer(socketserver.ThreadingTCPServer):
+    """One thread per connection so slow yt-dlp jobs do not block other requests"""
+    daemon_threads = True
+
 if __name__ == '__main__':
     PORT = 5000
     
@@ -266,17 +394,23 @@ if __name__ == '__main__':
     print("=" * 40)
     print(f"🌐 Server: http://localhost:{PORT}")
     print(f"🎤 Speech Recognition: {'✅' if SPEECH_RECOGNITION else '❌'}")
+    print(f"📡 Streaming audio (yt-dlp | ffmpeg): {'✅' if STREAMING_AVAILABLE else '❌ (WAV download fallback)'}")
+    print(f"🧬 Audio fingerprint dedup: {'✅' if FINGERPRINT_AVAILABLE else '❌ (pip install numpy)'}")
     print(f"🔤 Google Translate: {'✅' if GOOGLE_TRANSLATE else '❌'}")
     print("=" * 40)
     print("🎯 FEATURES:")
     print("  • Normal captions (any language)")
     print("  • Audio transcription (no captions)")
     print("  • Simple summarization")
+    print("  • Background audio jobs (GET /jobs/{id} for progress)")
     print("=" * 40)
     print("Press Ctrl+C to stop")
     
+    # Clear scratch directories left behind by crashed runs, then keep checking
+    start_janitor()
+    
     try:
-        with socketserver.TCPServer(("", PORT), SimpleAudioHandler) as httpd:
+        with ThreadedServer(("", PORT), SimpleAudioHandler) as httpd:
             httpd.serve_forever()
     except KeyboardInterrupt:
         print("\n🛑 Server stopped")
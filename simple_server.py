@@ -5,14 +5,11 @@ Simple HTTP server for YouTube Transcript API with Translation
 
 import http.server
 import socketserver
-import json
+from fast_json import dumps_bytes
 import urllib.parse
-from youtube_transcript_api import YouTubeTranscriptApi
-try:
-    from googletrans import Translator
-    TRANSLATOR_AVAILABLE = True
-except ImportError:
-    TRANSLATOR_AVAILABLE = False
+from metrics import MetricsMixin
+from transcript_resolver import resolver, resolve_transcript, friendly_error, ResolutionError, TRANSLATOR_AVAILABLE
+if not TRANSLATOR_AVAILABLE:
     print("Warning: googletrans not installed. Install with: pip install googletrans==4.0.0-rc1")
 
 import re
@@ -66,13 +63,20 @@ def summarize_text(text, max_words=1500):
     
     return summary
 
-class TranscriptHandler(http.server.BaseHTTPRequestHandler):
+class TranscriptHandler(MetricsMixin, http.server.BaseHTTPRequestHandler):
+    metrics_server = 'simple'
+    metrics_endpoints = ('transcript', 'list', 'summary', 'health')
+    
     def do_GET(self):
         try:
             # Parse URL
             parsed_path = urllib.parse.urlparse(self.path)
             path_parts = parsed_path.path.strip('/').split('/')
             
+            if path_parts[0] == 'metrics':
+                self.send_metrics()
+                return
+            
             # Add CORS headers
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
@@ -85,94 +89,9 @@ class TranscriptHandler(http.server.BaseHTTPRequestHandler):
                 # Extract transcript
                 video_id = path_parts[1]
                 
-                # Enhanced multi-language transcript extraction
-                text = None
-                original_language = "English"
-                
-                # Method 1: Try direct English transcript first
-                try:
-                    transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-                    text = '\n'.join([snippet['text'] for snippet in transcript])
-                    original_language = "English (direct)"
-                except:
-                    # Method 2: Try any available language with comprehensive fallback
-                    try:
-                        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-                        
-                        # Priority order: translatable transcripts first, then original
-                        transcripts_to_try = []
-                        for transcript_info in transcript_list:
-                            if transcript_info.is_translatable:
-                                transcripts_to_try.insert(0, transcript_info)  # Add to front
-                            else:
-                                transcripts_to_try.append(transcript_info)  # Add to back
-                        
-                        for transcript_info in transcripts_to_try:
-                            try:
-                                if transcript_info.is_translatable:
-                                    # Try YouTube's built-in translation to English
-                                    try:
-                                        english_transcript = transcript_info.translate('en')
-                                        transcript_data = english_transcript.fetch()
-                                        text = '\n'.join([snippet['text'] for snippet in transcript_data])
-                                        original_language = f"{transcript_info.language} → English (YouTube translated)"
-                                        break
-                                    except Exception as yt_translate_error:
-                                        print(f"YouTube translation failed: {yt_translate_error}")
-                                        continue
-                                
-                                # Get original transcript and try Google Translate
-                                transcript_data = transcript_info.fetch()
-                                original_text = '\n'.join([snippet['text'] for snippet in transcript_data])
-                                
-                                if transcript_info.language_code == 'en':
-                                    # It's already English
-                                    text = original_text
-                                    original_language = f"{transcript_info.language} (original)"
-                                    break
-                                elif TRANSLATOR_AVAILABLE:
-                                    # Try Google Translate
-                                    try:
-                                        translator = Translator()
-                                        # Split into chunks if text is too long
-                                        if len(original_text) > 5000:
-                                            chunks = [original_text[i:i+4500] for i in range(0, len(original_text), 4500)]
-                                            translated_chunks = []
-                                            for chunk in chunks:
-                                                translated_chunk = translator.translate(chunk, dest='en')
-                                                translated_chunks.append(translated_chunk.text)
-                                            text = ' '.join(translated_chunks)
-                                        else:
-                                            translated = translator.translate(original_text, dest='en')
-                                            text = translated.text
-                                        original_language = f"{transcript_info.language} → English (Google translated)"
-                                        break
-                                    except Exception as google_translate_error:
-                                        print(f"Google translation failed: {google_translate_error}")
-                                        # Use original text as fallback
-                                        text = original_text
-                                        original_language = f"{transcript_info.language} (original - no translation)"
-                                        break
-                                else:
-                                    # No translation available, use original
-                                    text = original_text
-                                    original_language = f"{transcript_info.language} (original - no translation)"
-                                    break
-                                    
-                            except Exception as fetch_error:
-                                print(f"Failed to fetch transcript: {fetch_error}")
-                                continue
-                        
-                        if text is None:
-                            raise Exception("Could not fetch any available transcripts from any language")
-                            
-                    except Exception as list_error:
-                        if "disabled" in str(list_error).lower():
-                            raise Exception("Transcripts are disabled for this video")
-                        elif "unavailable" in str(list_error).lower():
-                            raise Exception("Video is unavailable or private")
-                        else:
-                            raise Exception(f"No transcripts available: {str(list_error)}")
+                resolution = resolve_transcript(video_id)
+                text = resolution.text
+                original_language = resolution.language
                 
                 response = {
                     'success': True,
@@ -184,15 +103,10 @@ class TranscriptHandler(http.server.BaseHTTPRequestHandler):
             elif len(path_parts) >= 2 and path_parts[0] == 'list':
                 # List transcripts
                 video_id = path_parts[1]
-                transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-                
-                languages = []
-                for transcript in transcript_list:
-                    languages.append({
-                        'language': transcript.language,
-                        'code': transcript.language_code,
-                        'generated': transcript.is_generated
-                    })
+                languages = [
+                    {'language': lang['language'], 'code': lang['code'], 'generated': lang['generated']}
+                    for lang in resolver.list_languages(video_id)
+                ]
                 
                 response = {
                     'success': True,
@@ -206,75 +120,9 @@ class TranscriptHandler(http.server.BaseHTTPRequestHandler):
                 query_params = urllib.parse.parse_qs(parsed_path.query)
                 max_words = int(query_params.get('words', [1500])[0])
                 
-                # Use the same enhanced transcript extraction logic
-                text = None
-                original_language = "English"
-                
-                try:
-                    transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-                    text = '\n'.join([snippet['text'] for snippet in transcript])
-                    original_language = "English (direct)"
-                except:
-                    try:
-                        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-                        
-                        # Priority order: translatable transcripts first, then original
-                        transcripts_to_try = []
-                        for transcript_info in transcript_list:
-                            if transcript_info.is_translatable:
-                                transcripts_to_try.insert(0, transcript_info)
-                            else:
-                                transcripts_to_try.append(transcript_info)
-                        
-                        for transcript_info in transcripts_to_try:
-                            try:
-                                if transcript_info.is_translatable:
-                                    try:
-                                        english_transcript = transcript_info.translate('en')
-                                        transcript_data = english_transcript.fetch()
-                                        text = '\n'.join([snippet['text'] for snippet in transcript_data])
-                                        original_language = f"{transcript_info.language} → English (YouTube translated)"
-                                        break
-                                    except:
-                                        continue
-                                
-                                transcript_data = transcript_info.fetch()
-                                original_text = '\n'.join([snippet['text'] for snippet in transcript_data])
-                                
-                                if transcript_info.language_code == 'en':
-                                    text = original_text
-                                    original_language = f"{transcript_info.language} (original)"
-                                    break
-                                elif TRANSLATOR_AVAILABLE:
-                                    try:
-                                        translator = Translator()
-                                        if len(original_text) > 5000:
-                                            chunks = [original_text[i:i+4500] for i in range(0, len(original_text), 4500)]
-                                            translated_chunks = []
-                                            for chunk in chunks:
-                                                translated_chunk = translator.translate(chunk, dest='en')
-                                                translated_chunks.append(translated_chunk.text)
-                                            text = ' '.join(translated_chunks)
-                                        else:
-                                            translated = translator.translate(original_text, dest='en')
-                                            text = translated.text
-                                        original_language = f"{transcript_info.language} → English (Google translated)"
-                                        break
-                                    except:
-                                        text = original_text
-                                        original_language = f"{transcript_info.language} (original - no translation)"
-                                        break
-                                else:
-                                    text = original_text
-                                    original_language = f"{transcript_info.language} (original - no translation)"
-                                    break
-                            except:
-                                continue
-                        
-                        if text is None:
-                            raise Exception("Could not fetch any available transcripts from any language")
-                    except Exception as e:
-                        raise Exception(f"No transcripts available: {str(e)}")
+                resolution = resolve_transcript(video_id)
+                text = resolution.text
+                original_language = resolution.language
                 
                 # Generate summary
                 print(f"Generating summary for {len(text.split())} words, target: {max_words} words")
@@ -296,25 +144,17 @@ class TranscriptHandler(http.server.BaseHTTPRequestHandler):
             else:
                 response = {'error': 'Invalid endpoint'}
             
-            self.wfile.write(json.dumps(response).encode())
+            self.wfile.write(dumps_bytes(response))
             
         except Exception as e:
-            error_msg = str(e)
-            # Provide more user-friendly error messages
-            if "TranscriptsDisabled" in error_msg:
-                error_msg = "Transcripts are disabled for this video"
-            elif "VideoUnavailable" in error_msg:
-                error_msg = "Video is unavailable or private"
-            elif "NoTranscriptFound" in error_msg:
-                error_msg = "No transcripts found for this video"
-            elif "TooManyRequests" in error_msg:
-                error_msg = "Too many requests. Please wait a moment and try again"
+            # Resolution errors already carry a user-friendly message
+            error_msg = str(e) if isinstance(e, ResolutionError) else friendly_error(e)
             
             error_response = {
                 'success': False,
                 'error': error_msg
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            self.wfile.write(dumps_bytes(error_response))
     
     def do_OPTIONS(self):
         # Handle preflight requests
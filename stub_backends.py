@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Offline stand-ins for YouTube, Google Translate and the summary APIs
+Serves the bundled Episode 527 subtitle files (and synthetic multi-hour
+transcripts built from them) through the same objects youtube_transcript_api
+returns, so the resolver, summarizers and servers run without the network.
+Used by the benchmark suite and the load tester.
+"""
+
+import glob
+import os
+import threading
+import time
+
+from subtitle_index import parse_subtitle_name
+from subtitle_parser import Caption, parse_file
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_VIDEO_ID = '-Kaq9QOyPdM'
+LANGUAGE_NAMES = {'en': 'English', 'de': 'German', 'es': 'Spanish', 'fr': 'French', 'it': 'Italian',
+                  'ja': 'Japanese', 'pt': 'Portuguese', 'ru': 'Russian', 'hi': 'Hindi'}
+
+
+def load_fixtures(root=FIXTURE_DIR):
+    """{language: [Caption, ...]} of the bundled Episode 527 .vtt files"""
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(glob.escape(root), '*.vtt'))):
+        video_id, language = parse_subtitle_name(path)
+        if video_id == FIXTURE_VIDEO_ID:
+            fixtures[language] = list(parse_file(path))
+    if not fixtures:
+        raise FileNotFoundError(f'No Episode 527 .vtt fixtures found in {root}')
+    return fixtures
+
+
+def english_captions(fixtures):
+    """The English fixture, or the largest track tagged as translated when the
+    English file carries only cue timings (as the bundled one does)"""
+    if fixtures.get('en'):
+        return fixtures['en']
+    source = max(fixtures.values(), key=len)
+    return [caption._replace(text=f'[en] {caption.text}') for caption in source]
+
+
+def synthetic_captions(captions, hours):
+    """Repeat an episode's captions, shifted in time, until they cover `hours`"""
+    episode = captions[-1].end
+    result = []
+    offset = 0.0
+    while offset < hours * 3600:
+        result.extend(Caption(c.start + offset, c.end + offset, c.text) for c in captions)
+        offset += episode
+    return result
+
+
+def to_vtt(captions):
+    """Captions as WebVTT text, for parser benchmarks on synthetic transcripts"""
+    def stamp(seconds):
+        hours, rest = divmod(seconds, 3600)
+        minutes, secs = divmod(rest, 60)
+        return f'{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}'
+    lines = ['WEBVTT', 'Kind: captions', 'Language: en', '']
+    for caption in captions:
+        lines += [f'{stamp(caption.start)} --> {stamp(caption.end)}', caption.text, '']
+    return '\n'.join(lines)
+
+
+# --- youtube_transcript_api -------------------------------------------------
+
+class NoTranscriptFound(Exception):
+    """Same class name as youtube_transcript_api's, so friendly_error() maps it"""
+
+
+class TranscriptsDisabled(Exception):
+    pass
+
+
+class StubSnippet:
+    __slots__ = ('text', 'start', 'duration')
+
+    def __init__(self, caption):
+        self.text = caption.text
+        self.start = caption.start
+        self.duration = caption.end - caption.start
+
+
+class StubTranscript:
+    """One caption track; translate() serves another fixture language"""
+
+    def __init__(self, backend, language_code, captions, is_generated=False, is_translatable=True):
+        self.backend = backend
+        self.language_code = language_code
+        self.language = LANGUAGE_NAMES.get(language_code, language_code)
+        self.captions = captions
+        self.is_generated = is_generated
+        self.is_translatable = is_translatable
+
+    def fetch(self):
+        self.backend.wait('fetch')
+        return [StubSnippet(caption) for caption in self.captions]
+
+    def translate(self, language_code):
+        captions = self.backend.translations.get(language_code)
+        if not self.is_translatable or captions is None:
+            raise NoTranscriptFound(f'{self.language_code} cannot be translated to {language_code}')
+        return StubTranscript(self.backend, language_code, captions, is_generated=True, is_translatable=False)
+
+
+class StubTranscriptList:
+    def __init__(self, transcripts):
+        self.transcripts = transcripts
+
+    def __iter__(self):
+        return iter(self.transcripts)
+
+    def find_transcript(self, language_codes):
+        for code in language_codes:
+            for transcript in self.transcripts:
+                if transcript.language_code == code:
+                    return transcript
+        raise NoTranscriptFound(f'No transcript in {language_codes}')
+
+
+class StubYouTube:
+    """Drop-in for YouTubeTranscriptApi serving a catalogue of fake videos.
+
+    Every video id resolves: ids in `videos` get their configured tracks, ids
+    like 'google-translate_0042' get the tracks of the scenario before the last
+    underscore, and any other id gets the English fixture, so load tests can use
+    millions of distinct ids.
+    `latency` seconds are spent on every list/fetch call to mimic the network.
+    """
+
+    def __init__(self, fixtures=None, latency=0.0, hours=3):
+        self.fixtures = fixtures or load_fixtures()
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = {'list': 0, 'fetch': 0}
+        english = english_captions(self.fixtures)
+        self.english = english
+        self.translations = {'en': english}
+        long_english = synthetic_captions(english, hours)
+        long_japanese = synthetic_captions(self.fixtures['ja'], hours)
+        self.videos = {
+            # Direct English track among the eight fixture languages
+            'direct': [(code, english if code == 'en' else captions, True)
+                       for code, captions in self.fixtures.items()],
+            # Japanese only: YouTube translates it
+            'youtube-translate': [('ja', self.fixtures['ja'], True)],
+            # Japanese only and not translatable: Google Translate chunk by chunk
+            'google-translate': [('ja', self.fixtures['ja'], False)],
+            'long-direct': [('en', long_english, True)],
+            'long-google-translate': [('ja', long_japanese, False)],
+            'no-captions': [],
+        }
+
+    def wait(self, call):
+        with self.lock:
+            self.calls[call] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def list(self, video_id):
+        self.wait('list')
+        tracks = self.videos.get(video_id)
+        if tracks is None:
+            tracks = self.videos.get(video_id.rsplit('_', 1)[0], [('en', self.english, True)])
+        if not tracks:
+            raise TranscriptsDisabled(f'Subtitles are disabled for {video_id}')
+        return StubTranscriptList([StubTranscript(self, code, captions, is_translatable=translatable)
+                                   for code, captions, translatable in tracks])
+
+
+# --- googletrans --------------------------------------------------------------
+
+class StubTranslated:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubTranslator:
+    """googletrans.Translator stand-in: tags the text with the target language"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def translate(self, text, src='auto', dest='en'):
+        if self.latency:
+            time.sleep(self.latency)
+        return StubTranslated(f'[{dest}] {text}')
+
+
+# --- Gemini / Hugging Face ----------------------------------------------------
+
+class StubResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class StubSummaryApi:
+    """requests.post replacement answering like Gemini and Hugging Face"""
+
+    def __init__(self, latency=0.0, status_code=200):
+        self.latency = latency
+        self.status_code = status_code
+
+    def post(self, url, json=None, headers=None, timeout=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.status_code != 200:
+            return StubResponse(self.status_code, {'error': 'stubbed failure'})
+        if 'generativelanguage' in url:
+            prompt = json['contents'][0]['parts'][0]['text']
+            words = prompt.split(':', 1)[-1].split()[:json['generationConfig']['maxOutputTokens'] // 2]
+            return StubResponse(200, {'candidates': [{'content': {'parts': [{'text': ' '.join(words)}]}}]})
+        words = str(json.get('inputs', '')).split()[:json.get('parameters', {}).get('max_length', 100)]
+        return StubResponse(200, [{'summary_text': ' '.join(words)}])
+
+
+def install(youtube_latency=0.0, translate_latency=0.0, summary_latency=0.0, hours=3, summaries=True):
+    """Point the shared proxy pool, resolver and summary calls at the stubs.
+
+    Process-wide and not undone: meant for benchmark and load-test processes only.
+    Returns the StubYouTube so callers can inspect call counts.
+    """
+    import proxy_pool
+    import transcript_resolver
+    from rate_limit import upstream_limits
+
+    # No rate limiting against a local stub
+    with upstream_limits.lock:
+        upstream_limits.default_rate = upstream_limits.default_capacity = 1e6
+        upstream_limits.buckets.clear()
+
+    youtube = StubYouTube(latency=youtube_latency, hours=hours)
+    proxy_pool.proxy_pool.api_for = lambda video_id: (youtube, None)
+    transcript_resolver.TRANSLATOR_AVAILABLE = True
+    transcript_resolver.translators = transcript_resolver.TranslatorPool(lambda: StubTranslator(translate_latency))
+
+    if summaries:
+        os.environ.setdefault('GEMINI_API_KEY', 'stub')
+        os.environ.setdefault('HUGGINGFACE_API_KEY', 'stub')
+        try:
+            import requests
+            requests.post = StubSummaryApi(summary_latency).post
+        except ImportError:
+            pass
+    return youtube
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Local per-video subtitle index
+Harvests every wanted subtitle track of a video with one yt-dlp run, parses
+them and stores the captions by language, so later requests for another
+language are answered from disk without going back to YouTube
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from fast_json import dumps_bytes
+from scratch import job_dir
+from subtitle_parser import parse_file
+from ytdlp_pool import ytdlp_pool
+
+DEFAULT_INDEX_DIR = os.getenv('SUBTITLE_INDEX_DIR', 'subtitle_index')
+# Same set the ultimate server tries; 'all' asks yt-dlp for every track (including auto-translations)
+HARVEST_LANGUAGES = [lang.strip() for lang in os.getenv(
+    'HARVEST_LANGUAGES', 'en,hi,es,fr,de,ja,ko,zh,ar,ru,pt,it').split(',') if lang.strip()]
+# A harvest that found no tracks is trusted this long; captions may be added later,
+# and an empty run can also be a transient yt-dlp failure
+EMPTY_HARVEST_TTL = float(os.getenv('EMPTY_HARVEST_TTL', 600))
+
+# "<title> [<video id>].<lang>.vtt" as written by yt-dlp's default template,
+# or "<video id>.<lang>.vtt" from the scratch-directory template
+SUBTITLE_NAME_RE = re.compile(r'(?:\[(?P<bracket_id>[\w-]{11})\]|^(?P<plain_id>[\w-]{11}))\.(?P<lang>[\w-]+)\.(?:vtt|srt)$')
+
+
+def parse_subtitle_name(filename):
+    """Return (video_id, language) from a yt-dlp subtitle file name, or (None, None)"""
+    match = SUBTITLE_NAME_RE.search(os.path.basename(filename))
+    if not match:
+        return None, None
+    return match.group('bracket_id') or match.group('plain_id'), match.group('lang')
+
+
+class SubtitleIndex:
+    """Captions stored as <root>/<video_id>/<lang>.json plus an index.json manifest"""
+
+    def __init__(self, root=DEFAULT_INDEX_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        # One harvest per video at a time; concurrent callers wait for it.
+        # video_id -> [lock, callers], dropped when the last caller is done
+        self._harvest_locks = {}
+
+    def _video_dir(self, video_id):
+        return os.path.join(self.root, video_id)
+
+    def _manifest_path(self, video_id):
+        return os.path.join(self._video_dir(video_id), 'index.json')
+
+    def manifest(self, video_id):
+        try:
+            with open(self._manifest_path(video_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def languages(self, video_id):
+        manifest = self.manifest(video_id)
+        return sorted(manifest['languages']) if manifest else []
+
+    def has(self, video_id, language=None):
+        manifest = self.manifest(video_id)
+        if manifest is None:
+            return False
+        if not manifest['languages'] and time.time() - manifest.get('updated_at', 0) > EMPTY_HARVEST_TTL:
+            return False
+        return language is None or language in manifest['languages']
+
+    def get_captions(self, video_id, language):
+        """[[start, end, text], ...] for one language, or None"""
+        path = os.path.join(self._video_dir(video_id), f'{language}.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get_text(self, video_id, language):
+        captions = self.get_captions(video_id, language)
+        if captions is None:
+            return None
+        return '\n'.join(text for _, _, text in captions)
+
+    def add_file(self, video_id, language, path):
+        """Parse one subtitle file and store it under video_id/language"""
+        captions = [[round(c.start, 3), round(c.end, 3), c.text] for c in parse_file(path)]
+        video_dir = self._video_dir(video_id)
+        os.makedirs(video_dir, exist_ok=True)
+        with open(os.path.join(video_dir, f'{language}.json'), 'wb') as f:
+            f.write(dumps_bytes(captions))
+
+        self._update_manifest(video_id, language, {
+            'captions': len(captions),
+            'words': sum(len(text.split()) for _, _, text in captions),
+            'duration': captions[-1][1] if captions else 0,
+            'source': os.path.basename(path)
+        })
+        return len(captions)
+
+    def _update_manifest(self, video_id, language=None, info=None):
+        with self.lock:
+            manifest = self.manifest(video_id) or {'video_id': video_id, 'languages': {}}
+            if language is not None:
+                manifest['languages'][language] = info
+            manifest['updated_at'] = time.time()
+            os.makedirs(self._video_dir(video_id), exist_ok=True)
+            tmp_path = self._manifest_path(video_id) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(dumps_bytes(manifest, pretty=True))
+            os.replace(tmp_path, self._manifest_path(video_id))
+
+    def import_directory(self, directory):
+        """Index every yt-dlp subtitle file found in directory; returns the file count"""
+        count = 0
+        for name in sorted(os.listdir(directory)):
+            video_id, language = parse_subtitle_name(name)
+            if video_id:
+                self.add_file(video_id, language, os.path.join(directory, name))
+                count += 1
+        return count
+
+    def harvest(self, video_id, languages=None, timeout=60, skip_if_indexed=False):
+        """Fetch all wanted subtitle tracks in one yt-dlp run and index them"""
+        languages = languages or HARVEST_LANGUAGES
+        with self.lock:
+            entry = self._harvest_locks.setdefault(video_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                # Another request may have harvested this video while we waited
+                if skip_if_indexed and self.has(video_id):
+                    return self.languages(video_id)
+                found = 0
+                with job_dir(f"harvest-{video_id}") as work_dir:
+                    print(f"📥 Harvesting subtitles for {video_id}: {','.join(languages)}")
+                    sub_files = ytdlp_pool.extract_subtitles(video_id, work_dir, languages, timeout=timeout)
+                    for path in sub_files:
+                        _, language = parse_subtitle_name(path)
+                        if language:
+                            self.add_file(video_id, language, path)
+                            found += 1
+                if not found:
+                    # Remember the empty result for EMPTY_HARVEST_TTL only (see has())
+                    self._update_manifest(video_id)
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._harvest_locks.pop(video_id, None)
+        return self.languages(video_id)
+
+    def get_or_harvest(self, video_id, language='en'):
+        """Transcript text for language, harvesting every track once if the video is unknown"""
+        if not self.has(video_id):
+            self.harvest(video_id, skip_if_indexed=True)
+        return self.get_text(video_id, language)
+
+
+subtitle_index = SubtitleIndex()
+
+
+if __name__ == '__main__':
+    # python subtitle_index.py import <dir>   - index existing .vtt/.srt files
+    # python subtitle_index.py harvest <id>   - harvest a video now
+    if len(sys.argv) >= 3 and sys.argv[1] == 'import':
+        count = subtitle_index.import_directory(sys.argv[2])
+        print(f"Indexed {count} subtitle files into {subtitle_index.root}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'harvest':
+        print(f"Languages: {subtitle_index.harvest(sys.argv[2])}")
+    else:
+        print("Usage: python subtitle_index.py import <dir> | harvest <video_id>")
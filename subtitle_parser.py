@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Streaming WebVTT / SRT parser
+Yields (start, end, text) captions in one linear pass and collapses the rolling
+duplicates that YouTube auto-subs produce
+"""
+
+import html
+import re
+from collections import namedtuple
+
+Caption = namedtuple('Caption', ['start', 'end', 'text'])
+
+# "00:01:02.345 --> 00:01:04.000 align:start position:0%" (VTT) or "00:01:02,345 --> 00:01:04,000" (SRT)
+TIMING_RE = re.compile(r'^\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}[.,]\d{1,3})')
+# Inline karaoke timestamps and styling: <00:00:01.234>, <c>, </c>, <c.colorE5E5E5>, <i>, ...
+TAG_RE = re.compile(r'<[^>]*>')
+
+# Header / metadata blocks that carry no caption text
+BLOCK_PREFIXES = ('WEBVTT', 'NOTE', 'STYLE', 'REGION')
+HEADER_PREFIXES = ('Kind:', 'Language:')
+
+
+def parse_timestamp(value):
+    """'01:02:03.456', '02:03.456' or '01:02:03,456' -> seconds"""
+    value = value.replace(',', '.')
+    parts = value.split(':')
+    seconds = float(parts[-1])
+    minutes = int(parts[-2]) if len(parts) >= 2 else 0
+    hours = int(parts[-3]) if len(parts) >= 3 else 0
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def clean_line(line):
+    """Strip tags and entities from one caption line"""
+    if '<' in line:
+        line = TAG_RE.sub('', line)
+    if '&' in line:
+        line = html.unescape(line)
+    return line.strip()
+
+
+def iter_cues(lines):
+    """Yield (start, end, [text lines]) for every cue; `lines` can be a file object"""
+    start = end = None
+    text_lines = []
+    skipping_block = False
+
+    for raw in lines:
+        line = raw.rstrip('\r\n')
+        # Only a truly empty line ends a cue; YouTube pads cues with ' ' lines
+        if not line:
+            if start is not None:
+                yield start, end, text_lines
+                start = end = None
+                text_lines = []
+            skipping_block = False
+            continue
+
+        if start is not None:
+            text_lines.append(line)
+            continue
+
+        if not line.strip():
+            continue
+
+        if skipping_block:
+            continue
+
+        if '-->' in line:
+            match = TIMING_RE.match(line)
+            if match:
+                start = parse_timestamp(match.group(1))
+                end = parse_timestamp(match.group(2))
+            continue
+
+        stripped = line.lstrip('\ufeff')
+        if stripped.startswith(BLOCK_PREFIXES):
+            skipping_block = True
+        # Anything else before a timing line is a cue id (SRT index) or header field
+
+    if start is not None:
+        yield start, end, text_lines
+
+
+def rolling_overlap(previous, lines):
+    """How many leading `lines` repeat the trailing lines of the previous cue"""
+    for size in range(min(len(previous), len(lines)), 0, -1):
+        if lines[:size] == previous[-size:]:
+            return size
+    return 0
+
+
+def iter_captions(lines, dedupe=True):
+    """Yield Caption(start, end, text) records.
+
+    With dedupe, the lines a cue carries over from the cue right before it are
+    dropped (YouTube rolling cues repeat the previous line above the new one),
+    and cues that add nothing just extend the end time of the previous caption.
+    A line said again later, after other captions, is kept.
+    """
+    previous = []
+    pending = None
+
+    for start, end, text_lines in iter_cues(lines):
+        texts = [text for text in map(clean_line, text_lines) if text]
+        if not texts:
+            continue
+        carried = rolling_overlap(previous, texts) if dedupe else 0
+        previous = texts
+        new_lines = texts[carried:]
+
+        if not new_lines:
+            # A cue that only repeats the previous line keeps it on screen longer
+            if pending is not None and end > pending.end:
+                pending = pending._replace(end=end)
+            continue
+
+        if pending is not None:
+            yield pending
+        pending = Caption(start, end, ' '.join(new_lines))
+
+    if pending is not None:
+        yield pending
+
+
+def parse_file(path, dedupe=True):
+    """Stream captions from a .vtt or .srt file"""
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        yield from iter_captions(f, dedupe)
+
+
+def captions_to_text(captions):
+    """Join caption texts with newlines, the format the servers return"""
+    return '\n'.join(caption.text for caption in captions)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Offline test script for admission control and load shedding
+"""
+
+import threading
+import time
+from contextlib import ExitStack
+
+import admission
+from admission import AdmissionController, Overloaded
+
+CLASSES = {
+    'cached': (8, 1.0, 1.0, 1),
+    'fetch': (2, 0.5, 1.0, 2),
+    'translate': (1, 0.2, 1.0, 5),
+    'summary': (1, 0.1, 0.5, 10),
+}
+
+
+def hold(controller, name, started, release):
+    def run():
+        with controller.request(name):
+            started.release()
+            release.wait()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_classes_are_limited_and_shed():
+    controller = AdmissionController(CLASSES, max_concurrency=4, enabled=True)
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    threads = [hold(controller, 'fetch', started, release) for _ in range(2)]
+    for _ in threads:
+        started.acquire()
+    try:
+        # fetch is full: the next one waits out its deadline and gets a 503 with Retry-After
+        begin = time.perf_counter()
+        try:
+            with controller.request('fetch'):
+                raise AssertionError('fetch limit not enforced')
+        except Overloaded as e:
+            assert e.status == 503 and e.retry_after == 2
+        assert 0.4 < time.perf_counter() - begin < 2
+
+        # summary may only use half of the total concurrency, which fetch already holds
+        try:
+            with controller.request('summary'):
+                raise AssertionError('summary share not enforced')
+        except Overloaded as e:
+            assert e.retry_after == 10
+
+        # Cached reads still go straight through
+        with controller.request('cached') as ticket:
+            assert ticket.queued_seconds < 0.05
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert controller.active == 0 and controller.rejected == 2
+    print("✅ Saturated classes shed with Retry-After, cached reads are admitted immediately")
+
+
+def test_higher_class_is_served_first():
+    controller = AdmissionController(CLASSES, max_concurrency=1, enabled=True)
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    holder = hold(controller, 'fetch', started, release)
+    started.acquire()
+
+    order = []
+
+    def request(name):
+        with controller.request(name):
+            order.append(name)
+
+    waiting = [threading.Thread(target=request, args=(name,)) for name in ('fetch', 'cached')]
+    for thread in waiting:
+        thread.start()
+        time.sleep(0.05)
+    release.set()
+    for thread in [holder] + waiting:
+        thread.join()
+    assert order == ['cached', 'fetch'], order
+    print("✅ A queued cached read is admitted before an earlier queued fetch")
+
+
+def test_stage_escalates_request():
+    controller = AdmissionController(CLASSES, max_concurrency=4, enabled=True)
+    with controller.request('fetch') as ticket:
+        with controller.stage('translate'):
+            assert ticket.priority.name == 'translate'
+            assert controller.classes['fetch'].active == 0 and controller.classes['translate'].active == 1
+            # Cheaper stages inside it do not move the request back
+            with controller.stage('fetch'):
+                assert ticket.priority.name == 'translate'
+    assert controller.active == 0 and controller.classes['translate'].active == 0
+
+    # Outside a request a stage is a plain bulkhead slot
+    with controller.stage('summary'):
+        assert controller.classes['summary'].active == 1 and controller.active == 0
+    print("✅ Translation escalates the request's class; bulk work takes bulkhead slots")
+
+
+def test_background_items_yield():
+    controller = AdmissionController({'fetch': (4, 0.5, 1.0, 2)}, max_concurrency=4, enabled=True)
+    deadline = admission.BACKGROUND_QUEUE_SECONDS
+    admission.BACKGROUND_QUEUE_SECONDS = 0.2
+    try:
+        with ExitStack() as stack:
+            # Background items may use half of fetch's share: 2 of the 4 slots
+            for _ in range(2):
+                stack.enter_context(controller.request('fetch', 'batch', background=True))
+            try:
+                with controller.request('fetch', 'batch', background=True):
+                    raise AssertionError('background share not enforced')
+            except Overloaded:
+                pass
+            with controller.request('fetch') as ticket:
+                assert ticket.queued_seconds < 0.05 and not ticket.background
+    finally:
+        admission.BACKGROUND_QUEUE_SECONDS = deadline
+
+    controller = AdmissionController(CLASSES, max_concurrency=1, enabled=True)
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    holder = hold(controller, 'cached', started, release)
+    started.acquire()
+    order = []
+
+    def request(name, background):
+        with controller.request(name, background=background):
+            order.append(('background ' if background else '') + name)
+
+    # A queued background item waits behind an interactive request of a more expensive class
+    waiting = [threading.Thread(target=request, args=args) for args in (('cached', True), ('fetch', False))]
+    for thread in waiting:
+        thread.start()
+        time.sleep(0.05)
+    release.set()
+    for thread in [holder] + waiting:
+        thread.join()
+    assert order == ['fetch', 'background cached'], order
+    print("✅ Batch and job items queue behind interactive requests and use part of the share")
+
+
+if __name__ == "__main__":
+    test_classes_are_limited_and_shed()
+    test_higher_class_is_served_first()
+    test_stage_escalates_request()
+    test_background_items_yield()
+    print("\nAdmission tests completed!")
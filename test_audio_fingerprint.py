@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Offline test script for audio fingerprint dedup
+Synthetic "episodes" made of random tone sequences stand in for real audio
+"""
+
+import random
+import shutil
+import tempfile
+
+import numpy as np
+
+from audio_fingerprint import Fingerprinter, FingerprintIndex, ProbeMatched, StreamProbe, fingerprint
+
+SAMPLE_RATE = 16000
+
+
+def make_episode(seed, seconds):
+    """Random chords that change every 250 ms, like a busy soundtrack"""
+    rng = random.Random(seed)
+    step = SAMPLE_RATE // 4
+    t = np.arange(step) / SAMPLE_RATE
+    parts = []
+    for _ in range(int(seconds * 4)):
+        chord = sum(np.sin(2 * np.pi * rng.uniform(100, 3500) * t) for _ in range(3))
+        parts.append(chord * 3000)
+    return np.concatenate(parts)
+
+
+def to_pcm(samples):
+    return np.clip(samples, -32768, 32767).astype('<i2').tobytes()
+
+
+def test_reupload_matches_and_other_episode_does_not():
+    root = tempfile.mkdtemp()
+    try:
+        index = FingerprintIndex(root)
+        intro = make_episode('intro', 40)
+        original = np.concatenate([intro, make_episode(527, 260)])
+        index.add('original', fingerprint(to_pcm(original), SAMPLE_RATE), 'transcript of episode 527')
+
+        # Mirror: 7 s trimmed off the start, quieter, with background noise
+        noise = np.random.default_rng(1).normal(0, 400, len(original) - 7 * SAMPLE_RATE)
+        mirror = original[7 * SAMPLE_RATE:] * 0.6 + noise
+        match = index.match(fingerprint(to_pcm(mirror[:180 * SAMPLE_RATE]), SAMPLE_RATE))
+        assert match and match['video_id'] == 'original', match
+        assert abs(match['offset_seconds'] - 7) < 0.2, match
+
+        # Different episode with the same title sequence
+        other = np.concatenate([intro, make_episode(528, 260)])
+        assert index.match(fingerprint(to_pcm(other[:180 * SAMPLE_RATE]), SAMPLE_RATE)) is None
+        print(f"✅ Mirror matched (score {match['score']}, ratio {match['ratio']}); "
+              f"episode with shared intro did not")
+    finally:
+        shutil.rmtree(root)
+
+
+def test_streamed_fingerprint_matches_whole_buffer():
+    pcm = to_pcm(make_episode(1, 60))
+    streamed = Fingerprinter(SAMPLE_RATE)
+    for i in range(0, len(pcm), 16001):
+        streamed.feed(pcm[i:i + 16001])
+    whole = set(fingerprint(pcm, SAMPLE_RATE))
+    overlap = len(whole & set(streamed.flush())) / len(whole)
+    assert overlap > 0.95, overlap
+    print(f"✅ Streaming fingerprint shares {overlap:.0%} of hashes with the one-shot fingerprint")
+
+
+def test_stream_probe_passes_audio_through():
+    pcm = to_pcm(make_episode(2, 30))
+    chunks = [pcm[i:i + 16000] for i in range(0, len(pcm), 16000)]
+    probe = StreamProbe(chunks, SAMPLE_RATE, FingerprintIndex(tempfile.mkdtemp()), probe_seconds=10, first_check=2)
+    assert b''.join(probe) == pcm
+    assert probe.fingerprinter.seconds == 30 and probe.checks == 4   # at 2, 4, 8 and 10 s
+    print("✅ Unknown audio flows straight through to the transcriber while it is fingerprinted")
+
+
+def test_stream_probe_stops_on_match():
+    root = tempfile.mkdtemp()
+    try:
+        index = FingerprintIndex(root)
+        original = make_episode(527, 120)
+        index.add('original', fingerprint(to_pcm(original), SAMPLE_RATE), 'transcript of episode 527')
+        pcm = to_pcm(original[3 * SAMPLE_RATE:])
+        chunks = [pcm[i:i + 16000] for i in range(0, len(pcm), 16000)]
+        passed = []
+        try:
+            for chunk in StreamProbe(chunks, SAMPLE_RATE, index, first_check=15):
+                passed.append(chunk)
+            raise AssertionError('mirror not matched')
+        except ProbeMatched as e:
+            assert e.match['video_id'] == 'original'
+        # Recognition only saw the first check's worth of audio, not the whole probe window
+        assert sum(map(len, passed)) < 15 * 2 * SAMPLE_RATE, len(passed)
+
+        # A match the caller cannot use (e.g. no stored transcript) does not stop the stream
+        probe = StreamProbe(chunks, SAMPLE_RATE, index, first_check=15, accept=lambda match: False)
+        assert b''.join(probe) == pcm
+    finally:
+        shutil.rmtree(root)
+    print("✅ A known video is recognized within the first check and stops recognition")
+
+
+if __name__ == "__main__":
+    test_reupload_matches_and_other_episode_does_not()
+    test_streamed_fingerprint_matches_whole_buffer()
+    test_stream_probe_passes_audio_through()
+    test_stream_probe_stops_on_match()
+    print("\nAudio fingerprint tests completed!")
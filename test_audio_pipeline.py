@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the chunked audio transcription pipeline
+Uses synthetic audio and a stub recognizer backend (no internet needed)
+"""
+
+import array
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import wave
+
+from audio_pipeline import (PCMAudio, plan_segments, frame_energies, transcribe_wav, transcribe_stream,
+                            transcribe_audio, speech_regions, register_backend, get_recognizer,
+                            merge_overlap, FRAME_SECONDS)
+
+SAMPLE_RATE = 4000
+
+
+def speech_sample(t, noise):
+    """Speech-like sound: 150 ms voiced (tone) and 100 ms unvoiced (hiss) syllables"""
+    if t % 0.25 < 0.15:
+        return int(8000 * math.sin(2 * math.pi * 220 * t))
+    return int(noise.uniform(-3000, 3000))
+
+
+def make_audio(seconds, speech=8.0, pause=1.5):
+    """Speech bursts of `speech` seconds separated by `pause` seconds of silence"""
+    noise = random.Random(0)
+    samples = array.array('h')
+    for i in range(int(seconds * SAMPLE_RATE)):
+        t = i / SAMPLE_RATE
+        in_speech = (t % (speech + pause)) < speech
+        samples.append(speech_sample(t, noise) if in_speech else 0)
+    return PCMAudio(samples.tobytes(), SAMPLE_RATE)
+
+
+def write_wav(audio, path):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(audio.sample_rate)
+        wav.writeframes(audio.data)
+
+
+class StubRecognizer:
+    """Reports which seconds it heard, so order and coverage can be checked"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def recognize(self, pcm, sample_rate, sample_width=2):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return f"call{call} heard {len(pcm) / (sample_width * sample_rate):.1f} seconds"
+
+
+def test_segments_cover_audio_and_cut_in_silence():
+    audio = make_audio(400)
+    segments = plan_segments(audio)
+    energies = frame_energies(audio)
+    assert segments[0][0] == 0.0 and abs(segments[-1][1] - audio.duration) < 0.01
+    for (start, end), (next_start, _) in zip(segments, segments[1:]):
+        assert next_start < end  # overlapping
+        assert end - start <= 45.5
+        assert energies[int(round(next_start / FRAME_SECONDS))] == 0  # cut on silence
+    print(f"✅ {len(segments)} segments cover all {audio.duration:.0f}s (no 300s cap)")
+
+
+def test_parallel_transcription_in_order():
+    register_backend('stub', StubRecognizer)
+    recognizer = get_recognizer('stub')
+    audio = make_audio(400)
+    path = os.path.join(tempfile.mkdtemp(), 'audio.wav')
+    write_wav(audio, path)
+
+    streamed = []
+    text, segments = transcribe_wav(path, recognizer, max_workers=4, on_segment=streamed.append)
+    os.remove(path)
+
+    assert [s['index'] for s in streamed] == list(range(len(segments)))
+    assert all(s['start'] < t['start'] for s, t in zip(segments, segments[1:]))
+    assert text.count('heard') == len(segments)
+    assert recognizer.max_active > 1
+    print(f"✅ {len(segments)} segments transcribed with {recognizer.max_active} in parallel, streamed in order")
+
+
+def test_streamed_chunks_match_whole_file():
+    register_backend('stub', StubRecognizer)
+    audio = make_audio(400)
+    frame = int(SAMPLE_RATE * 0.5) * 2
+    produced = []
+
+    def chunks():
+        # Odd-sized reads like a pipe would give
+        for i in range(0, len(audio.data), frame + 1):
+            produced.append(i)
+            yield audio.data[i:i + frame + 1]
+
+    first_segment_at = []
+    on_segment = lambda segment: first_segment_at.append(len(produced))
+    text, segments = transcribe_stream(chunks(), SAMPLE_RATE, get_recognizer('stub'), on_segment=on_segment)
+    assert [(s['start'], s['end']) for s in segments] == [(round(a, 2), round(b, 2)) for a, b in plan_segments(audio)]
+    assert first_segment_at[0] < len(produced)  # recognition started before the stream ended
+    print(f"✅ Streamed {len(produced)} chunks into {len(segments)} segments, first result after chunk {first_segment_at[0]}")
+
+
+def test_vad_drops_music_and_silence():
+    noise = random.Random(1)
+    samples = array.array('h')
+    # 20s music bed (steady chord), 40s speech, 30s silence, 20s speech
+    for i in range(110 * SAMPLE_RATE):
+        t = i / SAMPLE_RATE
+        if t < 20:
+            samples.append(int(4000 * (math.sin(2 * math.pi * 262 * t) + math.sin(2 * math.pi * 330 * t))))
+        elif t < 60 or t >= 90:
+            samples.append(speech_sample(t, noise))
+        else:
+            samples.append(int(noise.uniform(-50, 50)))
+    audio = PCMAudio(samples.tobytes(), SAMPLE_RATE)
+
+    regions = speech_regions(audio)
+    assert len(regions) == 2, regions
+    assert abs(regions[0][0] - 20) < 1.5 and abs(regions[0][1] - 60) < 1.5
+    assert abs(regions[1][0] - 90) < 1.5 and abs(regions[1][1] - 110) < 0.1
+
+    recognizer = StubRecognizer(delay=0)
+    text, segments = transcribe_audio(audio, recognizer)
+    kept = sum(segment['speech_seconds'] for segment in segments)
+    heard = sum(float(part.split()[0]) for part in text.split('heard ')[1:])
+    assert kept < 0.6 * audio.duration
+    assert heard < 0.65 * audio.duration
+    assert all(start >= segment['start'] - 0.01 and end <= segment['end'] + 0.01
+               for segment in segments for start, end in segment['speech'])
+    print(f"✅ VAD kept {kept:.0f}s of {audio.duration:.0f}s; recognizer heard {heard:.0f}s")
+
+
+def test_merge_overlap():
+    assert merge_overlap("and then we went home", "went home after dinner") == "after dinner"
+    assert merge_overlap("hello there", "general kenobi") == "general kenobi"
+    print("✅ Overlapping words removed when stitching")
+
+
+if __name__ == "__main__":
+    test_segments_cover_audio_and_cut_in_silence()
+    test_parallel_transcription_in_order()
+    test_streamed_chunks_match_whole_file()
+    test_vad_drops_music_and_silence()
+    test_merge_overlap()
+    print("\nAudio pipeline tests completed!")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the yt-dlp | ffmpeg streaming source
+The two commands are replaced by small Python processes
+"""
+
+import sys
+
+import audio_stream
+from audio_stream import StreamFailed, stream_audio_frames
+
+# Passes stdin through, like ffmpeg decoding already-raw PCM
+CAT = [sys.executable, '-c', 'import os\nwhile True:\n    data = os.read(0, 65536)\n'
+       '    if not data: break\n    os.write(1, data)']
+REAL_COMMANDS = audio_stream.downloader_command, audio_stream.decoder_command
+
+
+def teardown_module(module=None):
+    audio_stream.downloader_command, audio_stream.decoder_command = REAL_COMMANDS
+
+
+def fake_pipeline(downloader_script, decoder=CAT):
+    audio_stream.downloader_command = lambda video_id: [sys.executable, '-c', downloader_script]
+    audio_stream.decoder_command = lambda sample_rate=None: decoder
+
+
+def read_stream(**kwargs):
+    frames = []
+    try:
+        for frame in stream_audio_frames('demo', sample_rate=1000, chunk_seconds=1, **kwargs):
+            frames.append(frame)
+    except StreamFailed as e:
+        return frames, e
+    return frames, None
+
+
+def test_complete_stream():
+    fake_pipeline('import sys; sys.stdout.buffer.write(bytes(5000))')
+    frames, error = read_stream(timeout=30)
+    assert error is None and [len(frame) for frame in frames] == [2000, 2000, 1000], error
+    print("✅ A clean exit yields every frame and no error")
+
+
+def test_failed_downloader():
+    fake_pipeline('import sys; sys.stdout.buffer.write(bytes(3000)); sys.exit(1)')
+    frames, error = read_stream(timeout=30)
+    assert frames and error is not None and 'yt-dlp exited with code 1' in str(error), error
+    print("✅ A downloader failing mid-stream raises StreamFailed after the partial frames")
+
+
+def test_watchdog_timeout():
+    fake_pipeline('import sys, time; sys.stdout.buffer.write(bytes(2000)); sys.stdout.flush(); time.sleep(30)')
+    frames, error = read_stream(timeout=0.5)
+    assert error is not None and 'timed out' in str(error), error
+    print("✅ A stalled stream killed by the watchdog raises StreamFailed")
+
+
+def test_consumer_close_is_not_a_failure():
+    fake_pipeline('import sys, time; sys.stdout.buffer.write(bytes(4000)); sys.stdout.flush(); time.sleep(30)')
+    source = stream_audio_frames('demo', sample_rate=1000, chunk_seconds=1, timeout=30)
+    assert len(next(source)) == 2000
+    source.close()          # what the probe does after a fingerprint match
+    print("✅ Stopping the stream early kills the pipeline without raising")
+
+
+if __name__ == "__main__":
+    try:
+        test_complete_stream()
+        test_failed_downloader()
+        test_watchdog_timeout()
+        test_consumer_close_is_not_a_failure()
+    finally:
+        teardown_module()
+    print("\nAudio stream tests completed!")
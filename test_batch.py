@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Offline test script for batch request parsing and the batch runner
+"""
+
+import time
+
+from batch import parse_batch_request, run_batch
+
+
+def test_parse_batch_request():
+    items = parse_batch_request({'video_ids': ['a', 'b'], 'summary': True, 'summary_words': 50})
+    assert items == [{'video_id': 'a', 'summary': True, 'summary_words': 50},
+                     {'video_id': 'b', 'summary': True, 'summary_words': 50}]
+    items = parse_batch_request({'items': ['a', {'video_id': 'b', 'summary': True}]})
+    assert items[0]['summary'] is False and items[1]['summary'] is True
+    for bad in ([], {}, {'video_ids': []}, {'items': [{'summary': True}]}, {'video_ids': ['x'] * 3}):
+        try:
+            parse_batch_request(bad, max_items=2)
+            raise AssertionError(f'accepted {bad}')
+        except ValueError:
+            pass
+    print("✅ Batch bodies are normalized and bad ones rejected")
+
+
+def test_results_and_errors():
+    def worker(item):
+        if item == 'bad':
+            raise RuntimeError('video unavailable')
+        time.sleep(0.05 if item == 'slow' else 0)
+        return {'success': True, 'video_id': item}
+
+    results = list(run_batch(['slow', 'bad', 'fast'], worker, max_workers=3))
+    assert [item for _, item, _, _ in results][-1] == 'slow'    # completion order
+    errors = {item: result for _, item, result, _ in results if not result['success']}
+    assert errors == {'bad': {'success': False, 'error': 'video unavailable'}}
+    print("✅ Results stream in completion order and one failure does not fail the batch")
+
+
+def test_consumer_stop_cancels_queued_items():
+    started = []
+
+    def worker(item):
+        started.append(item)
+        time.sleep(0 if item == 0 else 0.2)
+        return {'success': True}
+
+    batch = run_batch(list(range(20)), worker, max_workers=2)
+    next(batch)
+    batch.close()        # what the server does when the client disconnects
+    # Only the items already running finish; the queued ones are dropped
+    assert len(started) <= 3, started
+    print(f"✅ Closing the stream early cancels queued work ({len(started)} of 20 items started)")
+
+
+if __name__ == "__main__":
+    test_parse_batch_request()
+    test_results_and_errors()
+    test_consumer_stop_cancels_queued_items()
+    print("\nBatch tests completed!")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Offline test script for circuit breakers and readiness
+"""
+
+import time
+
+from health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, HealthMonitor, health
+
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failures=3, reset_seconds=0.05)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()   # one trial call at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+    print("✅ Breaker opens after 3 failures, half-opens for one trial, closes on success")
+
+
+def test_readiness():
+    def ok():
+        pass
+
+    def down():
+        raise ConnectionError('unreachable')
+
+    monitor = HealthMonitor(interval=0)
+    monitor.add('youtube', ok, critical=True)
+    monitor.add('gemini', down)
+    monitor.add('huggingface', lambda: False)
+    ready, details = monitor.ready()
+    assert not ready and details['reasons'] == ['starting']
+
+    monitor.accepting = True
+    for dependency in monitor.dependencies.values():
+        dependency.check()
+    ready, details = monitor.ready()
+    assert ready and details['degraded'] == ['gemini'], details
+    assert details['dependencies']['huggingface']['status'] == 'disabled'
+
+    # Traffic failures open the critical dependency's breaker and take the server out of rotation
+    for _ in range(monitor.dependencies['youtube'].breaker.failures):
+        monitor.record('youtube', ok=False)
+    ready, details = monitor.ready()
+    assert not ready and details['reasons'] == ['youtube unavailable']
+    assert not monitor.allow('youtube')
+    assert monitor.live()[0]
+    print("✅ Readiness fails on a critical dependency, non-critical ones only degrade")
+
+
+def test_throttling_degrades_without_opening_the_breaker():
+    class TooManyRequests(Exception):
+        pass
+
+    def throttled():
+        raise TooManyRequests('429 Client Error: Too Many Requests')
+
+    monitor = HealthMonitor(interval=0)
+    monitor.add('youtube', throttled, critical=True)
+    monitor.accepting = True
+    for _ in range(monitor.dependencies['youtube'].breaker.failures):
+        monitor.dependencies['youtube'].check()
+        monitor.record_throttled('youtube')
+    ready, details = monitor.ready()
+    assert ready and details['degraded'] == ['youtube'], details
+    assert details['dependencies']['youtube']['status'] == 'throttled'
+    assert details['dependencies']['youtube']['breaker']['state'] == CLOSED
+    assert monitor.allow('youtube')
+    print("✅ 429s mark YouTube throttled (degraded) but keep the server in rotation")
+
+
+def test_youtube_probe_outcomes():
+    from proxy_pool import proxy_pool
+    from rate_limit import RateLimitTimeout
+
+    class FakeApi:
+        error = None
+
+        def list(self, video_id):
+            if self.error:
+                raise self.error
+
+    api = FakeApi()
+    youtube = health.dependencies['youtube']
+    real_api_for, real_accepting = proxy_pool.api_for, health.accepting
+    proxy_pool.api_for = lambda video_id: (api, None)
+    health.accepting = True
+    try:
+        youtube.breaker.record_success()
+        # Our own limiter queue being full is not YouTube being down
+        api.error = RateLimitTimeout('Upstream rate limit queue is full')
+        youtube.check()
+        assert youtube.status == 'skipped' and health.ready()[0]
+        assert youtube.breaker.consecutive_failures == 0
+
+        # A transport failure is counted once, by proxy_pool.call
+        api.error = ConnectionError('connection reset')
+        youtube.check()
+        assert youtube.status == 'failing' and youtube.breaker.consecutive_failures == 1
+
+        # "No transcript" means YouTube answered
+        api.error = LookupError('No transcripts were found')
+        youtube.check()
+        assert youtube.status == 'ok' and youtube.breaker.consecutive_failures == 0
+    finally:
+        proxy_pool.api_for, health.accepting = real_api_for, real_accepting
+        youtube.breaker.record_success()
+    print("✅ The YouTube probe skips on a busy queue and feeds the breaker once")
+
+
+if __name__ == "__main__":
+    test_breaker_opens_and_recovers()
+    test_readiness()
+    test_throttling_degrades_without_opening_the_breaker()
+    test_youtube_probe_outcomes()
+    print("\nHealth tests completed!")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Offline test script for memory budgets and cache footprint caps
+"""
+
+import threading
+
+import metrics
+from fast_json import ResponseCache
+from memory import MB, MemoryBudget, MemoryBudgetExceeded, charge
+
+
+def transcript(words):
+    return {'success': True, 'transcript': 'word ' * words}
+
+
+def test_cache_stays_under_max_bytes():
+    cache = ResponseCache(max_entries=100, max_bytes=1 * MB)
+    for i in range(20):
+        cache.put(i, transcript(20000))   # ~100 KB of text each
+    assert cache.nbytes <= 1 * MB, cache.nbytes
+    assert 0 < len(cache) < 20
+    assert cache.get(19) is not None and cache.get(0) is None
+
+    # Too big to keep at all: served once, nothing else evicted
+    before = len(cache)
+    entry = cache.put('huge', transcript(500000))
+    assert entry.data['success'] and cache.get('huge') is None and len(cache) == before
+    print(f"✅ Cache holds {len(cache)} entries in {cache.nbytes / MB:.2f} MB (cap 1 MB)")
+
+
+def test_request_and_global_limits():
+    budget = MemoryBudget(limit=9 * MB, request_limit=4 * MB)
+    with budget.request() as reservation:
+        charge(1 * MB, 'transcript')       # 3x copy factor
+        assert reservation.bytes == 3 * MB
+        try:
+            charge(1 * MB, 'summary')
+            raise AssertionError('per-request limit not enforced')
+        except MemoryBudgetExceeded as e:
+            assert e.status == 413
+    assert budget.reserved == 0
+
+    # Two concurrent requests hold 6 MB; a third one pushing past 9 MB is shed
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with budget.request():
+            charge(1 * MB, 'transcript')
+            holding.set()
+            release.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        holding.wait()
+        holding.clear()
+    try:
+        with budget.request():
+            charge(1 * MB, 'download')
+        raise AssertionError('global budget not enforced')
+    except MemoryBudgetExceeded as e:
+        assert e.status == 503
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    # Both the 413 and the 503 count as rejections
+    assert budget.reserved == 0 and budget.rejected == 2
+    text = metrics.render().decode('utf-8')
+    assert '# TYPE memory_rejected_requests_total counter' in text
+    assert 'memory_rejected_requests_total{status="413"}' in text
+    assert 'memory_rejected_requests_total{status="503"}' in text
+    print("✅ Oversized request gets 413, budget overflow gets 503, reservations are released")
+
+
+def test_charge_outside_request_is_free():
+    charge('x' * 1000, 'summary')
+    print("✅ Work outside a request (jobs, CLIs) is not charged")
+
+
+if __name__ == "__main__":
+    test_cache_stays_under_max_bytes()
+    test_request_and_global_limits()
+    test_charge_outside_request_is_free()
+    print("\nMemory tests completed!")
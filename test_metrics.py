@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the Prometheus text rendering of metrics
+"""
+
+import metrics
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_and_gauge_rendering():
+    registry = Registry()
+    requests = Counter('demo_requests_total', 'Requests handled', ('endpoint', 'status'), registry=registry)
+    requests.inc(endpoint='transcript', status='200')
+    requests.inc(2, endpoint='transcript', status='200')
+    requests.inc(endpoint='say "hi"\\now', status='500')
+    queue = Gauge('demo_queue', 'Jobs waiting', registry=registry)
+    queue.set_function(lambda: 3)
+    broken = Gauge('demo_broken', 'Source raises', registry=registry)
+    broken.set_function(lambda: 1 / 0)
+    per_kind = Gauge('demo_in_flight', 'Work per kind', ('kind',), registry=registry)
+    per_kind.set_function(lambda: {('audio',): 1, ('jobs',): 0.5})
+
+    assert registry.render() == '\n'.join([
+        '# HELP demo_requests_total Requests handled',
+        '# TYPE demo_requests_total counter',
+        'demo_requests_total{endpoint="say \\"hi\\"\\\\now",status="500"} 1',
+        'demo_requests_total{endpoint="transcript",status="200"} 3',
+        '# HELP demo_queue Jobs waiting',
+        '# TYPE demo_queue gauge',
+        'demo_queue 3',
+        '# HELP demo_broken Source raises',
+        '# TYPE demo_broken gauge',
+        '# HELP demo_in_flight Work per kind',
+        '# TYPE demo_in_flight gauge',
+        'demo_in_flight{kind="audio"} 1',
+        'demo_in_flight{kind="jobs"} 0.5',
+    ]) + '\n', registry.render()
+    print("✅ Counters and gauges render with escaped labels; a failing gauge source is skipped")
+
+
+def test_histogram_rendering():
+    registry = Registry()
+    latency = Histogram('demo_seconds', 'Latency', ('stage',), buckets=(0.1, 1), registry=registry)
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, stage='fetch')
+    lines = registry.render().splitlines()
+    assert lines[1] == '# TYPE demo_seconds histogram'
+    assert lines[2:] == [
+        'demo_seconds_bucket{stage="fetch",le="0.1"} 2',     # buckets are cumulative and include the bound
+        'demo_seconds_bucket{stage="fetch",le="1.0"} 3',
+        'demo_seconds_bucket{stage="fetch",le="+Inf"} 4',
+        'demo_seconds_sum{stage="fetch"} 3.65',
+        'demo_seconds_count{stage="fetch"} 4',
+    ], lines
+    print("✅ Histograms render cumulative buckets, +Inf, sum and count")
+
+
+def test_shared_registry():
+    metrics.record_cache('demo', True)
+    metrics.record_cache('demo', False)
+    metrics.register_in_flight('demo_tasks', lambda: 2)
+    text = metrics.render().decode('utf-8')
+    assert 'cache_lookups_total{cache="demo",result="hit"} 1' in text
+    assert 'cache_hit_ratio{cache="demo"} 0.5' in text
+    assert 'pipeline_in_flight{kind="demo_tasks"} 2' in text
+    assert text.count('# TYPE http_requests_total counter') == 1
+    print("✅ The shared registry exports cache ratios and in-flight counts")
+
+
+if __name__ == "__main__":
+    test_counter_and_gauge_rendering()
+    test_histogram_rendering()
+    test_shared_registry()
+    print("\nMetrics tests completed!")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the runtime sampling profiler and per-request cProfile
+"""
+
+import http.server
+import os
+import shutil
+import signal
+import socketserver
+import tempfile
+import threading
+import time
+import urllib.request
+
+import profiler
+from profiler import ProfilingMixin, SamplingProfiler, install_signal_handler
+
+
+REAL_PROFILE_DIR = profiler.PROFILE_DIR
+
+
+def setup_module(module=None):
+    # Profiles go to a scratch directory, not the repo's profiles/
+    profiler.PROFILE_DIR = tempfile.mkdtemp()
+
+
+def teardown_module(module=None):
+    shutil.rmtree(profiler.PROFILE_DIR, ignore_errors=True)
+    profiler.PROFILE_DIR = REAL_PROFILE_DIR
+
+
+def busy_transcript_work(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def test_start_stop_writes_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_transcript_work, args=(stop,), name='worker')
+    worker.start()
+    sampler = SamplingProfiler(interval=0.002)
+    try:
+        assert sampler.start(seconds=30)
+        assert not sampler.start()                 # one profile at a time
+        time.sleep(0.3)
+        assert sampler.status()['running']
+        result = sampler.stop()
+    finally:
+        stop.set()
+        worker.join()
+    assert not sampler.running and result['samples'] > 10, result
+    with open(result['file'], encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    # Every thread is sampled; the idle main thread's single stack can outnumber any one worker stack
+    worker_lines = [line for line in lines if line.startswith('worker;')]
+    assert worker_lines, lines
+    stack, count = worker_lines[0].rsplit(' ', 1)
+    assert 'busy_transcript_work (test_profiler.py' in stack, stack
+    assert int(count) > 0
+    print(f"✅ Start/stop writes a collapsed-stack profile ({result['samples']} samples)")
+
+
+def test_signal_toggles_profiler():
+    if not hasattr(signal, 'SIGUSR2'):
+        print("⏭️ SIGUSR2 not available here, skipping")
+        return
+    sampler = SamplingProfiler(interval=0.01)
+    previous = signal.getsignal(signal.SIGUSR2)
+    try:
+        assert install_signal_handler(sampler)
+        os.kill(os.getpid(), signal.SIGUSR2)
+        time.sleep(0.1)
+        assert sampler.running
+        os.kill(os.getpid(), signal.SIGUSR2)
+        deadline = time.time() + 5
+        while sampler.running and time.time() < deadline:
+            time.sleep(0.01)
+        assert not sampler.running and sampler.last_result['samples'] > 0
+    finally:
+        signal.signal(signal.SIGUSR2, previous)
+    print("✅ SIGUSR2 starts the profiler and a second one stops it")
+
+
+class ProfiledHandler(ProfilingMixin, http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_request_profile_header():
+    server = socketserver.TCPServer(('127.0.0.1', 0), ProfiledHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/'
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers.get('X-Profile-File') is None
+        request = urllib.request.Request(url, headers={'X-Profile': '1'})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            path = response.headers['X-Profile-File']
+        deadline = time.time() + 5
+        while not os.path.exists(path) and time.time() < deadline:
+            time.sleep(0.01)
+        assert path.endswith('.prof') and os.path.getsize(path) > 0
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("✅ X-Profile: 1 from a local client returns a cProfile dump of that request")
+
+
+if __name__ == "__main__":
+    setup_module()
+    try:
+        test_start_stop_writes_collapsed_stacks()
+        test_signal_toggles_profiler()
+        test_request_profile_header()
+    finally:
+        teardown_module()
+    print("\nProfiler tests completed!")
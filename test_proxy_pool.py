@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for the proxy pool using local stand-in proxies (no internet needed)
+"""
+
+import http.server
+import socketserver
+import threading
+import time
+import urllib.request
+
+from proxy_pool import ProxyPool
+
+
+class StandInProxy(http.server.BaseHTTPRequestHandler):
+    """Answers any proxied GET itself; `delay` and `broken` are set per server"""
+
+    def do_GET(self):
+        if self.server.broken:
+            self.send_response(502)
+            self.end_headers()
+            return
+        time.sleep(self.server.delay)
+        body = f"via {self.server.name}".encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_proxy(name, delay=0.0, broken=False):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), StandInProxy)
+    server.daemon_threads = True
+    server.name, server.delay, server.broken = name, delay, broken
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def fetch_via(proxy_url):
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({'http': proxy_url}))
+    with opener.open("http://stand-in.invalid/timedtext", timeout=5) as response:
+        return response.read().decode()
+
+
+def run_request(pool, video_id):
+    proxy = pool.choose(video_id)
+    return pool.call(proxy, fetch_via, proxy.url), proxy
+
+
+def test_sticky_assignment():
+    servers = [start_proxy(f"proxy{i}") for i in range(3)]
+    pool = ProxyPool([url for _, url in servers])
+    try:
+        for video_id in ["dQw4w9WgXcQ", "9bZkp7q19f0", "-Kaq9QOyPdM"]:
+            first = pool.choose(video_id)
+            assert all(pool.choose(video_id) is first for _ in range(20))
+        print("✅ Videos stay on the same proxy")
+    finally:
+        for server, _ in servers:
+            server.shutdown()
+
+
+def test_eject_and_readmit():
+    good, good_url = start_proxy("good")
+    bad, bad_url = start_proxy("bad", broken=True)
+    pool = ProxyPool([good_url, bad_url], eject_after=2, eject_seconds=30)
+    bad_proxy = [p for p in pool.proxies if p.url == bad_url][0]
+    try:
+        for _ in range(2):
+            try:
+                pool.call(bad_proxy, fetch_via, bad_url)
+            except Exception:
+                pass
+        assert not bad_proxy.is_available(time.time())
+        # Every video now lands on the healthy proxy
+        for i in range(4):
+            body, proxy = run_request(pool, f"video{i}")
+            assert proxy.url == good_url and body == "via good"
+        print("✅ Failing proxy ejected")
+
+        bad.broken = False
+        # Pretend the cooldown has elapsed
+        bad_proxy.ejected_until = time.time()
+        assert bad_proxy.is_available(time.time())
+        assert pool.call(bad_proxy, fetch_via, bad_url) == "via bad"
+        assert not bad_proxy.probation
+        print("✅ Recovered proxy re-admitted after cooldown")
+    finally:
+        good.shutdown()
+        bad.shutdown()
+
+
+def test_latency_scoring():
+    fast, fast_url = start_proxy("fast")
+    slow, slow_url = start_proxy("slow", delay=0.2)
+    pool = ProxyPool([fast_url, slow_url])
+    try:
+        for proxy in pool.proxies:
+            for _ in range(3):
+                pool.call(proxy, fetch_via, proxy.url)
+        picks = [pool.choose(f"video{i}").url for i in range(200)]
+        assert picks.count(fast_url) > picks.count(slow_url)
+        print(f"✅ Faster proxy preferred ({picks.count(fast_url)}/200 videos)")
+    finally:
+        fast.shutdown()
+        slow.shutdown()
+
+
+if __name__ == "__main__":
+    test_sticky_assignment()
+    test_eject_and_readmit()
+    test_latency_scoring()
+    print("\nProxy pool tests completed!")
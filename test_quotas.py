@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Offline test script for per-client quotas and fair scheduling
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from admission import AdmissionController
+from jobs import FairQueue, QueueFull, TaskQueue
+from quotas import INSTALLS_PER_ADDRESS, QuotaExceeded, QuotaManager, UnknownApiKey, identify_client, load_api_keys
+
+
+def test_client_identification():
+    keys = load_api_keys('secret, other')
+    assert identify_client({'X-API-Key': 'secret'}, ('10.0.0.1', 1), keys).startswith('key:')
+    assert 'secret' not in identify_client({'X-API-Key': 'secret'}, ('10.0.0.1', 1), keys)
+    # A made-up key does not get its own allowance
+    try:
+        identify_client({'X-API-Key': 'random-123'}, ('10.0.0.1', 1), keys)
+        raise AssertionError('unknown key accepted')
+    except UnknownApiKey as e:
+        assert e.status == 401 and e.retry_after is None
+    install = identify_client({'X-Install-ID': '0b6f7d9e-5c1a-4c1e-9a57-3f4e2d1c0b9a'}, ('10.0.0.1', 1))
+    assert install.startswith('install:') and install.endswith('@10.0.0.1') and '0b6f7d9e' not in install
+    # Malformed install ids fall back to the address
+    assert identify_client({'X-Install-ID': 'x'}, ('10.0.0.1', 1)) == 'ip:10.0.0.1'
+    print("✅ Clients are identified by a configured API key, hashed install id or address")
+
+
+def test_rotating_install_ids_share_an_address_allowance():
+    manager = QuotaManager({'llm_calls': 2}, state_file=None)
+    clients = [identify_client({'X-Install-ID': f'install-{i:04d}'}, ('10.0.0.9', 1)) for i in range(20)]
+    charged = 0
+    for client in clients:
+        try:
+            manager.consume('llm_calls', client=client)
+            charged += 1
+        except QuotaExceeded:
+            pass
+    assert charged == 2 * INSTALLS_PER_ADDRESS, charged
+    # The install that was refused was not charged either
+    assert manager.usage(clients[-1])['llm_calls']['remaining'] == 0
+    assert manager._bucket(clients[-1], 'llm_calls').remaining() >= 1.9
+    # Other machines are unaffected
+    manager.consume('llm_calls', client=identify_client({'X-Install-ID': 'install-0000'}, ('10.0.0.7', 1)))
+    print(f"✅ Rotating install ids from one address share {INSTALLS_PER_ADDRESS:g} allowances")
+
+
+def test_quota_per_client():
+    manager = QuotaManager({'llm_calls': 3, 'audio_minutes': 10}, state_file=None)
+    for _ in range(3):
+        manager.consume('llm_calls', client='heavy')
+    try:
+        manager.consume('llm_calls', client='heavy')
+        raise AssertionError('quota not enforced')
+    except QuotaExceeded as e:
+        assert e.status == 429 and 1 <= e.retry_after <= 3600
+    manager.consume('llm_calls', client='light')     # other clients are unaffected
+    manager.consume('llm_calls')                     # no client: CLIs are not metered
+
+    # Audio is charged after the fact and may go negative; further jobs are refused
+    manager.check('audio_minutes', client='heavy')
+    manager.debit('audio_minutes', 25, client='heavy')
+    try:
+        manager.check('audio_minutes', client='heavy')
+        raise AssertionError('negative balance not enforced')
+    except QuotaExceeded:
+        pass
+    assert manager.usage('light')['llm_calls']['remaining'] < 3
+    print("✅ One client running out of quota gets 429 without affecting others")
+
+
+def test_quota_persistence():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'quotas.json')
+        manager = QuotaManager({'llm_calls': 10}, state_file=path)
+        with manager.client('heavy'):
+            for _ in range(8):
+                manager.consume('llm_calls')
+        manager.save()
+        restored = QuotaManager({'llm_calls': 10}, state_file=path)
+        assert restored.load() == 1
+        assert restored.usage('heavy')['llm_calls']['remaining'] < 2.1
+    print("✅ Quota balances survive a restart")
+
+
+def test_fair_task_queue():
+    queue = FairQueue()
+    for i in range(3):
+        queue.put('heavy', f'heavy-{i}')
+    queue.put('light', 'light-0')
+    assert [queue.get() for _ in range(4)] == ['heavy-0', 'light-0', 'heavy-1', 'heavy-2']
+
+    started = []
+    gate = threading.Event()
+
+    def worker(task, name):
+        started.append(name)
+        gate.wait()
+        return name
+
+    tasks = TaskQueue(worker, max_workers=1, max_pending=10, max_pending_per_client=4)
+    submitted = [tasks.submit(f'heavy-{i}', f'heavy-{i}', client='heavy') for i in range(4)]
+    try:
+        tasks.submit('heavy-4', 'heavy-4', client='heavy')
+        raise AssertionError('per-client pending limit not enforced')
+    except QueueFull:
+        pass
+    submitted.append(tasks.submit('light-0', 'light-0', client='light'))
+    gate.set()
+    for task in submitted:
+        task.wait(5)
+    # heavy-0 is already running; FIFO would start light-0 last
+    assert started == ['heavy-0', 'heavy-1', 'light-0', 'heavy-2', 'heavy-3'], started
+    print("✅ Background tasks are started round-robin across clients")
+
+
+def test_fair_admission():
+    controller = AdmissionController({'fetch': (1, 2.0, 1.0, 2)}, max_concurrency=4, enabled=True)
+    order = []
+    release = threading.Event()
+    holding = threading.Event()
+
+    def request(client, hold=False):
+        with controller.request('fetch', client):
+            order.append(client)
+            if hold:
+                holding.set()
+                release.wait()
+
+    first = threading.Thread(target=request, args=('heavy', True))
+    first.start()
+    holding.wait()
+    # heavy already has a request running, so light's later request is admitted first
+    waiting = [threading.Thread(target=request, args=(client,)) for client in ('heavy', 'light')]
+    for thread in waiting:
+        thread.start()
+        while controller.classes['fetch'].waiting < waiting.index(thread) + 1:
+            time.sleep(0.01)
+    release.set()
+    for thread in [first] + waiting:
+        thread.join()
+    assert order == ['heavy', 'light', 'heavy'], order
+    print("✅ Within a class, the client with fewer requests in flight goes first")
+
+
+if __name__ == "__main__":
+    test_client_identification()
+    test_rotating_install_ids_share_an_address_allowance()
+    test_quota_per_client()
+    test_quota_persistence()
+    test_fair_task_queue()
+    test_fair_admission()
+    print("\nQuota tests completed!")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the token buckets, AIMD rate adjustment and throttle backoff
+"""
+
+import time
+
+from rate_limit import AdaptiveRateLimiter, RateLimitTimeout, TokenBucket, call_with_backoff
+
+
+class TooManyRequests(Exception):
+    pass
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert bucket.acquire() and bucket.acquire()
+    assert bucket.try_acquire() > 0            # burst used up
+    assert not bucket.acquire(timeout=0.01)    # next token is 50 ms away
+    assert bucket.acquire(timeout=0.2)
+    print("✅ Token bucket allows its burst, then refills at its rate")
+
+
+def test_aimd():
+    limiter = AdaptiveRateLimiter(rate=4, capacity=4, min_rate=0.5, increase=0.5, decrease=0.5, cooldown=0.05)
+    limiter.on_throttle()
+    assert limiter.rate == 2 and limiter.tokens <= 0
+    limiter.on_throttle()                      # same burst of 429s: cut once per cooldown
+    assert limiter.rate == 2 and limiter.throttle_count == 2
+    limiter.on_success()                       # still cooling down
+    assert limiter.rate == 2
+
+    time.sleep(0.06)
+    limiter.on_success()
+    assert limiter.rate == 2.5                 # additive increase...
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == 4                   # ...up to the configured rate
+
+    for _ in range(10):
+        time.sleep(0.06)
+        limiter.on_throttle()
+    assert limiter.rate == 0.5                 # multiplicative decrease down to min_rate
+    print("✅ AIMD halves the rate once per cooldown and climbs back additively")
+
+
+def test_call_with_backoff():
+    limiter = AdaptiveRateLimiter(rate=100, capacity=100, increase=1, cooldown=0)
+    calls = []
+
+    def flaky(video_id, timeout=None):
+        calls.append(timeout)
+        if len(calls) < 3:
+            raise TooManyRequests('429 Client Error: Too Many Requests')
+        return video_id
+
+    # fn's own `timeout` keyword is passed through, not taken as the queue deadline
+    assert call_with_backoff(flaky, 'abc', limiter=limiter, base_delay=0.01, queue_timeout=5, timeout=7) == 'abc'
+    assert calls == [7, 7, 7]
+    assert limiter.throttle_count == 2
+
+    # A non-throttle error is raised at once and does not count as a success
+    rate = limiter.rate
+
+    def missing(video_id):
+        calls.append(video_id)
+        raise LookupError('No transcripts were found')
+
+    calls.clear()
+    try:
+        call_with_backoff(missing, 'abc', limiter=limiter, base_delay=0.01)
+        raise AssertionError('error swallowed')
+    except LookupError:
+        pass
+    assert calls == ['abc'] and limiter.rate == rate
+
+    # An empty bucket with a short deadline gives up instead of queueing
+    empty = TokenBucket(rate=0.1, capacity=1)
+    empty.acquire()
+    try:
+        call_with_backoff(lambda: None, limiter=empty, queue_timeout=0.05)
+        raise AssertionError('queue deadline not enforced')
+    except RateLimitTimeout:
+        pass
+    print("✅ Throttles are retried with backoff; other errors and deadlines fail fast")
+
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_aimd()
+    test_call_with_backoff()
+    print("\nRate limit tests completed!")
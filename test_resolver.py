@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the transcript resolver's strategy chain (stub backends, no internet needed)
+"""
+
+import stub_backends
+from stub_backends import StubTranscript, StubTranscriptList
+from transcript_resolver import TranscriptResolver, ResolutionError
+
+youtube = stub_backends.install(hours=0.1, summaries=False)
+
+
+class BrokenTranscript(StubTranscript):
+    """A listed track whose download fails (e.g. an empty or malformed timedtext response)"""
+
+    def fetch(self):
+        raise ValueError('no element found: line 1, column 0')
+
+
+def resolve(video_id, language='en'):
+    return TranscriptResolver().resolve(video_id, language, use_cache=False)
+
+
+def test_strategy_fall_through():
+    assert resolve('direct').method == 'Direct English'
+    assert resolve('youtube-translate').method == 'YouTube Translation'
+    resolution = resolve('google-translate')
+    assert resolution.method == 'Google Translate' and resolution.text.startswith('[en] '), resolution.method
+    try:
+        resolve('no-captions')
+        raise AssertionError('video without captions resolved')
+    except ResolutionError:
+        pass
+    print("✅ Direct, YouTube translation, Google Translate and failure are picked in order")
+
+
+def test_broken_direct_track_falls_through():
+    original_list = youtube.list
+
+    def list_with_broken_english(video_id):
+        if video_id != 'broken-direct':
+            return original_list(video_id)
+        return StubTranscriptList([BrokenTranscript(youtube, 'en', youtube.english),
+                                   StubTranscript(youtube, 'ja', youtube.fixtures['ja'])])
+
+    youtube.list = list_with_broken_english
+    try:
+        # The English track is listed but cannot be fetched: the chain must go on, not fail
+        resolution = resolve('broken-direct')
+    finally:
+        youtube.list = original_list
+    assert resolution.method == 'YouTube Translation', resolution.method
+    print("✅ A failing direct track falls through to the next strategy")
+
+
+if __name__ == "__main__":
+    test_strategy_fall_through()
+    test_broken_direct_track_falls_through()
+    print("\nResolver tests completed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the serialized response cache
+"""
+
+import time
+
+from fast_json import CachedResponse, ResponseCache, dumps_bytes
+
+
+def transcript(video_id, words):
+    return {'success': True, 'video_id': video_id, 'transcript': ' '.join(['word'] * words)}
+
+
+def total_size(cache):
+    return sum(entry.size for _, entry in cache._entries.values())
+
+
+def test_byte_accounting():
+    cache = ResponseCache(max_entries=10, ttl=3600)
+    entry = cache.put('a', transcript('a', 100))
+    assert entry.body == dumps_bytes(transcript('a', 100))
+    assert cache.nbytes == entry.size > 2 * len(entry.body)
+    cache.put('b', transcript('b', 50))
+    cache.put('a', transcript('a', 10))        # replacing an entry gives its bytes back
+    assert len(cache) == 2 and cache.nbytes == total_size(cache)
+    cache.clear()
+    assert cache.nbytes == 0
+    print("✅ The byte total follows puts, replacements and clear()")
+
+
+def test_eviction():
+    size = CachedResponse(transcript('x', 100)).size
+    cache = ResponseCache(max_entries=10, ttl=3600, max_bytes=int(size * 3.5))
+    for video_id in 'abc':
+        cache.put(video_id, transcript(video_id, 100))
+    assert cache.get('a') is not None           # 'a' is now the most recently used
+    cache.put('d', transcript('d', 100))
+    assert 'b' not in cache and all(key in cache for key in 'acd')
+    assert cache.nbytes == total_size(cache) <= cache.max_bytes
+
+    # Bigger than the whole budget: served once, never stored
+    huge = cache.put('huge', transcript('huge', 5000))
+    assert huge.body and 'huge' not in cache and len(cache) == 3
+
+    by_count = ResponseCache(max_entries=2, ttl=3600)
+    for video_id in 'abc':
+        by_count.put(video_id, transcript(video_id, 1))
+    assert 'a' not in by_count and len(by_count) == 2 and by_count.nbytes == total_size(by_count)
+    print("✅ Least recently used entries are evicted by byte budget and by count")
+
+
+def test_expiry():
+    cache = ResponseCache(max_entries=10, ttl=0.05)
+    cache.put('a', transcript('a', 10))
+    time.sleep(0.06)
+    assert 'a' not in cache and cache.get('a') is None
+    assert cache.nbytes == 0 and len(cache) == 0
+    print("✅ Expired entries are dropped and their bytes released")
+
+
+if __name__ == "__main__":
+    test_byte_accounting()
+    test_eviction()
+    test_expiry()
+    print("\nResponse cache tests completed!")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the subtitle index (yt-dlp replaced by the bundled .vtt files)
+"""
+
+import glob
+import os
+import shutil
+import tempfile
+import threading
+
+import subtitle_index
+from subtitle_index import SubtitleIndex
+from ytdlp_pool import ytdlp_pool
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def fake_extract(available):
+    """extract_subtitles stand-in copying the fixture tracks in `available` into the job directory"""
+    calls = []
+
+    def extract_subtitles(video_id, work_dir, languages=('en',), timeout=30):
+        calls.append(video_id)
+        paths = []
+        for language in available:
+            source = glob.glob(os.path.join(glob.escape(FIXTURE_DIR), f'*[[]{video_id}[]].{language}.vtt'))[0]
+            paths.append(shutil.copy(source, os.path.join(work_dir, f'{video_id}.{language}.vtt')))
+        return paths
+    return extract_subtitles, calls
+
+
+def test_harvest_and_has():
+    with tempfile.TemporaryDirectory() as root:
+        index = SubtitleIndex(root)
+        ytdlp_pool.extract_subtitles, calls = fake_extract(['ja', 'de'])
+        try:
+            assert not index.has('-Kaq9QOyPdM')
+            threads = [threading.Thread(target=index.get_or_harvest, args=('-Kaq9QOyPdM', 'ja')) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # Concurrent callers share one harvest, and its lock is dropped afterwards
+            assert calls == ['-Kaq9QOyPdM'], calls
+            assert index._harvest_locks == {}
+            assert index.has('-Kaq9QOyPdM', 'ja') and not index.has('-Kaq9QOyPdM', 'fr')
+            assert index.languages('-Kaq9QOyPdM') == ['de', 'ja']
+            assert index.get_text('-Kaq9QOyPdM', 'de')
+        finally:
+            del ytdlp_pool.extract_subtitles
+    print("✅ One harvest indexes every track; has() answers per language")
+
+
+def test_empty_harvest_expires():
+    ttl = subtitle_index.EMPTY_HARVEST_TTL
+    with tempfile.TemporaryDirectory() as root:
+        index = SubtitleIndex(root)
+        ytdlp_pool.extract_subtitles, calls = fake_extract([])
+        try:
+            assert index.get_or_harvest('-Kaq9QOyPdM') is None
+            assert index.get_or_harvest('-Kaq9QOyPdM') is None
+            assert len(calls) == 1   # the empty result is remembered...
+
+            subtitle_index.EMPTY_HARVEST_TTL = -1
+            assert not index.has('-Kaq9QOyPdM')   # ...but only for EMPTY_HARVEST_TTL
+            ytdlp_pool.extract_subtitles, calls = fake_extract(['ja'])
+            assert index.get_or_harvest('-Kaq9QOyPdM', 'ja')
+            assert calls == ['-Kaq9QOyPdM'] and index.has('-Kaq9QOyPdM')
+        finally:
+            subtitle_index.EMPTY_HARVEST_TTL = ttl
+            del ytdlp_pool.extract_subtitles
+    print("✅ A harvest without tracks is retried once EMPTY_HARVEST_TTL has passed")
+
+
+if __name__ == "__main__":
+    test_harvest_and_has()
+    test_empty_harvest_expires()
+    print("\nSubtitle index tests completed!")
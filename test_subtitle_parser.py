@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the WebVTT / SRT parser using the bundled Episode 527 subtitle files
+"""
+
+import glob
+import io
+import os
+
+from subtitle_index import parse_subtitle_name
+from subtitle_parser import iter_captions, parse_file
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def vtt(*cues):
+    """WebVTT text from (start, end, [lines]) tuples"""
+    blocks = ['WEBVTT\nKind: captions\nLanguage: en\n']
+    for start, end, lines in cues:
+        blocks.append(f'00:00:{start:06.3f} --> 00:00:{end:06.3f} align:start position:0%\n' + '\n'.join(lines) + '\n')
+    return io.StringIO('\n'.join(blocks))
+
+
+def test_bundled_fixtures():
+    paths = sorted(glob.glob(os.path.join(glob.escape(FIXTURE_DIR), '*.vtt')))
+    assert len(paths) == 8, paths
+    for path in paths:
+        _, language = parse_subtitle_name(path)
+        captions = list(parse_file(path))
+        if language == 'en':
+            # The bundled English file carries cue timings only
+            assert captions == [], captions[:3]
+            continue
+        assert captions, language
+        assert all(c.start <= c.end for c in captions), language
+        assert all(a.start <= b.start for a, b in zip(captions, captions[1:])), language
+        assert not any('<' in c.text or '&nbsp;' in c.text for c in captions), language
+        # Rolling cues are collapsed: raw files carry every line two or three times
+        with open(path, encoding='utf-8') as f:
+            cues = sum(1 for line in f if '-->' in line)
+        assert len(captions) < cues, language
+    german = [c.text for c in parse_file(glob.glob(os.path.join(glob.escape(FIXTURE_DIR), '*.de.vtt'))[0])]
+    assert german.count('[Musik]') >= 2   # said again later, so kept both times
+    print(f"✅ All {len(paths)} bundled subtitle files parse into ordered, tag-free captions")
+
+
+def test_rolling_cues_collapse():
+    captions = list(iter_captions(vtt(
+        (1.0, 3.0, ['first <00:00:01.500><c>line</c>']),
+        (3.0, 3.01, ['first line', ' ']),
+        (3.01, 5.0, ['first line', 'second <00:00:04.000><c>line</c>']),
+        (5.0, 5.01, ['second line', ' ']),
+    )))
+    assert [(c.start, c.end, c.text) for c in captions] == [(1.0, 3.01, 'first line'), (3.01, 5.01, 'second line')], captions
+    print("✅ Lines carried over from the previous cue are dropped and extend its caption")
+
+
+def test_repeated_line_is_kept():
+    captions = list(iter_captions(vtt(
+        (1.0, 2.0, ['Hello']),
+        (3.0, 4.0, ['World']),
+        (5.0, 6.0, ['Hello']),
+    )))
+    assert [(c.start, c.end, c.text) for c in captions] == [(1.0, 2.0, 'Hello'), (3.0, 4.0, 'World'),
+                                                             (5.0, 6.0, 'Hello')], captions
+    print("✅ A line said again after another caption is kept with its own timing")
+
+
+def test_srt():
+    srt = io.StringIO('1\n00:00:01,000 --> 00:00:02,500\nHello &amp; welcome\n\n'
+                      '2\n00:00:03,000 --> 00:00:04,000\n<i>Goodbye</i>\n')
+    assert [(c.start, c.text) for c in iter_captions(srt)] == [(1.0, 'Hello & welcome'), (3.0, 'Goodbye')]
+    print("✅ SRT indices, entities and tags are handled")
+
+
+if __name__ == "__main__":
+    test_bundled_fixtures()
+    test_rolling_cues_collapse()
+    test_repeated_line_is_kept()
+    test_srt()
+    print("\nSubtitle parser tests completed!")
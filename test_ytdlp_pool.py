@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the yt-dlp worker pool (plain functions stand in for yt-dlp jobs)
+"""
+
+import sys
+import threading
+import time
+
+from ytdlp_pool import JobTimeout, YtDlpPool, _run_cli
+
+
+def echo_after(value, seconds):
+    time.sleep(seconds)
+    return value
+
+
+def fail():
+    raise ValueError('video unavailable')
+
+
+def test_timeout_replaces_only_the_stuck_worker():
+    pool = YtDlpPool(max_workers=2, max_pending=2, initializer=None)
+    try:
+        assert pool.run(echo_after, 'warm', 0, timeout=30) == 'warm'
+        results = {}
+
+        def run(name, *args, timeout):
+            try:
+                results[name] = pool.run(*args, timeout=timeout)
+            except Exception as e:
+                results[name] = e
+
+        stuck = threading.Thread(target=run, args=('stuck', time.sleep, 30), kwargs={'timeout': 1})
+        healthy = threading.Thread(target=run, args=('healthy', echo_after, 'ok', 2), kwargs={'timeout': 30})
+        stuck.start()
+        healthy.start()
+        stuck.join()
+        healthy.join()
+        assert isinstance(results['stuck'], JobTimeout), results
+        # The job on the other worker was not taken down with the stuck one
+        assert results['healthy'] == 'ok', results
+
+        # A failing job keeps its worker; the pool keeps serving
+        try:
+            pool.run(fail, timeout=30)
+            raise AssertionError('job error not raised')
+        except ValueError:
+            pass
+        assert pool.run(echo_after, 'again', 0, timeout=30) == 'again'
+        assert len(pool._idle) == 1 and pool._idle[0].process.is_alive()
+    finally:
+        pool.shutdown()
+    print("✅ A timed-out job costs only its own worker")
+
+
+def test_cli_exit_code_is_checked():
+    failing = [sys.executable, '-c', 'import sys; sys.stderr.write("ERROR: Video unavailable\\n"); sys.exit(1)']
+    try:
+        _run_cli(failing, timeout=30)
+        raise AssertionError('non-zero exit ignored')
+    except RuntimeError as e:
+        assert 'Video unavailable' in str(e)
+    _run_cli([sys.executable, '-c', 'pass'], timeout=30)
+    print("✅ A failing yt-dlp command raises instead of returning partial files")
+
+
+if __name__ == "__main__":
+    test_timeout_replaces_only_the_stuck_worker()
+    test_cli_exit_code_is_checked()
+    print("\nyt-dlp pool tests completed!")
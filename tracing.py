@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Request-scoped tracing
+Each HTTP request gets a request id and a list of timed spans (resolution
+stages, translation chunks, summary providers, formatting). Finished spans
+and a per-request summary are written as JSON log lines (with TRACE_LOG=1),
+and the spans are folded into a Server-Timing header so browser devtools
+show the breakdown.
+"""
+
+import contextvars
+import os
+import re
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+from fast_json import dumps_bytes
+from metrics import stage_seconds
+
+# One JSON line per request on stdout; opt in with TRACE_LOG=1
+TRACE_LOG = os.getenv('TRACE_LOG', '0') != '0'
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+_current = contextvars.ContextVar('trace', default=None)
+
+
+def _log(record):
+    if TRACE_LOG:
+        sys.stdout.write(dumps_bytes(record).decode('utf-8') + '\n')
+        sys.stdout.flush()
+
+
+def _metric_name(name):
+    """google_translate[3] -> google_translate, the name used for metrics and Server-Timing"""
+    return name.split('[', 1)[0]
+
+
+class Span:
+    def __init__(self, trace, name, parent, attrs):
+        self.trace = trace
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.ms = None
+        self.ok = True
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        record = {
+            'name': self.name,
+            'start_ms': round((self.start - self.trace.start) * 1000, 1),
+            'ms': self.ms,
+            'ok': self.ok
+        }
+        if self.parent:
+            record['parent'] = self.parent
+        if self.attrs:
+            record['attrs'] = self.attrs
+        return record
+
+
+class Trace:
+    """Spans of one request"""
+
+    def __init__(self, request_id=None, **attrs):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.spans = []
+        self.stack = []
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def server_timing(self):
+        """Server-Timing header value: one entry per span name, repeated spans summed"""
+        totals = {}
+        for span in self.spans:
+            if span.ms is None:
+                continue
+            name = _metric_name(span.name)
+            ms, count = totals.get(name, (0.0, 0))
+            totals[name] = (ms + span.ms, count + 1)
+        entries = []
+        for name, (ms, count) in totals.items():
+            entry = f'{re.sub(r"[^A-Za-z0-9_.-]", "_", name)};dur={ms:.1f}'
+            if count > 1:
+                entry += f';desc="{count} calls"'
+            entries.append(entry)
+        entries.append(f'total;dur={(time.perf_counter() - self.start) * 1000:.1f}')
+        return ', '.join(entries)
+
+    def finish(self, **attrs):
+        self.set(**attrs)
+        record = {'event': 'request', 'request_id': self.request_id}
+        record.update(self.attrs)
+        record['ms'] = round((time.perf_counter() - self.start) * 1000, 1)
+        record['spans'] = len(self.spans)
+        _log(record)
+
+
+def current_trace():
+    return _current.get()
+
+
+def start_trace(request_id=None, **attrs):
+    """Make a new trace current for this thread/context and return it"""
+    trace = Trace(request_id, **attrs)
+    _current.set(trace)
+    return trace
+
+
+def end_trace(**attrs):
+    trace = _current.get()
+    if trace is not None:
+        trace.finish(**attrs)
+        _current.set(None)
+    return trace
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block as a span of the current trace and in pipeline_stage_duration_seconds"""
+    trace = _current.get()
+    current = None
+    if trace is not None:
+        current = Span(trace, name, trace.stack[-1].name if trace.stack else None, attrs)
+        trace.stack.append(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        if current is not None:
+            current.ok = False
+            current.attrs.setdefault('error', type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=_metric_name(name))
+        if current is not None:
+            current.ms = round(elapsed * 1000, 1)
+            trace.stack.remove(current)
+            trace.spans.append(current)
+            record = {'event': 'span', 'request_id': trace.request_id}
+            record.update(current.to_dict())
+            _log(record)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span (or the trace when none is open)"""
+    trace = _current.get()
+    if trace is None:
+        return
+    (trace.stack[-1] if trace.stack else trace).set(**attrs)
+
+
+class TracingMixin:
+    """Mixin for BaseHTTPRequestHandler subclasses: one trace per request.
+
+    The request id is taken from an incoming X-Request-ID header or generated,
+    and X-Request-ID plus Server-Timing are added to the response headers, so
+    handlers should finish their work before sending headers.
+    """
+
+    def parse_request(self):
+        ok = super().parse_request()
+        if ok:
+            start_trace((self.headers.get(REQUEST_ID_HEADER) or '')[:64] or None, method=self.command,
+                        path=self.path.split('?', 1)[0])
+        return ok
+
+    def send_response(self, code, message=None):
+        self._trace_status = code
+        super().send_response(code, message)
+
+    def end_headers(self):
+        trace = _current.get()
+        if trace is not None:
+            self.send_header(REQUEST_ID_HEADER, trace.request_id)
+            self.send_header('Server-Timing', trace.server_timing())
+            self.send_header('Timing-Allow-Origin', '*')
+            self.send_header('Access-Control-Expose-Headers', f'{REQUEST_ID_HEADER}, Server-Timing')
+        super().end_headers()
+
+    def handle_one_request(self):
+        self._trace_status = None
+        try:
+            super().handle_one_request()
+        finally:
+            end_trace(status=self._trace_status)
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Transcript resolution engine shared by every server and CLI
+A video goes through a chain of strategies (direct English, YouTube
+translation, Google Translate, original language, ...) until one returns
+text. Results are cached process-wide, concurrent requests for the same
+video share one resolution, every stage is timed, and a resolution can be
+cancelled between stages.
+"""
+
+import importlib.util
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from admission import Overloaded, admission
+from fast_json import ResponseCache
+from health import health
+from memory import MemoryBudgetExceeded, charge
+from metrics import register_in_flight
+from proxy_pool import proxy_pool
+from quotas import QuotaExceeded, quotas
+from rate_limit import is_throttle_error
+from tracing import annotate, span
+
+# googletrans (and httpx under it) is only imported on the first Google translation
+TRANSLATOR_AVAILABLE = importlib.util.find_spec('googletrans') is not None
+
+# Transcript languages tried, in order, when there is no direct match
+LANGUAGE_PRIORITIES = ['en', 'hi', 'es', 'fr', 'de', 'ja', 'ko', 'zh', 'ar', 'ru', 'pt', 'it']
+GOOGLE_CHUNK_SIZE = 3000
+THROTTLED_MESSAGE = 'Too many requests. Please wait a moment and try again'
+
+# Exception class names from youtube_transcript_api and what to tell users
+FRIENDLY_ERRORS = [
+    ('TranscriptsDisabled', 'Transcripts are disabled for this video'),
+    ('VideoUnavailable', 'Video is unavailable or private'),
+    ('NoTranscriptFound', 'No transcripts found for this video'),
+]
+
+
+class ResolutionError(Exception):
+    """No strategy produced a transcript; the message is safe to show to users"""
+
+    def __init__(self, message, details=None, throttled=False):
+        super().__init__(message)
+        self.details = details
+        self.throttled = throttled
+
+
+class ResolutionCancelled(Exception):
+    """The caller cancelled the resolution"""
+
+
+def friendly_error(error):
+    if is_throttle_error(error):
+        return THROTTLED_MESSAGE
+    text = f'{type(error).__name__} {error}'
+    for marker, message in FRIENDLY_ERRORS:
+        if marker in text:
+            return message
+    return str(error)
+
+
+def language_name(code):
+    return 'English' if code == 'en' else code.upper()
+
+
+class Resolution:
+    """A resolved transcript and how it was obtained"""
+
+    def __init__(self, video_id, text, language, method, language_code, timings=None, cached=False):
+        self.video_id = video_id
+        self.text = text
+        self.language = language            # human readable, e.g. "Hindi → English (YouTube)"
+        self.method = method
+        self.language_code = language_code  # language of `text`
+        self.timings = timings or []
+        self.cached = cached
+
+    @property
+    def word_count(self):
+        return len(self.text.split())
+
+    def to_dict(self):
+        return {
+            'success': True,
+            'transcript': self.text,
+            'language': self.language,
+            'method': self.method,
+            'video_id': self.video_id,
+            'word_count': self.word_count,
+            'language_code': self.language_code
+        }
+
+    @classmethod
+    def from_dict(cls, data, timings=None, cached=False):
+        return cls(data['video_id'], data['transcript'], data['language'], data['method'],
+                   data['language_code'], timings, cached)
+
+
+class ResolutionContext:
+    """Per-resolution state shared by the strategies (listing, fetched texts, timings)"""
+
+    def __init__(self, video_id, language='en', cancel_event=None):
+        self.video_id = video_id
+        self.language = language
+        self.cancel_event = cancel_event
+        self.timings = []
+        self.api = None
+        self.proxy = None
+        self._listing = None
+        self._texts = {}
+        self._original = None
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ResolutionCancelled(f'Resolution of {self.video_id} cancelled')
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage (also a trace span); cancellation is checked before it starts"""
+        self.check_cancelled()
+        start = time.perf_counter()
+        ok = False
+        try:
+            with span(name):
+                yield
+            ok = True
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings.append({'stage': name, 'ms': round(elapsed * 1000, 1), 'ok': ok})
+
+    def result(self, text, language, method, language_code):
+        return Resolution(self.video_id, text, language, method, language_code, self.timings)
+
+    def listing(self):
+        """The video's TranscriptList, fetched once through the proxy pool"""
+        if self._listing is None:
+            self.api, self.proxy = proxy_pool.api_for(self.video_id)
+            with self.stage('list'):
+                self._listing = proxy_pool.call(self.proxy, self.api.list, self.video_id)
+        return self._listing
+
+    def fetch(self, transcript, stage='fetch'):
+        """Text of one Transcript object; each track is downloaded at most once"""
+        key = (stage, transcript.language_code, transcript.is_generated)
+        if key not in self._texts:
+            with self.stage(stage):
+                data = proxy_pool.call(self.proxy, transcript.fetch)
+            self._texts[key] = '\n'.join(snippet.text for snippet in data)
+        return self._texts[key]
+
+    def original(self):
+        """(transcript, text) of the first fetchable track in priority order, or (None, None)"""
+        if self._original is None:
+            self._original = (None, None)
+            listing = list(self.listing())
+            rank = {code: i for i, code in enumerate(LANGUAGE_PRIORITIES)}
+            listing.sort(key=lambda t: rank.get(t.language_code, len(rank)))
+            for transcript in listing:
+                try:
+                    self._original = (transcript, self.fetch(transcript))
+                    break
+                except ResolutionCancelled:
+                    raise
+                except Exception as e:
+                    if is_throttle_error(e):
+                        raise
+                    print(f"Failed to fetch {transcript.language}: {e}")
+        return self._original
+
+
+# --- Strategies ----------------------------------------------------------
+# strategy(ctx) returns a Resolution, or None to let the next one try
+
+def direct_transcript(ctx):
+    """A track already in the wanted language (manual or auto-generated)"""
+    try:
+        transcript = ctx.listing().find_transcript([ctx.language])
+    except Exception as e:
+        if is_throttle_error(e) or isinstance(e, ResolutionCancelled) or ctx._listing is None:
+            raise
+        return None
+    try:
+        text = ctx.fetch(transcript)
+    except ResolutionCancelled:
+        raise
+    except Exception as e:
+        if is_throttle_error(e):
+            raise
+        # A broken track should not stop translation / original-language fallbacks
+        print(f"Failed to fetch {language_name(ctx.language)} transcript: {e}")
+        return None
+    return ctx.result(text, f'{language_name(ctx.language)} (Direct)', f'Direct {language_name(ctx.language)}',
+                      ctx.language)
+
+
+def youtube_translation(ctx):
+    """YouTube's own machine translation of the original track"""
+    transcript, _ = ctx.original()
+    if transcript is None or transcript.language_code == ctx.language or not transcript.is_translatable:
+        return None
+    try:
+        text = ctx.fetch(transcript.translate(ctx.language), stage='youtube_translate')
+    except ResolutionCancelled:
+        raise
+    except Exception as e:
+        if is_throttle_error(e):
+            raise
+        print(f"YouTube translation failed for {transcript.language}: {e}")
+        return None
+    return ctx.result(text, f'{transcript.language} → {language_name(ctx.language)} (YouTube)',
+                      'YouTube Translation', ctx.language)
+
+
+class TranslatorPool:
+    """Process-wide googletrans clients, created on first use and reused by every request.
+
+    A client is not thread-safe, so each one is lent to one resolution at a time;
+    the pool only grows to the number of concurrent Google translations.
+    """
+
+    def __init__(self, factory=None):
+        self.factory = factory
+        self.idle = []
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def _create(self):
+        if self.factory is None:
+            from googletrans import Translator
+            self.factory = Translator
+        self.created += 1
+        return self.factory()
+
+    @contextmanager
+    def client(self):
+        with self.lock:
+            translator = self.idle.pop() if self.idle else None
+        if translator is None:
+            translator = self._create()
+        try:
+            yield translator
+        finally:
+            with self.lock:
+                self.idle.append(translator)
+
+
+translators = TranslatorPool()
+
+
+def google_translation(ctx):
+    """Google Translate over the original text, chunk by chunk"""
+    transcript, original_text = ctx.original()
+    if not TRANSLATOR_AVAILABLE or transcript is None or transcript.language_code == ctx.language:
+        return None
+    if not health.allow('googletrans'):
+        annotate(skipped='circuit open')
+        return None
+    source = transcript.language_code
+    quotas.consume('translation_chars', len(original_text))
+    charge(original_text, 'translation')
+    chunks = [original_text[i:i + GOOGLE_CHUNK_SIZE] for i in range(0, len(original_text), GOOGLE_CHUNK_SIZE)]
+    translated_chunks = []
+    try:
+        with admission.stage('translate'), translators.client() as translator:
+            for i, chunk in enumerate(chunks):
+                try:
+                    with ctx.stage(f'google_translate[{i}]'):
+                        if source in ('auto', 'unknown'):
+                            translated = translator.translate(chunk, dest=ctx.language)
+                        else:
+                            translated = translator.translate(chunk, src=source, dest=ctx.language)
+                    translated_chunks.append(translated.text)
+                    health.record('googletrans', ok=True)
+                except ResolutionCancelled:
+                    raise
+                except Exception as e:
+                    print(f"Chunk {i + 1}/{len(chunks)} translation failed: {e}")
+                    health.record('googletrans', ok=False)
+                    # Keep the original chunk if translation fails
+                    translated_chunks.append(chunk)
+    except ImportError as e:
+        print(f"Google Translate unavailable: {e}")
+        return None
+
+    text = '\n'.join(translated_chunks)
+    if not text or text == original_text:
+        return None
+    return ctx.result(text, f'{source.upper()} → {language_name(ctx.language)} (Google)', 'Google Translate',
+                      ctx.language)
+
+
+def original_language(ctx):
+    """The untranslated original when every translation failed"""
+    transcript, text = ctx.original()
+    if transcript is None:
+        return None
+    code = transcript.language_code
+    label = f'{code.upper()} (Original)' if code == ctx.language else f'{code.upper()} (Original - Translation Failed)'
+    return ctx.result(text, label, 'Original Language', code)
+
+
+def ytdlp_subtitles(ctx):
+    """Subtitle tracks harvested with yt-dlp into the local subtitle index"""
+    from subtitle_index import subtitle_index
+    with ctx.stage('ytdlp_subtitles'):
+        text = subtitle_index.get_or_harvest(ctx.video_id, ctx.language)
+    if not text:
+        return None
+    return ctx.result(text, f'{language_name(ctx.language)} (yt-dlp)', 'yt-dlp Subtitles', ctx.language)
+
+
+DEFAULT_STRATEGIES = [direct_transcript, youtube_translation, google_translation, original_language]
+
+
+# --- Engine --------------------------------------------------------------
+
+class _Flight:
+    """A resolution in progress that other callers can wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class TranscriptResolver:
+    """Runs the strategy chain with a shared cache and one in-flight resolution per video"""
+
+    def __init__(self, strategies=None, cache=None, name='transcripts'):
+        self.strategies = list(strategies or DEFAULT_STRATEGIES)
+        self.cache = cache if cache is not None else ResponseCache(
+            max_entries=int(os.getenv('TRANSCRIPT_CACHE_SIZE', 512)),
+            ttl=int(os.getenv('TRANSCRIPT_CACHE_TTL', 3600)),
+            name=name,
+            max_bytes=int(float(os.getenv('TRANSCRIPT_CACHE_MAX_MB', 128)) * 1024 * 1024)
+        )
+        register_in_flight(f'{name}_resolutions', lambda: len(self._flights))
+        self.lock = threading.Lock()
+        self._flights = {}
+
+    def _from_cache(self, key, start):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        annotate(transcript_cache='hit')
+        timing = {'stage': 'cache', 'ms': round((time.perf_counter() - start) * 1000, 1), 'ok': True}
+        return Resolution.from_dict(entry.data, [timing], cached=True)
+
+    def resolve(self, video_id, language='en', cancel_event=None, use_cache=True):
+        """Return a Resolution; raises ResolutionError or ResolutionCancelled"""
+        key = (video_id, language)
+        start = time.perf_counter()
+        while True:
+            if use_cache:
+                cached = self._from_cache(key, start)
+                if cached:
+                    return cached
+            with self.lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+            if leader:
+                break
+            # Someone is already resolving this video: wait for their result
+            while not flight.done.wait(0.25):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ResolutionCancelled(f'Resolution of {video_id} cancelled')
+            # A cancelled or shed leader, or one out of quota, says nothing about this caller:
+            # resolve it ourselves
+            if flight.error is not None and not isinstance(flight.error,
+                                                           (ResolutionCancelled, Overloaded, QuotaExceeded)):
+                raise flight.error
+            use_cache = True
+
+        try:
+            resolution = self._run_chain(ResolutionContext(video_id, language, cancel_event))
+            self.cache.put(key, resolution.to_dict())
+            return resolution
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _run_chain(self, ctx):
+        try:
+            for strategy in self.strategies:
+                with span(strategy.__name__) as current:
+                    resolution = strategy(ctx)
+                    if current is not None:
+                        current.set(result='hit' if resolution is not None else 'skip')
+                if resolution is not None:
+                    annotate(method=resolution.method, language=resolution.language_code)
+                    return resolution
+        except (ResolutionCancelled, ResolutionError, MemoryBudgetExceeded, Overloaded, QuotaExceeded):
+            raise
+        except Exception as e:
+            raise ResolutionError(friendly_error(e), throttled=is_throttle_error(e)) from e
+        raise ResolutionError(
+            'No transcripts available for this video',
+            details='This video does not have captions/subtitles. Try a different video with captions enabled.'
+        )
+
+    def list_languages(self, video_id):
+        """[{'language', 'code', 'generated', 'translatable'}, ...] of the video's tracks"""
+        ctx = ResolutionContext(video_id)
+        try:
+            listing = ctx.listing()
+        except Exception as e:
+            raise ResolutionError(friendly_error(e), throttled=is_throttle_error(e)) from e
+        return [{
+            'language': transcript.language,
+            'code': transcript.language_code,
+            'generated': transcript.is_generated,
+            'translatable': transcript.is_translatable
+        } for transcript in listing]
+
+
+# Shared by every server and CLI in this process
+resolver = TranscriptResolver()
+
+
+def resolve_transcript(video_id, language='en', cancel_event=None):
+    return resolver.resolve(video_id, language, cancel_event)
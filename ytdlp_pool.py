@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Persistent yt-dlp worker pool
+Long-lived worker processes each keep warm yt_dlp.YoutubeDL instances, so a
+subtitle or audio job pays network time instead of interpreter and extractor
+start-up. Falls back to the yt-dlp command line when yt_dlp is not importable.
+"""
+
+import glob
+import multiprocessing
+import os
+import subprocess
+import threading
+import time
+
+from scratch import OUTPUT_TEMPLATE
+
+try:
+    import yt_dlp
+    YTDLP_AVAILABLE = True
+except ImportError:
+    YTDLP_AVAILABLE = False
+
+SUBTITLE_OPTIONS = {
+    'skip_download': True,
+    'writesubtitles': True,
+    'writeautomaticsub': True,
+    'subtitlesformat': 'vtt',
+    'outtmpl': OUTPUT_TEMPLATE,
+    'quiet': True,
+    'no_warnings': True,
+    'noprogress': True,
+}
+
+AUDIO_OPTIONS = {
+    'format': 'bestaudio/best',
+    'outtmpl': OUTPUT_TEMPLATE,
+    'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'wav', 'preferredquality': '5'}],
+    'quiet': True,
+    'no_warnings': True,
+    'noprogress': True,
+}
+
+
+class PoolBusy(Exception):
+    """Raised when the job queue is full"""
+
+
+class WorkerDied(Exception):
+    """A worker process exited in the middle of a job"""
+
+
+class JobTimeout(TimeoutError):
+    """A job overran its timeout (its worker is replaced)"""
+
+
+# --- Worker process side -------------------------------------------------
+
+_downloaders = {}
+
+
+def _init_worker():
+    """Build the YoutubeDL instances once per worker process"""
+    _downloaders['subtitles'] = yt_dlp.YoutubeDL(dict(SUBTITLE_OPTIONS))
+    _downloaders['audio'] = yt_dlp.YoutubeDL(dict(AUDIO_OPTIONS))
+
+
+def _run_download(kind, url, work_dir, extra_params=None):
+    ydl = _downloaders[kind]
+    # The instance is reused; only the per-job parameters change
+    ydl.params['paths'] = {'home': work_dir}
+    ydl.params.update(extra_params or {})
+    ydl.download([url])
+
+
+def _extract_subtitles_job(video_id, work_dir, languages):
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    _run_download('subtitles', url, work_dir, {'subtitleslangs': list(languages)})
+    return sorted(glob.glob(os.path.join(work_dir, '*.vtt')) + glob.glob(os.path.join(work_dir, '*.srt')))
+
+
+def _download_audio_job(video_id, work_dir):
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    _run_download('audio', url, work_dir)
+    audio_file = os.path.join(work_dir, f"{video_id}.wav")
+    return audio_file if os.path.exists(audio_file) else None
+
+
+def _worker_main(conn, initializer=None):
+    """Serve (fn, args) jobs from the pipe until it closes or a None job arrives"""
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        fn, args = job
+        try:
+            reply = (True, fn(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception:
+            # Some extractor errors do not pickle; send their text instead
+            conn.send((False, RuntimeError(f'{type(reply[1]).__name__}: {reply[1]}')))
+
+
+# --- Command line fallback -----------------------------------------------
+
+def _run_cli(cmd, timeout):
+    """Run yt-dlp; a non-zero exit raises with its last error line instead of passing off partial output"""
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        lines = [line for line in result.stderr.splitlines() if line.strip()]
+        raise RuntimeError(f"yt-dlp exited with {result.returncode}: {lines[-1] if lines else 'no output'}")
+
+
+def _subtitles_cli(video_id, work_dir, languages, timeout):
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    cmd = ["yt-dlp", "--write-auto-sub", "--write-sub", "--sub-lang", ",".join(languages), "--skip-download",
+           "-P", work_dir, "-o", OUTPUT_TEMPLATE, url]
+    _run_cli(cmd, timeout)
+    return sorted(glob.glob(os.path.join(work_dir, '*.vtt')) + glob.glob(os.path.join(work_dir, '*.srt')))
+
+
+def _audio_cli(video_id, work_dir, timeout):
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    cmd = ["yt-dlp", "-x", "--audio-format", "wav", "--audio-quality", "5",
+           "-P", work_dir, "-o", OUTPUT_TEMPLATE, "--no-warnings", url]
+    _run_cli(cmd, timeout)
+    audio_file = os.path.join(work_dir, f"{video_id}.wav")
+    return audio_file if os.path.exists(audio_file) else None
+
+
+# --- Server side ---------------------------------------------------------
+
+class _Worker:
+    """One warm worker process and its end of the pipe"""
+
+    def __init__(self, context, initializer=None):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, initializer), daemon=True)
+        self.process.start()
+        child.close()
+
+    def call(self, fn, args, timeout):
+        """Run one job; raises JobTimeout if it overruns (the worker is then unusable)"""
+        try:
+            self.conn.send((fn, args))
+        except OSError:
+            raise WorkerDied(f'yt-dlp worker exited with code {self.process.exitcode}') from None
+        if not self.conn.poll(timeout):
+            raise JobTimeout(f'yt-dlp job exceeded {timeout:.0f}s')
+        try:
+            ok, value = self.conn.recv()
+        except EOFError:
+            raise WorkerDied(f'yt-dlp worker exited with code {self.process.exitcode}') from None
+        if not ok:
+            raise value
+        return value
+
+    def stop(self, graceful=False):
+        if graceful and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class YtDlpPool:
+    """Bounded pool of warm yt-dlp worker processes with per-job timeouts.
+
+    Each worker runs one job at a time over its own pipe, so a job that
+    overruns its timeout costs only its own worker: that process is killed
+    and a fresh one is started on next use, while jobs on the other workers
+    carry on.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, initializer=_init_worker):
+        self.max_workers = max_workers
+        self.pending = threading.BoundedSemaphore(max_workers + max_pending)
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.lock = threading.Lock()
+        self._idle = []
+        self.initializer = initializer
+        # spawn: forking a threaded HTTP server can deadlock the child
+        self._context = multiprocessing.get_context('spawn')
+
+    def _checkout(self):
+        """An idle warm worker, or a new one (workers start on first use)"""
+        with self.lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.stop()
+        return _Worker(self._context, self.initializer)
+
+    def run(self, fn, *args, timeout=60):
+        if not self.pending.acquire(blocking=False):
+            raise PoolBusy('yt-dlp queue is full, try again shortly')
+        try:
+            # The timeout covers the wait for a free worker as well as the job
+            deadline = time.monotonic() + timeout
+            if not self.slots.acquire(timeout=timeout):
+                raise JobTimeout(f'no yt-dlp worker became free within {timeout}s')
+            try:
+                worker = self._checkout()
+                try:
+                    result = worker.call(fn, args, max(0.0, deadline - time.monotonic()))
+                except (JobTimeout, WorkerDied) as e:
+                    print(f"⏱️ {e}, replacing that worker")
+                    worker.stop()
+                    raise
+                except Exception:
+                    # The job failed but the worker is fine
+                    self._release(worker)
+                    raise
+                self._release(worker)
+                return result
+            finally:
+                self.slots.release()
+        finally:
+            self.pending.release()
+
+    def _release(self, worker):
+        with self.lock:
+            self._idle.append(worker)
+
+    def extract_subtitles(self, video_id, work_dir, languages=('en',), timeout=30):
+        """Write subtitle tracks for `languages` into work_dir; returns the file paths"""
+        if not YTDLP_AVAILABLE:
+            return _subtitles_cli(video_id, work_dir, languages, timeout)
+        return self.run(_extract_subtitles_job, video_id, work_dir, tuple(languages), timeout=timeout)
+
+    def download_audio(self, video_id, work_dir, timeout=120):
+        """Download audio as <video_id>.wav into work_dir; returns its path or None"""
+        if not YTDLP_AVAILABLE:
+            return _audio_cli(video_id, work_dir, timeout)
+        return self.run(_download_audio_job, video_id, work_dir, timeout=timeout)
+
+    def shutdown(self):
+        with self.lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop(graceful=True)
+
+
+# Shared by the servers in this process; workers start on first use
+ytdlp_pool = YtDlpPool(
+    max_workers=int(os.getenv('YTDLP_WORKERS', 2)),
+    max_pending=int(os.getenv('YTDLP_MAX_PENDING', 16))
+)